@@ -0,0 +1,105 @@
+"""
+Secondary indexes over the objects in an :class:`~rosetrellis.base.obj_cache.ObjectCache`.
+
+Indexes hold ids, not objects, so they never keep an object alive.  The object
+cache updates them whenever an object is hydrated or removed.  Ids of objects
+that have since been garbage collected are dropped when they're looked up.
+"""
+import bisect
+import collections
+
+from typing import Any, Callable, Iterable, Set
+
+
+class FieldIndex:
+	"""
+	Maps each value of a field to the ids of the objects with that value.
+
+	``key_func`` returns the values to index an object under, so a single
+	object can be found by several values, like each of a card's label ids.
+	"""
+
+	def __init__(self, key_func: Callable[[Any], Iterable[Any]]) -> None:
+		"""
+		:param key_func: Called with an object, returns the values to index it
+			under.
+		"""
+		self.key_func = key_func
+		self._ids = collections.defaultdict(set)
+		self._keys = {}
+
+	def update(self, obj: Any) -> None:
+		self.discard(obj.id)
+		keys = frozenset(k for k in self.key_func(obj) if k is not None)
+		for key in keys:
+			self._ids[key].add(obj.id)
+		if keys:
+			self._keys[obj.id] = keys
+
+	def discard(self, id_: str) -> None:
+		for key in self._keys.pop(id_, ()):
+			ids = self._ids[key]
+			ids.discard(id_)
+			if not ids:
+				del self._ids[key]
+
+	def clear(self) -> None:
+		self._ids.clear()
+		self._keys.clear()
+
+	def get(self, key: Any) -> Set[str]:
+		""":returns: The ids of the objects indexed under ``key``."""
+		return set(self._ids.get(key, ()))
+
+	def __len__(self) -> int:
+		return len(self._keys)
+
+
+class SortedIndex:
+	"""
+	Keeps ids sorted by a single value per object, like a due date, for range
+	lookups.  Objects whose value is ``None`` aren't indexed.
+	"""
+
+	def __init__(self, key_func: Callable[[Any], Any]) -> None:
+		"""
+		:param key_func: Called with an object, returns the value to sort it by.
+		"""
+		self.key_func = key_func
+		self._entries = []
+		self._keys = {}
+
+	def update(self, obj: Any) -> None:
+		key = self.key_func(obj)
+		if self._keys.get(obj.id) == key and key is not None:
+			return
+		self.discard(obj.id)
+		if key is not None:
+			bisect.insort(self._entries, (key, obj.id))
+			self._keys[obj.id] = key
+
+	def discard(self, id_: str) -> None:
+		key = self._keys.pop(id_, None)
+		if key is None:
+			return
+		i = bisect.bisect_left(self._entries, (key, id_))
+		if i < len(self._entries) and self._entries[i] == (key, id_):
+			del self._entries[i]
+
+	def clear(self) -> None:
+		self._entries = []
+		self._keys.clear()
+
+	def range(self, start: Any=None, end: Any=None) -> list:
+		"""
+		:param start: Lowest value to include.  ``None`` for no lower bound.
+		:param end: Value to stop before.  ``None`` for no upper bound.
+		:returns: The ids of the objects with values in ``[start, end)``,
+			ordered by value.
+		"""
+		lo = 0 if start is None else bisect.bisect_left(self._entries, (start,))
+		hi = len(self._entries) if end is None else bisect.bisect_left(self._entries, (end,))
+		return [id_ for __, id_ in self._entries[lo:hi]]
+
+	def __len__(self) -> int:
+		return len(self._entries)
@@ -1,19 +1,313 @@
+"""
+The identity map for :class:`~rosetrellis.models.TrelloObject` instances.
+
+Every :class:`~rosetrellis.trello_client.TrelloClient` owns an
+:class:`ObjectCache` so that objects hydrated with one set of credentials are
+never handed out to another client.
+"""
+import collections
 import logging
-import pprint
+import sys
+import time
+import weakref
+
+from typing import Any, Callable, Dict, Iterator, Union
 
 
 logger = logging.getLogger(__name__)
 
-_cache = {}
 
+def estimate_size(obj: Any) -> int:
+	"""
+	Roughly estimates the memory used by ``obj`` by walking the raw API data
+	it was built from.
+
+	:param obj: A :class:`~rosetrellis.models.TrelloObject`.
+	:returns: Estimated size in bytes.
+	"""
+	size = sys.getsizeof(obj)
+	pending = [getattr(obj, '_raw_data', None)]
+	while pending:
+		value = pending.pop()
+		if value is None:
+			continue
+		size += sys.getsizeof(value)
+		if isinstance(value, dict):
+			pending.extend(value.keys())
+			pending.extend(value.values())
+		elif isinstance(value, (list, tuple)):
+			pending.extend(value)
+	return size
+
+
+class ObjectCache:
+	"""
+	Maps Trello ids to the single instance we have for that object.
+
+	Objects are held with weak references, so an object only stays in the map
+	while something else references it.  Optionally, the most recently used
+	objects can also be held strongly in an LRU tier bounded by object count
+	and/or estimated size in bytes.
+
+	Objects are partitioned by type.  Lookups that know which type they want
+	only search that partition.
+
+	Each type can have a maximum age, in seconds, after which cached objects of
+	that type are considered stale.  By default objects never go stale.
+
+	Counters for cache activity are kept in :attr:`stats`.
+
+	Secondary indexes, like those in :mod:`rosetrellis.base.indexes`, can be
+	registered per type with :meth:`add_index`.  They're updated whenever an
+	object of that type is hydrated or removed.
+	"""
+
+	def __init__(self,
+	             max_objects: int=0,
+	             max_bytes: int=0,
+	             sizer: Callable[[Any], int]=estimate_size,
+	             max_age: Dict[type, float]=None,
+	             default_max_age: Union[float, None]=None) -> None:
+		"""
+		:param max_objects: Maximum number of objects to hold strongly.  ``0``
+			disables the strong tier unless ``max_bytes`` is set.
+		:param max_bytes: Maximum estimated size, in bytes, of the objects held
+			strongly.  ``0`` means no byte limit.
+		:param sizer: Callable used to estimate the size of an object.
+		:param max_age: Maps types to the number of seconds objects of that type
+			stay fresh.
+		:param default_max_age: Number of seconds objects of types not in
+			``max_age`` stay fresh.  ``None`` means forever.
+		"""
+		self.max_objects = max_objects
+		self.max_bytes = max_bytes
+		self.sizer = sizer
+		self.max_age = dict(max_age) if max_age else {}
+		self.default_max_age = default_max_age
+
+		self._partitions = {}
+		self._strong = collections.OrderedDict()
+		self._strong_bytes = 0
+
+		# Futures for objects that are currently being fetched from the API,
+		# keyed by id.  Concurrent requests for the same id wait on the same
+		# future instead of fetching (and building) their own object.
+		self._in_flight = {}
+
+		# type -> index name -> index
+		self._indexes = {}
+
+		#: Counts of hits, misses, evictions, in-flight joins and of hydrations
+		#: that were applied or skipped because the data hadn't changed.
+		self.stats = collections.Counter()
+
+	@property
+	def strong_enabled(self) -> bool:
+		return bool(self.max_objects or self.max_bytes)
+
+	def get(self, id_: str, klass: type=None):
+		"""
+		:param id_: The Trello id of the object.
+		:param klass: If provided, only look in the partition for this type.
+		:returns: The object or ``None`` if we don't have it.
+		"""
+		if klass is not None:
+			partition = self._partitions.get(klass)
+			obj = partition.get(id_) if partition is not None else None
+		else:
+			obj = None
+			for partition in self._partitions.values():
+				obj = partition.get(id_)
+				if obj is not None:
+					break
+
+		if obj is None:
+			self.stats['misses'] += 1
+		else:
+			self.stats['hits'] += 1
+			if obj.id in self._strong:
+				self._strong.move_to_end(obj.id)
+			else:
+				self._touch(obj)
+		return obj
+
+	def set(self, obj) -> None:
+		partition = self._partitions.setdefault(type(obj), weakref.WeakValueDictionary())
+		partition[obj.id] = obj
+		self._touch(obj)
+
+	def remove(self, id_: str) -> None:
+		for partition in self._partitions.values():
+			partition.pop(id_, None)
+		self._drop_strong(id_)
+		for indexes in self._indexes.values():
+			for index in indexes.values():
+				index.discard(id_)
+
+	def clear(self) -> None:
+		self._partitions.clear()
+		self._strong.clear()
+		self._strong_bytes = 0
+		for indexes in self._indexes.values():
+			for index in indexes.values():
+				index.clear()
+
+	def hydrated(self, obj, applied: bool=True) -> None:
+		"""
+		Called by objects after their state changes from API data, so that
+		we can keep our bookkeeping up to date.
+
+		:param applied: ``False`` if the data matched what the object was
+			already built from, so its state was left alone.
+		"""
+		if not applied:
+			self.stats['hydrations_skipped'] += 1
+			return
+
+		self.stats['hydrations_applied'] += 1
+		if obj.id in self._strong:
+			self._touch(obj)
+		for index in self._indexes.get(type(obj), {}).values():
+			index.update(obj)
+
+	def values(self, klass: type=None) -> Iterator[Any]:
+		"""
+		Iterates over the live objects in the map.
+
+		:param klass: If provided, only iterate over objects of this type.
+		"""
+		if klass is not None:
+			partitions = [self._partitions.get(klass, {})]
+		else:
+			partitions = list(self._partitions.values())
+		for partition in partitions:
+			# Copy first, objects can disappear while we iterate.
+			for obj in list(partition.values()):
+				yield obj
+
+	def __len__(self) -> int:
+		return sum(len(p) for p in self._partitions.values())
+
+	def __contains__(self, id_: str) -> bool:
+		return any(id_ in p for p in self._partitions.values())
+
+	def info(self) -> dict:
+		"""
+		:returns: A dict summarizing the map's size along with :attr:`stats`.
+		"""
+		info = dict(self.stats)
+		info['objects'] = len(self)
+		info['partitions'] = {klass.__name__: len(p) for klass, p in self._partitions.items()}
+		info['strong_objects'] = len(self._strong)
+		info['strong_bytes'] = self._strong_bytes
+		return info
+
+	#####################################
+	## Freshness
+	#####################################
+	def set_max_age(self, klass: type, max_age: Union[float, None]) -> None:
+		"""
+		:param klass: The type the policy applies to.
+		:param max_age: Number of seconds objects of ``klass`` stay fresh.
+			``None`` means forever.
+		"""
+		self.max_age[klass] = max_age
+
+	def max_age_for(self, obj) -> Union[float, None]:
+		return self.max_age.get(type(obj), self.default_max_age)
+
+	def is_fresh(self, obj, max_age: Union[float, None]=None) -> bool:
+		"""
+		:param obj: The object to check.
+		:param max_age: Overrides the policy for the object's type for this check.
+		:returns: ``False`` if the object was last refreshed longer ago than
+			allowed.
+		"""
+		if max_age is None:
+			max_age = self.max_age_for(obj)
+
+		refreshed_at = getattr(obj, '_refreshed_at', 0)
+		# Objects that have never been refreshed are still being built.
+		if max_age is None or not refreshed_at:
+			return True
+
+		if time.time() - refreshed_at <= max_age:
+			return True
+
+		self.stats['stale_hits'] += 1
+		return False
+
+	#####################################
+	## Secondary indexes
+	#####################################
+	def add_index(self, klass: type, name: str, index: Any) -> Any:
+		"""
+		Registers ``index`` for objects of ``klass`` and fills it with the
+		objects of that type we already have.
+
+		:param index: Has ``update(obj)``, ``discard(id_)`` and ``clear()``
+			methods.
+		:returns: ``index``
+		"""
+		self._indexes.setdefault(klass, {})[name] = index
+		for obj in self.values(klass):
+			if getattr(obj, '_refreshed_at', 0):
+				index.update(obj)
+		return index
+
+	def get_index(self, klass: type, name: str) -> Any:
+		""":returns: The index registered as ``name`` for ``klass``, or ``None``."""
+		return self._indexes.get(klass, {}).get(name)
+
+	def remove_index(self, klass: type, name: str) -> None:
+		self._indexes.get(klass, {}).pop(name, None)
+
+	#####################################
+	## In-flight requests
+	#####################################
+	def get_in_flight(self, id_: str):
+		"""
+		:returns: The future resolving to the object with ``id_`` if it is currently
+			being fetched, otherwise ``None``.
+		"""
+		future = self._in_flight.get(id_)
+		if future is not None:
+			self.stats['in_flight_joins'] += 1
+		return future
+
+	def set_in_flight(self, id_: str, future) -> None:
+		self._in_flight[id_] = future
+
+	def remove_in_flight(self, id_: str) -> None:
+		self._in_flight.pop(id_, None)
 
-def get(id_: str):
-	return _cache.get(id_)
+	#####################################
+	## Strong LRU tier
+	#####################################
+	def _touch(self, obj) -> None:
+		if not self.strong_enabled:
+			return
 
+		self._drop_strong(obj.id)
+		size = self.sizer(obj) if self.max_bytes else 0
+		self._strong[obj.id] = (obj, size)
+		self._strong_bytes += size
+		self._evict()
 
-def set(obj):
-	_cache[obj.id] = obj
+	def _drop_strong(self, id_: str) -> None:
+		entry = self._strong.pop(id_, None)
+		if entry is not None:
+			self._strong_bytes -= entry[1]
 
+	def _evict(self) -> None:
+		while self._strong and self._over_budget():
+			__, (obj, size) = self._strong.popitem(last=False)
+			self._strong_bytes -= size
+			self.stats['evictions'] += 1
 
-def remove(id_: str):
-	del _cache[id_]
+	def _over_budget(self) -> bool:
+		if self.max_objects and len(self._strong) > self.max_objects:
+			return True
+		if self.max_bytes and self._strong_bytes > self.max_bytes:
+			return True
+		return False
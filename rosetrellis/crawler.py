@@ -0,0 +1,259 @@
+"""
+Crawls every board in one or more organizations, recording progress in a
+checkpoint file so that a crawl that fails part way through can pick up where
+it left off.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+from typing import Any, Callable, List, Union
+
+import rosetrellis.trello_client as trello_client
+from rosetrellis.models import Board
+from rosetrellis.util import Synchronizer
+
+
+logger = logging.getLogger(__name__)
+
+#: Seconds to wait before checking the request budget again.
+BUDGET_WAIT = 0.5
+
+
+class Checkpoint:
+	"""
+	Records which boards a crawl has finished in a JSON file.
+
+	The file is rewritten after every board.  It is written to a temporary
+	file that then replaces the checkpoint, so a crash while saving never
+	leaves a half-written checkpoint behind.
+	"""
+
+	def __init__(self, path: str) -> None:
+		"""
+		:param path: Where to keep the checkpoint.  Loaded if it exists.
+		"""
+		self.path = path
+		self.boards = {}
+		self.failed = {}
+		if os.path.exists(path):
+			self.load()
+
+	def load(self) -> None:
+		with open(self.path, encoding='utf-8') as f:
+			data = json.load(f)
+		self.boards = data.get('boards', {})
+		self.failed = data.get('failed', {})
+
+	def save(self) -> None:
+		tmp_path = '{}.tmp'.format(self.path)
+		with open(tmp_path, 'w', encoding='utf-8') as f:
+			json.dump({'boards': self.boards, 'failed': self.failed}, f, indent=1, sort_keys=True)
+		os.replace(tmp_path, self.path)
+
+	def is_done(self, board_id: str) -> bool:
+		return board_id in self.boards
+
+	def mark_done(self, board_id: str, counts: dict) -> None:
+		"""
+		:param board_id: The board we've finished.
+		:param counts: Counts of what we got for the board, like ``{'cards': 10}``.
+		"""
+		self.failed.pop(board_id, None)
+		self.boards[board_id] = dict(counts, finished_at=time.time())
+		self.save()
+
+	def mark_failed(self, board_id: str, error: BaseException) -> None:
+		self.failed[board_id] = repr(error)
+		self.save()
+
+	def reset(self) -> None:
+		"""
+		Forgets all progress so the next crawl starts from scratch.
+		"""
+		self.boards = {}
+		self.failed = {}
+		self.save()
+
+
+class CrawlProgress:
+	"""
+	How far along a crawl is.
+	"""
+
+	def __init__(self, total: int, resumed: int) -> None:
+		"""
+		:param total: Number of boards in the crawl.
+		:param resumed: Number of boards a previous crawl already finished.
+		"""
+		self.total = total
+		self.resumed = resumed
+		self.done = 0  #: Boards finished by this crawl
+		self.failed = 0  #: Boards that failed in this crawl
+		self.objects = 0  #: Objects hydrated by this crawl
+		self.started_at = time.time()
+
+	@property
+	def remaining(self) -> int:
+		return self.total - self.resumed - self.done - self.failed
+
+	@property
+	def elapsed(self) -> float:
+		return time.time() - self.started_at
+
+	@property
+	def boards_per_second(self) -> float:
+		elapsed = self.elapsed
+		return self.done / elapsed if elapsed else 0.0
+
+	@property
+	def objects_per_second(self) -> float:
+		elapsed = self.elapsed
+		return self.objects / elapsed if elapsed else 0.0
+
+	@property
+	def eta(self) -> Union[float, None]:
+		"""
+		Estimated number of seconds until the crawl is finished, or ``None``
+		if we haven't finished a board yet.
+		"""
+		rate = self.boards_per_second
+		if not rate:
+			return None
+		return self.remaining / rate
+
+	def __repr__(self):
+		eta = self.eta
+		return "<CrawlProgress: {}/{} boards ({} resumed, {} failed) {:.2f} boards/s {:.1f} objects/s eta={}>".format(
+			self.resumed + self.done, self.total, self.resumed, self.failed,
+			self.boards_per_second, self.objects_per_second,
+			'?' if eta is None else '{:.0f}s'.format(eta)
+		)
+
+
+class Crawler(Synchronizer):
+	"""
+	Gets every board in the organizations we're given, along with their
+	lists, cards, checklists, labels and members.
+
+	Each board is fetched with a single request using :meth:`.Board.get_full`,
+	at most ``concurrency`` boards at a time.  The client's own limit on
+	simultaneous connections still applies on top of that.  A board isn't
+	started until the client has request budget to spare, and the crawl only
+	uses ``budget_fraction`` of the client's rate limit, leaving the rest for
+	other work sharing the client.
+
+	Progress is kept in a :class:`.Checkpoint`.  Running a crawl again with the
+	same checkpoint skips the boards that were already finished, and retries
+	the boards that failed.
+
+	Because this is a subclass of :class:`~rosetrellis.util.Synchronizer`,
+	:meth:`.crawl` has a synchronous partner, ``crawl_s``.
+	"""
+
+	def __init__(self,
+	             tc: trello_client.TrelloClient,
+	             checkpoint_path: str,
+	             organization_ids: List[str]=None,
+	             concurrency: int=4,
+	             budget_fraction: float=1.0,
+	             on_board: Callable[[Board], Any]=None,
+	             on_progress: Callable[[CrawlProgress], Any]=None) -> None:
+		"""
+		:param tc: Used to communicate with Trello API.
+		:param checkpoint_path: Where to keep the :class:`.Checkpoint`.
+		:param organization_ids: The organizations to crawl.  Defaults to every
+			organization the client's member belongs to.
+		:param concurrency: Maximum number of boards fetched at the same time.
+		:param budget_fraction: The share of the client's rate limit the crawl
+			may use.
+		:param on_board: Called with every :class:`.Board` once it and its
+			related objects are hydrated.  May be a coroutine function.  The
+			board only counts as finished once this returns.
+		:param on_progress: Called with the :class:`.CrawlProgress` after every
+			board.
+		"""
+		self.tc = tc
+		self.checkpoint = Checkpoint(checkpoint_path)
+		self.organization_ids = organization_ids
+		self.concurrency = concurrency
+		self.budget_fraction = budget_fraction
+		self.on_board = on_board
+		self.on_progress = on_progress
+		self.progress = None
+
+	@asyncio.coroutine
+	def crawl(self) -> CrawlProgress:
+		"""
+		A coroutine.
+
+		Crawls every board that isn't finished yet.
+
+		:returns: The final :class:`.CrawlProgress`.  Boards that failed are
+			logged and left in the checkpoint's ``failed`` mapping.
+		"""
+		board_ids = yield from self._get_board_ids()
+		todo = [id_ for id_ in board_ids if not self.checkpoint.is_done(id_)]
+		self.progress = CrawlProgress(len(board_ids), len(board_ids) - len(todo))
+		logger.info("Crawling %s boards, %s already done", len(todo), self.progress.resumed)
+
+		semaphore = asyncio.Semaphore(self.concurrency)
+		if todo:
+			yield from asyncio.wait([self._crawl_board(id_, semaphore) for id_ in todo])
+
+		logger.info("Crawl finished: %r", self.progress)
+		return self.progress
+
+	@asyncio.coroutine
+	def _get_board_ids(self) -> List[str]:
+		# We only need ids here, so we ask for just those.
+		org_ids = self.organization_ids
+		if org_ids is None:
+			member_data = yield from self.tc.get_member("me", fields="idOrganizations")
+			org_ids = member_data['idOrganizations']
+
+		orgs_data = yield from asyncio.gather(*[self.tc.get_organization(id_, fields="idBoards")
+		                                        for id_ in org_ids])
+
+		board_ids = []
+		for org_data in orgs_data:
+			for id_ in org_data['idBoards']:
+				if id_ not in board_ids:
+					board_ids.append(id_)
+		return board_ids
+
+	@asyncio.coroutine
+	def _crawl_board(self, board_id: str, semaphore: asyncio.Semaphore) -> None:
+		with (yield from semaphore):
+			yield from self._wait_for_budget()
+			try:
+				board = yield from Board.get_full(board_id, self.tc)
+				if self.on_board is not None:
+					result = self.on_board(board)
+					if asyncio.iscoroutine(result):
+						yield from result
+			except Exception as e:
+				logger.warning("Crawling board %s failed: %r", board_id, e)
+				self.progress.failed += 1
+				self.checkpoint.mark_failed(board_id, e)
+			else:
+				counts = {attr: len(getattr(board, attr)) for attr in ('lists', 'cards', 'checklists')}
+				self.progress.done += 1
+				self.progress.objects += 1 + sum(counts.values())
+				self.checkpoint.mark_done(board_id, counts)
+
+		logger.debug("%r", self.progress)
+		if self.on_progress is not None:
+			self.on_progress(self.progress)
+
+	@asyncio.coroutine
+	def _wait_for_budget(self) -> None:
+		"""
+		Waits until the client can make a request without eating into the share
+		of the rate limit we leave for others.
+		"""
+		reserve = trello_client.RATE_LIMIT_REQUESTS * (1 - self.budget_fraction)
+		while self.tc.request_budget() <= reserve:
+			yield from asyncio.sleep(BUDGET_WAIT)
@@ -0,0 +1,228 @@
+"""
+Columnar views of card data, for counting and filtering many cards at once
+with NumPy instead of looping over :class:`~rosetrellis.models.Card` objects.
+
+NumPy is an optional dependency.  Install it with
+``pip install rose-trellis[frames]``.
+"""
+import asyncio
+import datetime
+
+from typing import Any, Dict, Iterable, Sequence, Union
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+import rosetrellis.trello_client as trello_client
+
+
+def _require_numpy() -> None:
+	if numpy is None:
+		raise ImportError("CardFrame needs NumPy.  Install it with 'pip install rose-trellis[frames]'.")
+
+
+def _datetimes(values: Iterable[Union[str, None]]):
+	# Trello dates look like '2015-04-01T12:00:00.000Z'.  NumPy wants them
+	# without the zone, and NaT for missing dates.
+	return numpy.array([v.rstrip('Z') if v else 'NaT' for v in values], dtype='datetime64[ms]')
+
+
+class Categorical:
+	"""
+	A column of repeated strings, like list ids, stored as integer codes into
+	a sorted array of the distinct values.
+	"""
+
+	def __init__(self, categories, codes) -> None:
+		self.categories = categories  #: The distinct values, sorted
+		self.codes = codes  #: Index into :attr:`.categories` for each row
+
+	@classmethod
+	def from_values(cls, values: Sequence[Union[str, None]]) -> 'Categorical':
+		categories, codes = numpy.unique(numpy.array([v or '' for v in values], dtype=object),
+		                                 return_inverse=True)
+		return cls(categories, codes.astype(numpy.int32).reshape(-1))
+
+	def code_for(self, value: str) -> int:
+		"""
+		:returns: The code for ``value``, or -1 if no row has it.
+		"""
+		i = numpy.searchsorted(self.categories, value)
+		if i < len(self.categories) and self.categories[i] == value:
+			return int(i)
+		return -1
+
+	def mask(self, value: str):
+		""":returns: A boolean array, ``True`` for the rows equal to ``value``."""
+		return self.codes == self.code_for(value)
+
+	def counts(self) -> Dict[str, int]:
+		""":returns: The number of rows for each value."""
+		counts = numpy.bincount(self.codes, minlength=len(self.categories))
+		return {value: int(count) for value, count in zip(self.categories, counts) if value}
+
+	def take(self, rows) -> 'Categorical':
+		return Categorical(self.categories, self.codes[rows])
+
+	def __len__(self) -> int:
+		return len(self.codes)
+
+
+class RaggedCategorical:
+	"""
+	A column of lists of repeated strings, like label ids, stored as one flat
+	array of codes with each row's slice given by :attr:`.offsets`.
+	"""
+
+	def __init__(self, categories, offsets, codes) -> None:
+		self.categories = categories  #: The distinct values, sorted
+		self.offsets = offsets  #: Row ``i`` is ``codes[offsets[i]:offsets[i + 1]]``
+		self.codes = codes  #: Index into :attr:`.categories` for each value of each row
+
+	@classmethod
+	def from_values(cls, values: Sequence[Union[Sequence[str], None]]) -> 'RaggedCategorical':
+		lengths = numpy.array([len(v) if v else 0 for v in values], dtype=numpy.int64)
+		offsets = numpy.zeros(len(lengths) + 1, dtype=numpy.int64)
+		numpy.cumsum(lengths, out=offsets[1:])
+		flat = numpy.array([item for v in values if v for item in v], dtype=object)
+		if len(flat):
+			categories, codes = numpy.unique(flat, return_inverse=True)
+		else:
+			categories, codes = numpy.array([], dtype=object), numpy.array([], dtype=numpy.int64)
+		return cls(categories, offsets, codes.astype(numpy.int32).reshape(-1))
+
+	def rows(self):
+		""":returns: The row each of :attr:`.codes` belongs to."""
+		return numpy.repeat(numpy.arange(len(self), dtype=numpy.int64), numpy.diff(self.offsets))
+
+	def lengths(self):
+		""":returns: The number of values in each row."""
+		return numpy.diff(self.offsets)
+
+	def contains(self, value: str):
+		""":returns: A boolean array, ``True`` for the rows that include ``value``."""
+		mask = numpy.zeros(len(self), dtype=bool)
+		i = numpy.searchsorted(self.categories, value)
+		if i < len(self.categories) and self.categories[i] == value:
+			mask[self.rows()[self.codes == i]] = True
+		return mask
+
+	def counts(self) -> Dict[str, int]:
+		""":returns: The number of rows including each value."""
+		counts = numpy.bincount(self.codes, minlength=len(self.categories))
+		return {value: int(count) for value, count in zip(self.categories, counts)}
+
+	def take(self, rows) -> 'RaggedCategorical':
+		rows = numpy.arange(len(self))[rows]
+		starts, ends = self.offsets[rows], self.offsets[rows + 1]
+		lengths = ends - starts
+		offsets = numpy.zeros(len(rows) + 1, dtype=numpy.int64)
+		numpy.cumsum(lengths, out=offsets[1:])
+		# The position in self.codes of every value in the taken rows.
+		positions = numpy.repeat(starts - offsets[:-1], lengths) + numpy.arange(offsets[-1])
+		return RaggedCategorical(self.categories, offsets, self.codes[positions])
+
+	def __len__(self) -> int:
+		return len(self.offsets) - 1
+
+
+class CardFrame:
+	"""
+	Card data held in columns, one NumPy array per field, built straight
+	from API payloads without creating :class:`~rosetrellis.models.Card`
+	objects.
+
+	Row ``i`` of every column is the same card.  Filter with boolean arrays::
+
+		frame = yield from CardFrame.from_boards(tc, board_ids)
+		late = frame[frame.overdue() & frame.labels.contains(urgent_label_id)]
+		late.lists.counts()
+	"""
+
+	#: The card fields a frame is built from.  Request these (the
+	#: ``'listing'`` field profile has them all) to keep payloads small.
+	FIELDS = ('closed', 'dateLastActivity', 'due', 'id', 'idBoard', 'idLabels', 'idList',
+	          'idMembers', 'name', 'pos')
+
+	def __init__(self, ids, names, due, date_last_activity, pos, closed,
+	             lists: Categorical, boards: Categorical,
+	             labels: RaggedCategorical, members: RaggedCategorical) -> None:
+		_require_numpy()
+		self.ids = ids  #: Card ids
+		self.names = names  #: Card names
+		self.due = due  #: ``datetime64[ms]``, NaT for cards without a due date
+		self.date_last_activity = date_last_activity  #: ``datetime64[ms]``
+		self.pos = pos  #: ``float64``
+		self.closed = closed  #: ``bool``
+		self.lists = lists  #: ``idList`` as a :class:`.Categorical`
+		self.boards = boards  #: ``idBoard`` as a :class:`.Categorical`
+		self.labels = labels  #: ``idLabels`` as a :class:`.RaggedCategorical`
+		self.members = members  #: ``idMembers`` as a :class:`.RaggedCategorical`
+
+	@classmethod
+	def from_datas(cls, datas: Sequence[dict]) -> 'CardFrame':
+		"""
+		:param datas: Card data as returned by the Trello API.
+		"""
+		_require_numpy()
+		datas = list(datas)
+		return cls(
+			ids=numpy.array([d['id'] for d in datas], dtype=object),
+			names=numpy.array([d.get('name') for d in datas], dtype=object),
+			due=_datetimes(d.get('due') for d in datas),
+			date_last_activity=_datetimes(d.get('dateLastActivity') for d in datas),
+			pos=numpy.array([d.get('pos') or 0 for d in datas], dtype=numpy.float64),
+			closed=numpy.array([bool(d.get('closed')) for d in datas], dtype=bool),
+			lists=Categorical.from_values([d.get('idList') for d in datas]),
+			boards=Categorical.from_values([d.get('idBoard') for d in datas]),
+			labels=RaggedCategorical.from_values([d.get('idLabels') for d in datas]),
+			members=RaggedCategorical.from_values([d.get('idMembers') for d in datas]),
+		)
+
+	@classmethod
+	def from_cards(cls, cards: Iterable[Any]) -> 'CardFrame':
+		"""
+		:param cards: :class:`~rosetrellis.models.Card` objects.  The frame is
+			built from the data they were hydrated from.
+		"""
+		return cls.from_datas([card._raw_data for card in cards])
+
+	@classmethod
+	@asyncio.coroutine
+	def from_boards(cls, tc: trello_client.TrelloClient, board_ids: Sequence[str],
+	                filter: str=None) -> 'CardFrame':
+		"""
+		A coroutine.
+
+		Builds a frame of every card on ``board_ids``, one request per board.
+
+		:param filter: See :meth:`.TrelloClient.get_board_cards`.
+		"""
+		_require_numpy()
+		payloads = yield from asyncio.gather(*[tc.get_board_cards(id_, filter=filter) for id_ in board_ids])
+		return cls.from_datas([data for payload in payloads for data in payload])
+
+	def overdue(self, now: datetime.datetime=None):
+		"""
+		:param now: A naive UTC datetime.  Defaults to now.
+		:returns: A boolean array, ``True`` for open cards whose due date has
+			passed.
+		"""
+		now = numpy.datetime64(now if now is not None else datetime.datetime.utcnow(), 'ms')
+		return ~numpy.isnat(self.due) & (self.due < now) & ~self.closed
+
+	def __getitem__(self, rows) -> 'CardFrame':
+		"""
+		:param rows: A boolean array, an array of row numbers or a slice.
+		"""
+		return CardFrame(self.ids[rows], self.names[rows], self.due[rows], self.date_last_activity[rows],
+		                 self.pos[rows], self.closed[rows], self.lists.take(rows), self.boards.take(rows),
+		                 self.labels.take(rows), self.members.take(rows))
+
+	def __len__(self) -> int:
+		return len(self.ids)
+
+	def __repr__(self) -> str:
+		return "<CardFrame: {} cards on {} lists>".format(len(self), len(numpy.unique(self.lists.codes)))
@@ -0,0 +1,296 @@
+"""
+A read-only, memory-mapped store of card, list and label data, for working
+with far more objects than fit in memory as :class:`.TrelloObject` instances.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import mmap
+import os
+import struct
+
+from typing import Any, Iterable, Iterator, List, Tuple, Union
+
+import rosetrellis.trello_client as trello_client
+from rosetrellis.models import Card, Label, Lists, TrelloObject
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'RTMS'
+VERSION = 1
+
+#: Trello ids are 24 hex digits.
+ID_WIDTH = 24
+
+# magic, version, id width, number of records, offset of the index
+_HEADER = struct.Struct('<4sHHIQ')
+# id, type code, offset of the record, length of the record
+_ENTRY = struct.Struct('<{}sBQI'.format(ID_WIDTH))
+
+
+class RecordView:
+	"""
+	A read-only view of one object's API data in a :class:`.MappedStore`.
+
+	Only the id is known up front.  The record is decoded from the mapped
+	file the first time any other field is read, and API fields are then
+	available as attributes, like ``view.name``.
+	"""
+
+	#: The :class:`.TrelloObject` subclass whose data this views.
+	KLASS = None
+
+	__slots__ = ('id', '_store', '_offset', '_length', '_data')
+
+	def __init__(self, store: 'MappedStore', id_: str, offset: int, length: int) -> None:
+		self.id = id_
+		self._store = store
+		self._offset = offset
+		self._length = length
+		self._data = None
+
+	@property
+	def raw(self) -> dict:
+		"""
+		The object's API data.
+		"""
+		if self._data is None:
+			self._data = self._store._decode(self._offset, self._length)
+		return self._data
+
+	@asyncio.coroutine
+	def to_object(self, tc: trello_client.TrelloClient) -> TrelloObject:
+		"""
+		A coroutine.
+
+		Builds (or updates the cached) :class:`.TrelloObject` from this
+		record, without inflating its relations.
+		"""
+		return (yield from self.KLASS.get(dict(self.raw), tc, inflate_children=False))
+
+	def __getattr__(self, name: str) -> Any:
+		if name.startswith('_'):
+			raise AttributeError(name)
+		try:
+			return self.raw[name]
+		except KeyError:
+			raise AttributeError("{} has no field '{}'".format(type(self).__name__, name))
+
+	def __eq__(self, other: Any) -> bool:
+		if type(other) is type(self):
+			return self.id == other.id and self._store is other._store
+		return NotImplemented
+
+	def __hash__(self) -> int:
+		return hash(self.id)
+
+	def __repr__(self) -> str:
+		return "<{}: {}>".format(type(self).__name__, self.id)
+
+
+class LabelView(RecordView):
+	KLASS = Label
+	__slots__ = ()
+
+
+class ListView(RecordView):
+	KLASS = Lists
+	__slots__ = ()
+
+	@property
+	def cards(self) -> List['CardView']:
+		"""
+		The cards in the store that are on this list.  Scans every record.
+		"""
+		return [card for card in self._store.values(Card) if card.raw.get('idList') == self.id]
+
+
+class CardView(RecordView):
+	KLASS = Card
+	__slots__ = ()
+
+	@property
+	def list(self) -> Union[ListView, None]:
+		return self._store.get(self.raw.get('idList'))
+
+	@property
+	def labels(self) -> List[LabelView]:
+		"""
+		The card's labels that are in the store.
+		"""
+		ids = self.raw.get('idLabels') or [l['id'] for l in self.raw.get('labels', [])]
+		return [view for view in (self._store.get(id_) for id_ in ids) if view is not None]
+
+
+#: Type code -> view class.  Codes are part of the file format, don't reuse them.
+VIEW_CLASSES = {
+	1: CardView,
+	2: ListView,
+	3: LabelView,
+}
+_TYPE_CODES = {view.KLASS: code for code, view in VIEW_CLASSES.items()}
+
+
+def _encode_id(id_: str) -> bytes:
+	encoded = id_.encode('ascii')
+	if len(encoded) > ID_WIDTH:
+		raise ValueError("Ids longer than {} characters can't be stored: '{}'".format(ID_WIDTH, id_))
+	return encoded
+
+
+class MappedStore:
+	"""
+	A file of card, list and label records, followed by an index of their
+	offsets sorted by id.
+
+	The file is memory-mapped read-only, so opening it is instant whatever
+	its size, looking an id up is a binary search of the index, and the
+	operating system shares the pages between every process that opens the
+	same file.  Records are only decoded when a view's fields are read.
+
+	Write one with :meth:`.write`::
+
+		MappedStore.write('cards.rtms', tc.obj_cache.values())
+		with MappedStore('cards.rtms') as store:
+			card = store.get(card_id)
+			print(card.name, card.list.name)
+	"""
+
+	def __init__(self, path: str) -> None:
+		"""
+		:param path: A file written by :meth:`.write`.
+		:raises ValueError: If the file isn't a store we can read.
+		"""
+		self.path = path
+		self._file = open(path, 'rb')
+		try:
+			self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+		except ValueError:
+			self._file.close()
+			raise ValueError("{} is empty".format(path))
+
+		magic, version, id_width, count, index_offset = _HEADER.unpack_from(self._buffer, 0)
+		if magic != MAGIC or version != VERSION or id_width != ID_WIDTH:
+			self.close()
+			raise ValueError("{} isn't a version {} mapped store".format(path, VERSION))
+		self._count = count
+		self._index_offset = index_offset
+		self._ids = _IndexIds(self)
+
+	@classmethod
+	def write(cls, path: str, items: Iterable[Union[TrelloObject, Tuple[type, dict]]]) -> int:
+		"""
+		Writes a store.  Items of types we don't store are skipped.
+
+		:param path: Where to write the store.  Replaced once it's complete.
+		:param items: :class:`.TrelloObject` instances, or
+			``(TrelloObject subclass, API data)`` pairs.  Data is streamed to
+			disk as it comes, only the index is held in memory.
+		:returns: The number of records written.
+		"""
+		index = []
+		tmp_path = '{}.tmp'.format(path)
+		with open(tmp_path, 'wb') as f:
+			f.write(_HEADER.pack(MAGIC, VERSION, ID_WIDTH, 0, 0))
+			for item in items:
+				if isinstance(item, TrelloObject):
+					klass, data = type(item), item.__dict__.get('_raw_data')
+				else:
+					klass, data = item
+				code = _TYPE_CODES.get(klass)
+				if code is None or not data:
+					continue
+
+				record = json.dumps(data, separators=(',', ':')).encode('utf-8')
+				index.append((_encode_id(data['id']), code, f.tell(), len(record)))
+				f.write(record)
+
+			index.sort()
+			for i in range(1, len(index)):
+				if index[i][0] == index[i - 1][0]:
+					raise ValueError("Id '{}' is in the store twice".format(index[i][0].decode('ascii')))
+
+			index_offset = f.tell()
+			for entry in index:
+				f.write(_ENTRY.pack(*entry))
+
+			f.seek(0)
+			f.write(_HEADER.pack(MAGIC, VERSION, ID_WIDTH, len(index), index_offset))
+
+		os.replace(tmp_path, path)
+		logger.info("Wrote %s records to %s", len(index), path)
+		return len(index)
+
+	def get(self, id_: Union[str, None]) -> Union[RecordView, None]:
+		"""
+		:returns: A view of the record with ``id_``, or ``None`` if there
+			isn't one.
+		"""
+		if not id_:
+			return None
+		try:
+			key = _encode_id(id_)
+		except (ValueError, UnicodeEncodeError):
+			return None
+
+		i = bisect.bisect_left(self._ids, key)
+		if i == self._count or self._ids[i] != key:
+			return None
+		return self._view(i)
+
+	def values(self, klass: type=None) -> Iterator[RecordView]:
+		"""
+		Iterates over views of every record, in id order.
+
+		:param klass: If provided, only records of this type.
+		"""
+		code = _TYPE_CODES.get(klass) if klass is not None else None
+		if klass is not None and code is None:
+			return
+		for i in range(self._count):
+			if code is None or self._entry(i)[1] == code:
+				yield self._view(i)
+
+	def close(self) -> None:
+		self._buffer.close()
+		self._file.close()
+
+	def __len__(self) -> int:
+		return self._count
+
+	def __contains__(self, id_: str) -> bool:
+		return self.get(id_) is not None
+
+	def __enter__(self) -> 'MappedStore':
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self.close()
+
+	def _entry(self, i: int) -> tuple:
+		return _ENTRY.unpack_from(self._buffer, self._index_offset + i * _ENTRY.size)
+
+	def _view(self, i: int) -> RecordView:
+		raw_id, code, offset, length = self._entry(i)
+		return VIEW_CLASSES[code](self, raw_id.rstrip(b'\0').decode('ascii'), offset, length)
+
+	def _decode(self, offset: int, length: int) -> dict:
+		return json.loads(self._buffer[offset:offset + length].decode('utf-8'))
+
+
+class _IndexIds:
+	"""
+	The ids in a store's index as a sequence, for :mod:`bisect`.
+	"""
+
+	def __init__(self, store: MappedStore) -> None:
+		self.store = store
+
+	def __len__(self) -> int:
+		return self.store._count
+
+	def __getitem__(self, i: int) -> bytes:
+		# Ids shorter than ID_WIDTH are padded with zero bytes.
+		return self.store._entry(i)[0].rstrip(b'\0')
@@ -3,20 +3,20 @@ Contains models for the various objects we get from Trello.
 """
 import abc
 import asyncio
+import collections
 import logging
 import operator
 import time
 import itertools
 import datetime
-import re
 
-from dateutil import parser
 from typing import Any, List, Union, Sequence, Callable, Tuple, Dict
 from rosetrellis import util
 
-import rosetrellis.base.obj_cache as obj_cache
 import rosetrellis.trello_client as trello_client
 from rosetrellis.util import Synchronizer, make_sequence_attrgetter
+from rosetrellis.streams import TrelloObjectStream
+from rosetrellis.base.indexes import FieldIndex, SortedIndex
 
 
 logger = logging.getLogger(__name__)
@@ -24,6 +24,12 @@ logger = logging.getLogger(__name__)
 id_getter = operator.attrgetter('id')
 ids_getter = make_sequence_attrgetter('id')
 
+# API_FIELDS -> StateTransformers built for them.  See TrelloObject._cached_transformers.
+_transformers_cache = {}
+
+# API_FIELDS -> frozenset of them.  See TrelloObject._api_field_set.
+_field_sets = {}
+
 
 class IsCoroutineError(Exception):
 	pass
@@ -41,7 +47,9 @@ class StateTransformer:
 	             api_name: str,
 	             state_name: str,
 	             api_transformer: Union[Callable[Any], str]=None,
-	             state_transformer: Union[Callable[Any], str]=None) -> None:
+	             state_transformer: Union[Callable[Any], str]=None,
+	             relation_class: type=None,
+	             many: bool=False) -> None:
 		"""
 		There are three possible types of transformer:
 
@@ -62,12 +70,18 @@ class StateTransformer:
 		:param state_name: Name of the attribute on :class:`.TrelloObject` instances.
 		:param api_transformer: Used to transform from API value to state value.
 		:param state_transformer: Used to transform from state value to API value.
+		:param relation_class: If this transformer turns ids (or nested data) into
+			instances of a :class:`.TrelloObject` subclass, that subclass.  Lets
+			bulk hydration resolve relations for many objects at once.
+		:param many: Whether the API value is a list of related objects.
 		"""
 
 		self.api_name = api_name
 		self.state_name = state_name
 		self.api_transformer = api_transformer
 		self.state_transformer = state_transformer
+		self.relation_class = relation_class
+		self.many = many
 
 	def __repr__(self):
 		return "<StateTransformer: api_name={} state_name={} api_transformer={} state_transformer={}>".format(
@@ -75,17 +89,240 @@ class StateTransformer:
 		)
 
 
+class _RelationResolver:
+	"""
+	Collects the related objects that a batch of objects being hydrated refer
+	to, and then resolves each distinct related object once for the whole batch.
+	"""
+
+	def __init__(self, tc: trello_client.TrelloClient, fetch_missing: bool=True) -> None:
+		self.tc = tc
+		self.fetch_missing = fetch_missing
+		# relation class -> {id: nested data or None}
+		self._wanted = collections.OrderedDict()
+		# (obj, transformer, value) waiting on related objects
+		self._assignments = []
+		# coroutines for transformers we can't batch
+		self._others = []
+
+	def add(self, obj, transformer: StateTransformer, value: Any, transformer_func: Callable[..., Any]) -> None:
+		klass = getattr(transformer, 'relation_class', None)
+		if klass is None:
+			self._others.append(obj._inflator(transformer.state_name, value, transformer_func))
+			return
+
+		wanted = self._wanted.setdefault(klass, collections.OrderedDict())
+		for item in (value if transformer.many else [value]):
+			if isinstance(item, dict):
+				wanted[item['id']] = item
+			else:
+				wanted.setdefault(item, None)
+		self._assignments.append((obj, transformer, value))
+
+	@asyncio.coroutine
+	def resolve(self) -> None:
+		"""
+		A coroutine.
+
+		Resolves every related object we've collected and sets them on the
+		objects that refer to them.
+		"""
+		klasses = list(self._wanted)
+		results = yield from asyncio.gather(*[self._resolve_class(klass, self._wanted[klass])
+		                                      for klass in klasses])
+		resolved = dict(zip(klasses, results))
+
+		for obj, transformer, value in self._assignments:
+			found = resolved[transformer.relation_class]
+			if transformer.many:
+				ids = [item['id'] if isinstance(item, dict) else item for item in value]
+				related = TrelloObjectCollection(found[id_] for id_ in ids if id_ in found)
+				complete = len(related) == len(ids)
+			else:
+				id_ = value['id'] if isinstance(value, dict) else value
+				related = found.get(id_)
+				complete = related is not None
+
+			if complete:
+				obj._set_clean(transformer.state_name, related)
+			else:
+				# Leave the raw value where the user can find it, and remember
+				# that hydrating again with the same data could do better.
+				obj._relations_incomplete = True
+				obj._set_clean(transformer.api_name, value)
+				if related:
+					obj._set_clean(transformer.state_name, related)
+
+		if self._others:
+			yield from asyncio.wait(self._others)
+
+	@asyncio.coroutine
+	def _resolve_class(self, klass: type, wanted: dict) -> dict:
+		found = {}
+		datas = [data for data in wanted.values() if data is not None]
+		if datas:
+			for obj in (yield from klass.hydrate_many(datas, self.tc, fetch_missing=self.fetch_missing)):
+				found[obj.id] = obj
+
+		missing = []
+		for id_, data in wanted.items():
+			if data is not None:
+				continue
+			obj = self.tc.obj_cache.get(id_, klass)
+			if obj is not None:
+				found[id_] = obj
+			else:
+				missing.append(id_)
+
+		if missing and self.fetch_missing:
+			found.update((yield from self._fetch(klass, missing)))
+
+		return found
+
+	@asyncio.coroutine
+	def _fetch(self, klass: type, ids: List[str]) -> dict:
+		"""
+		Fetches and hydrates the objects for ``ids`` with batch requests,
+		waiting on any of them that are already being requested.
+		"""
+		found = {}
+		waiting = []
+		to_fetch = []
+		for id_ in ids:
+			in_flight = self.tc.obj_cache.get_in_flight(id_)
+			if in_flight is not None:
+				waiting.append(asyncio.shield(in_flight))
+			else:
+				to_fetch.append(id_)
+
+		futures = {id_: asyncio.Future() for id_ in to_fetch}
+		for id_, future in futures.items():
+			self.tc.obj_cache.set_in_flight(id_, future)
+
+		try:
+			if to_fetch:
+				datas = yield from klass._get_many_data(to_fetch, self.tc)
+				for obj in (yield from klass.hydrate_many(datas, self.tc)):
+					found[obj.id] = obj
+		except BaseException as e:
+			for future in futures.values():
+				future.set_exception(e)
+				future.exception()
+			raise
+		else:
+			for id_, future in futures.items():
+				future.set_result(found.get(id_))
+		finally:
+			for id_ in to_fetch:
+				self.tc.obj_cache.remove_in_flight(id_)
+
+		if waiting:
+			for obj in (yield from asyncio.gather(*waiting, return_exceptions=True)):
+				if isinstance(obj, TrelloObject):
+					found[obj.id] = obj
+
+		return found
+
+
+@asyncio.coroutine
+def hydrate_together(groups: List[Tuple[type, List[dict]]], tc: trello_client.TrelloClient,
+                     inflate_children=True, fetch_missing=True, **kwargs) -> list:
+	"""
+	A coroutine.
+
+	Like :meth:`.TrelloObject.hydrate_many`, but for data of several types at
+	once.  Every object in ``groups`` is in the object cache before any
+	relations are resolved, so objects that refer to each other are wired
+	together without requesting anything.
+
+	:param groups: A list of ``(TrelloObject subclass, list of data)`` pairs.
+	:param tc: Used to communicate with Trello API.
+	:param inflate_children: If set to ``False``, we won't automatically
+		inflate related objects.
+	:param fetch_missing: If set to ``False``, related objects are only taken
+		from the object cache.
+	:returns: A list of objects for each group, in the same order as ``groups``.
+	"""
+	resolver = _RelationResolver(tc, fetch_missing=fetch_missing)
+	staged = [klass._stage_many(datas, tc, resolver, inflate_children=inflate_children, **kwargs)
+	          for klass, datas in groups]
+
+	yield from resolver.resolve()
+
+	for objs, unchanged in staged:
+		for obj in objs:
+			obj._hydrated(applied=obj.id not in unchanged)
+
+	return [objs for objs, __ in staged]
+
+
+class _DispatchIndex:
+	"""
+	Precomputed lookups for finding the :class:`.TrelloObject` subclass that
+	handles some API data or an API key.
+	"""
+
+	def __init__(self, subclasses: Sequence[type]) -> None:
+		self.subclasses = tuple(subclasses)
+
+		#: The exact set of API fields -> class
+		self.signatures = {}
+		#: API key only one class has in its API fields -> class
+		self.discriminators = {}
+		#: API relation key -> class
+		self.api_keys = {}
+
+		field_owners = collections.defaultdict(list)
+		for subclass in self.subclasses:
+			fields = subclass._api_field_set()
+			self.signatures.setdefault(fields, subclass)
+			for field in fields:
+				field_owners[field].append(subclass)
+			for api_key in subclass._get_api_keys():
+				self.api_keys.setdefault(api_key, subclass)
+
+		for field, owners in field_owners.items():
+			if len(owners) == 1:
+				self.discriminators[field] = owners[0]
+
+	def class_for_data(self, data: dict) -> Union[type, None]:
+		keys = frozenset(data)
+		klass = self.signatures.get(keys)
+		if klass is not None:
+			return klass
+
+		# Partial data.  Only accept it if it has keys that just one class
+		# has, and all of its keys belong to that class.
+		candidates = {self.discriminators[k] for k in keys if k in self.discriminators}
+		if len(candidates) == 1:
+			klass = candidates.pop()
+			if keys <= klass._api_field_set():
+				return klass
+		return None
+
+
+_dispatch_index = None
+
+
+def _get_dispatch_index() -> _DispatchIndex:
+	global _dispatch_index
+	subclasses = tuple(TrelloObject.__subclasses__())
+	if _dispatch_index is None or _dispatch_index.subclasses != subclasses:
+		_dispatch_index = _DispatchIndex(subclasses)
+	return _dispatch_index
+
+
 def get_class_for_data(data: dict):
-	for subclass in TrelloObject.__subclasses__():
-		if subclass.is_valid_data(data):
-			return subclass
+	"""
+	:param data: Data from the API for a single object.
+	:returns: The :class:`.TrelloObject` subclass for ``data``, or ``None`` if
+		we can't tell.
+	"""
+	return _get_dispatch_index().class_for_data(data)
 
 
 def get_class_for_api_key(api_key: str):
-	classes = TrelloObject.__subclasses__()
-	for subclass in TrelloObject.__subclasses__():
-		if api_key in subclass._get_api_keys():
-			return subclass
+	return _get_dispatch_index().api_keys.get(api_key)
 
 
 @asyncio.coroutine
@@ -103,18 +340,71 @@ def get_obj_instance_for_data_s(data: dict, tc: trello_client.TrelloClient, infl
 	)
 
 
+@asyncio.coroutine
+def _single_flight(tc: trello_client.TrelloClient, id_: str, coro_func: Callable[[], Any]):
+	"""
+	A coroutine.
+
+	Runs the coroutine returned by ``coro_func`` unless a request for ``id_`` is
+	already in flight, in which case we wait on that request instead.
+
+	:param tc: The client whose object cache tracks in-flight requests.
+	:param id_: The id of the object being requested.
+	:param coro_func: Called with no arguments to get the coroutine to run.
+	:returns: The result of the coroutine.
+	"""
+	in_flight = tc.obj_cache.get_in_flight(id_)
+	if in_flight is not None:
+		logger.debug("Object is already being requested, waiting on that request.")
+		return (yield from asyncio.shield(in_flight))
+
+	future = asyncio.Future()
+	tc.obj_cache.set_in_flight(id_, future)
+	try:
+		result = yield from coro_func()
+	except BaseException as e:
+		future.set_exception(e)
+		# Nobody may be waiting on this future; mark the exception as retrieved.
+		future.exception()
+		raise
+	else:
+		future.set_result(result)
+	finally:
+		tc.obj_cache.remove_in_flight(id_)
+
+	return result
+
+
 def transform_date_from_api(date_str: str) -> datetime.datetime:
 	# parse date fields into datetime objects
 	try:
-		return parser.parse(date_str)
+		return util.parse_date(date_str)
 	except ValueError:
 		return
 
 
 def transform_date_from_state(dt: datetime.datetime) -> str:
-	dt_str = dt.isoformat()
-	dt_str = re.sub("\+00:00$", "Z", dt_str)
-	return dt_str
+	if dt is None:
+		return None
+	return util.format_date(dt)
+
+
+def _index_date(value: Union[datetime.datetime, str, None]) -> Union[str, None]:
+	"""
+	Formats ``value`` like the due dates in :meth:`.Card.query`'s index.
+	"""
+	if value is None or isinstance(value, str):
+		return value
+	if value.tzinfo is None:
+		value = value.replace(tzinfo=datetime.timezone.utc)
+	return util.format_date(value.astimezone(datetime.timezone.utc))
+
+
+def is_date_field(api_name: str) -> bool:
+	"""
+	:returns: Whether the API field with this name holds a date.
+	"""
+	return 'date' in api_name or api_name == 'due'
 
 
 class TrelloObjectCollection(list, Synchronizer):
@@ -132,8 +422,8 @@ class TrelloObjectCollection(list, Synchronizer):
 
 	@asyncio.coroutine
 	def save(self):
-		"""Save all objects in this list."""
-		save_coros = [obj.save() for obj in self]
+		"""Save all objects in this list that have changes."""
+		save_coros = [obj.save() for obj in self if obj.is_dirty]
 		yield from asyncio.gather(*save_coros)
 
 	@asyncio.coroutine
@@ -186,6 +476,10 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 	API_NESTED_MANY_KEY = ''  #: Name of key for when Trello nests the JSON for multiple objects in another instance
 	API_NESTED_SINGLE_KEY = ''  #: Name of key for when Trello nests the JSON for a single object in another object
 
+	#: Named sets of :attr:`.API_FIELDS` to request.  Maps profile names to a
+	#: tuple of field names or ``'all'``.  See :meth:`._fields_for`.
+	FIELD_PROFILES = {'full': 'all'}
+
 	def __init__(self, tc: trello_client.TrelloClient, *args, **kwargs) -> None:
 		"""
 		:param tc: An instance of :class:`.TrelloClient` for us to use for Trello
@@ -194,7 +488,7 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 			for the fields needed to POST a new object.
 		"""
 
-		self.API_STATE_TRANSFORMERS = TrelloObject._make_transformers(self.API_FIELDS)
+		self.API_STATE_TRANSFORMERS = TrelloObject._cached_transformers(self.API_FIELDS)
 		required_attrs = ['API_FIELDS', 'API_SINGLE_KEY', 'STATE_SINGLE_ATTR',
 		                  'API_MANY_KEY', 'STATE_MANY_ATTR', 'API_NESTED_MANY_KEY',
 		                  'API_NESTED_SINGLE_KEY']
@@ -214,19 +508,150 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 		self._refreshed_at = 0
 		self.id = kwargs.get('id', None)
 
+		# Names of public attributes assigned to since they were last set from
+		# API data.  Only these are considered when working out what to save.
+		self._dirty = set()
+
+	def __getattr__(self, name: str) -> Any:
+		# Only called for attributes we don't have.  If that's because the
+		# field wasn't requested, we fetch it.
+		api_key = self._unfetched_api_key(name)
+		if api_key is None:
+			raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, name))
+
+		loop = asyncio.get_event_loop()
+		if loop.is_running():
+			raise AttributeError("'{}' wasn't fetched for {} '{}'.  Get it with 'yield from "
+			                     "obj.fetch_fields({!r})'".format(api_key, type(self).__name__, self.id, api_key))
+
+		loop.run_until_complete(self.fetch_fields(api_key))
+		return object.__getattribute__(self, name)
+
+	def _unfetched_api_key(self, name: str) -> Union[str, None]:
+		"""
+		:returns: The API field for attribute ``name`` if this object came from
+			the API without it, otherwise ``None``.
+		"""
+		if name.startswith('_') or self.__dict__.get('_raw_data') is None or not self.__dict__.get('id'):
+			return None
+
+		fields = self._api_field_set()
+		if name in fields:
+			api_key = name
+		else:
+			transformer = self._get_transformer_for_state_attr(name)
+			api_key = transformer.api_name if transformer else None
+
+		if api_key in fields and api_key not in self._raw_data:
+			return api_key
+		return None
+
+	def __setattr__(self, name: str, value: Any) -> None:
+		super(TrelloObject, self).__setattr__(name, value)
+		dirty = self.__dict__.get('_dirty')
+		if dirty is not None and not name.startswith('_'):
+			dirty.add(name)
+
+	def _set_clean(self, name: str, value: Any) -> None:
+		"""
+		Sets an attribute from API data without marking it as changed.
+		"""
+		object.__setattr__(self, name, value)
+		self._dirty.discard(name)
+
+	def mark_dirty(self, *names: str) -> None:
+		"""
+		Marks attributes as changed so that :meth:`.save` sends them.
+
+		Assigning to an attribute marks it for you.  You only need this after
+		changing a value in place, like appending to ``card.labels``.
+
+		:param names: The attribute names.
+		"""
+		self._dirty.update(names)
+
+	@property
+	def is_dirty(self) -> bool:
+		"""
+		Whether :meth:`.save` has anything to do.
+		"""
+		return not self.id or bool(self._dirty)
+
 	@classmethod
-	def is_valid_data(cls, data: dict) -> dict:
-		extra_api_keys = []
-		missing_api_keys = []
-		for k in data:
-			if k not in cls.API_FIELDS:
-				extra_api_keys.append(k)
-		for f in cls.API_FIELDS:
-			if f not in data:
-				missing_api_keys.append(f)
+	def is_valid_data(cls, data: dict, partial: bool=False) -> Tuple[bool, List[str], List[str]]:
+		"""
+		Checks that ``data`` has exactly the keys in :attr:`.API_FIELDS`.
+
+		:param partial: If ``True``, ``data`` only needs to have keys we know
+			about, like when only some fields were requested.
+		:returns: A tuple of whether the data is valid, the keys we don't know
+			about and the keys that are missing.
+		"""
+		fields = cls._api_field_set()
+		if data.keys() == fields:
+			return True, [], []
+
+		extra_api_keys = [k for k in data if k not in fields]
+		missing_api_keys = [f for f in cls.API_FIELDS if f not in data]
 
+		if partial:
+			return (not extra_api_keys and 'id' in data, extra_api_keys, missing_api_keys)
 		return (not (extra_api_keys or missing_api_keys), extra_api_keys, missing_api_keys)
 
+	@classmethod
+	def _fields_for(cls, tc: trello_client.TrelloClient, fields: Union[str, Sequence[str], None]=None) -> str:
+		"""
+		Works out which fields to request.
+
+		:param fields: The name of one of our :attr:`.FIELD_PROFILES`, a
+			sequence of field names, or ``None`` to use the profile ``tc`` is set
+			to use for this class (see :meth:`.TrelloClient.set_field_profile`).
+		:raises ValueError: If ``fields`` names a profile we don't have.
+		:returns: ``'all'`` or a comma-separated list of field names.
+		"""
+		if fields is None:
+			# Not every client (like a Mock) carries profiles.
+			profiles = getattr(tc, 'field_profiles', None) or {}
+			fields = profiles.get(cls) or getattr(tc, 'field_profile', None) or 'full'
+			# The client's default profile may not apply to every type.
+			if fields not in cls.FIELD_PROFILES:
+				fields = 'full'
+
+		if isinstance(fields, str):
+			if fields == 'all':
+				return fields
+			if fields not in cls.FIELD_PROFILES:
+				raise ValueError("{} has no field profile named '{}'".format(cls.__name__, fields))
+			fields = cls.FIELD_PROFILES[fields]
+			if fields == 'all':
+				return fields
+
+		return ','.join(sorted(set(fields) | {'id'}))
+
+	@classmethod
+	def _fields_kwargs(cls, tc: trello_client.TrelloClient, fields: Union[str, Sequence[str], None]=None) -> dict:
+		"""
+		:returns: Keyword arguments for :meth:`._get_data` asking for
+			``fields``.  Empty if we want all of them, which is the default.
+		"""
+		fields = cls._fields_for(tc, fields)
+		return {} if fields == 'all' else {'fields': fields}
+
+	@classmethod
+	def _api_field_set(cls) -> frozenset:
+		"""
+		:returns: :attr:`.API_FIELDS` as a frozenset for fast membership tests.
+		"""
+		fields = cls.API_FIELDS
+		try:
+			return _field_sets[fields]
+		except KeyError:
+			field_set = _field_sets[fields] = frozenset(fields)
+			return field_set
+		except TypeError:
+			# API_FIELDS isn't hashable, so we can't cache it.
+			return frozenset(fields)
+
 	#####################################
 	## API Retrieval methods
 	#####################################
@@ -235,6 +660,9 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 	def get(cls, data_or_id: Union[str, dict],
 	        tc: trello_client.TrelloClient,
 	        inflate_children=True,
+	        max_age: Union[float, None]=None,
+	        background_refresh: bool=False,
+	        fields: Union[str, Sequence[str], None]=None,
 	        **kwargs):
 		"""
 		A coroutine.
@@ -243,7 +671,12 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 
 		If provided with a string ID, we attempt to get the object from our
 		object cache. If that fails we build a new object out of data from
-		provided TrelloClient.
+		provided TrelloClient.  Concurrent calls for the same ID share a single
+		request and all get the same instance.
+
+		If the cached object is older than the max-age policy for its type
+		(see :class:`~rosetrellis.base.obj_cache.ObjectCache`), we refresh it
+		before returning it.
 
 		If provided with a mapping of key-value pairs, we build an object out
 		of that data.
@@ -258,6 +691,17 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 			a :class:`.Card`.  You will have to just rely on the
 			``idBoard`` attribute in that case.
 
+		:param max_age: Overrides the max-age policy for this call.  Use a large
+			value to accept whatever is cached or ``0`` to always refresh.
+
+		:param background_refresh: If ``True``, a stale cached object is
+			returned immediately and refreshed in the background.
+
+		:param fields: Which fields to request if we need to get the object from
+			the API.  Either the name of one of :attr:`.FIELD_PROFILES` or a list
+			of field names.  Defaults to the profile ``tc`` uses for this type.
+			Fields that weren't requested are fetched when first accessed.
+
 		:raises TypeError: if you don't provide a string or a dict for `data_or_id`.
 		:raises ValueError: if you don't provide a dict with an 'id' key.
 
@@ -278,27 +722,25 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 		else:
 			raise TypeError("Must provide either a str id or a dict of object data")
 
-		obj = obj_cache.get(id_)
+		obj = tc.obj_cache.get(id_, cls)
 
 		if obj is None and not data:
-			logger.debug("No cached object and no provided data, requesting data from TrelloClient.")
-			resp = yield from cls._get_data(id_, tc, **kwargs)
-			is_valid, extra, missing = cls.is_valid_data(resp)
-			if not is_valid:
-				raise ValueError("Received incorrect API response or {} is misconfigured: \n"
-				                 "extra_keys: {} \n"
-				                 "missing_keys: {}".format(cls.__name__,
-				                                           extra,
-				                                           missing))
+			obj = yield from _single_flight(
+				tc, id_, lambda: cls._get_from_api(id_, tc, inflate_children=inflate_children, fields=fields, **kwargs)
+			)
 
-			obj = cls(tc, id=id_, **kwargs)
-			obj_cache.set(obj)
-			yield from obj._state_from_api(resp, inflate_children=inflate_children)
+		elif obj is not None and not data and not tc.obj_cache.is_fresh(obj, max_age):
+			if background_refresh:
+				logger.debug("Cached object is stale.  Using it and refreshing in the background.")
+				obj._refresh_in_background(inflate_children=inflate_children)
+			else:
+				logger.debug("Cached object is stale.  Refreshing it.")
+				yield from obj._revalidate(inflate_children=inflate_children)
 
 		elif obj is None and data:
 			logger.debug("No cached object.  Building object from provided data.")
 			obj = cls(tc, id=data['id'], **kwargs)
-			obj_cache.set(obj)
+			tc.obj_cache.set(obj)
 			yield from obj._state_from_api(data, inflate_children=inflate_children)
 
 		elif obj and data:
@@ -307,6 +749,36 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 
 		return obj
 
+	@classmethod
+	@asyncio.coroutine
+	def _get_from_api(cls, id_: str, tc: trello_client.TrelloClient, inflate_children=True, fields=None, **kwargs):
+		"""
+		A coroutine.
+
+		Requests data for ``id_`` and builds (or updates) the cached object
+		from it.  Only :meth:`.get` should call this so that concurrent requests
+		for the same id are coalesced.
+		"""
+		logger.debug("No cached object and no provided data, requesting data from TrelloClient.")
+		fields_kwargs = cls._fields_kwargs(tc, fields)
+		resp = yield from cls._get_data(id_, tc, **dict(kwargs, **fields_kwargs))
+		is_valid, extra, missing = cls.is_valid_data(resp, partial=bool(fields_kwargs))
+		if not is_valid:
+			raise ValueError("Received incorrect API response or {} is misconfigured: \n"
+			                 "extra_keys: {} \n"
+			                 "missing_keys: {}".format(cls.__name__,
+			                                           extra,
+			                                           missing))
+
+		# Somebody may have built this object from provided data while we
+		# were waiting on the API.
+		obj = tc.obj_cache.get(id_, cls)
+		if obj is None:
+			obj = cls(tc, id=id_, **kwargs)
+			tc.obj_cache.set(obj)
+		yield from obj._state_from_api(resp, inflate_children=inflate_children)
+		return obj
+
 	@classmethod
 	@asyncio.coroutine
 	def get_many(cls, datas_or_ids: List[Union[str, dict]], tc: trello_client.TrelloClient,
@@ -316,6 +788,9 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 
 		Asynchronously call :meth:`~.get` for each item in ``datas_or_ids``
 
+		If every item is already-retrieved data, we instead build all of the
+		objects in one pass with :meth:`~.hydrate_many`.
+
 		:param datas_or_ids: A list of ids (and/or actual already-retrieved data)
 			to create objects out of.
 
@@ -332,11 +807,125 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 			:meth:`~.get`
 			:meth:`~.get_all`
 		"""
+		if datas_or_ids and all(isinstance(doi, dict) for doi in datas_or_ids):
+			return (yield from cls.hydrate_many(datas_or_ids, tc, inflate_children=inflate_children, **kwargs))
+
 		getters = [cls.get(doi, tc, inflate_children=inflate_children, **kwargs) for doi in datas_or_ids]
 
 		results = yield from asyncio.gather(*getters)
 		return TrelloObjectCollection(results)
 
+	@classmethod
+	@asyncio.coroutine
+	def hydrate_many(cls, datas: List[dict], tc: trello_client.TrelloClient,
+	                 inflate_children=True, fetch_missing=True, **kwargs) -> TrelloObjectCollection:
+		"""
+		A coroutine.
+
+		Builds (or updates cached) objects from a list of already-retrieved data.
+
+		Unlike calling :meth:`~.get` for each item, every object is validated,
+		instantiated and given its plain state in a single synchronous pass.
+		Related objects referenced anywhere in the batch are then looked up
+		once per distinct id, and ids we don't have cached are fetched with
+		batch requests.
+
+		:param datas: A list of dicts as returned from the Trello API.
+
+		:param tc:  Used to communicate with Trello API.
+
+		:param inflate_children: If set to ``False``, we won't automatically
+			inflate related objects.
+
+		:param fetch_missing: If set to ``False``, related objects are only taken
+			from the object cache.  Relations we don't have cached are left as the
+			raw API value on the attribute named by the API key, like ``idBoard``.
+
+		:returns: A list of objects, in the same order as ``datas``.
+		"""
+		objs, = yield from hydrate_together([(cls, datas)], tc, inflate_children=inflate_children,
+		                                    fetch_missing=fetch_missing, **kwargs)
+		return objs
+
+	@classmethod
+	def _stage_many(cls, datas: List[dict], tc: trello_client.TrelloClient,
+	                resolver: _RelationResolver, inflate_children=True, **kwargs) -> Tuple[TrelloObjectCollection, set]:
+		"""
+		Gets or creates the cached object for each of ``datas`` and sets its
+		plain state, handing the relations it refers to over to ``resolver``.
+
+		:returns: The objects, and the ids of those whose data hadn't changed.
+		"""
+		objs = TrelloObjectCollection()
+		unchanged = set()
+		for data in datas:
+			if 'id' not in data:
+				raise ValueError("Must provide a mapping with an 'id' key.")
+			obj = tc.obj_cache.get(data['id'], cls)
+			if obj is None:
+				obj = cls(tc, id=data['id'], **kwargs)
+				tc.obj_cache.set(obj)
+			elif obj._is_unchanged(data, inflate_children, fetch_missing=resolver.fetch_missing):
+				unchanged.add(obj.id)
+				objs.append(obj)
+				continue
+
+			for transformer, value, transformer_func in obj._apply_api_data(data, inflate_children):
+				resolver.add(obj, transformer, value, transformer_func)
+			objs.append(obj)
+
+		return objs, unchanged
+
+	@classmethod
+	@asyncio.coroutine
+	def _get_many_data(cls, ids: List[str], tc: trello_client.TrelloClient, fields=None) -> List[dict]:
+		"""
+		A coroutine.
+
+		Retrieves data for several objects.  Uses batch requests if this class
+		provides :meth:`._get_batch_route`, otherwise gets each object's data
+		with :meth:`._get_data`.
+
+		:param ids: The ids of the objects to retrieve.
+		:param tc: An instance of :class:`rosetrellis.trello_client.TrelloClient`.
+		:param fields: Which fields to request.  See :meth:`._fields_for`.
+		:returns: A list of dicts of data.  Objects the API wouldn't give us
+			are left out.
+		"""
+		fields = cls._fields_for(tc, fields)
+		if not cls._get_batch_route(ids[0], fields):
+			fields_kwargs = {} if fields == 'all' else {'fields': fields}
+			results = yield from asyncio.gather(*[cls._get_data(id_, tc, **fields_kwargs) for id_ in ids],
+			                                    return_exceptions=True)
+			datas = []
+			for id_, result in zip(ids, results):
+				if isinstance(result, Exception):
+					logger.warning("Unable to get %s %s: %r", cls.__name__, id_, result)
+				else:
+					datas.append(result)
+			return datas
+
+		routes = [cls._get_batch_route(id_, fields) for id_ in ids]
+		chunks = [routes[i:i + trello_client.BATCH_MAX_URLS]
+		          for i in range(0, len(routes), trello_client.BATCH_MAX_URLS)]
+		datas = []
+		for good, bad in (yield from asyncio.gather(*[tc.batch(chunk) for chunk in chunks])):
+			for status, response in bad:
+				logger.warning("Unable to get %s in batch.  status: %s response: %s",
+				               cls.__name__, status, response)
+			datas.extend(good)
+		return datas
+
+	@classmethod
+	def _get_batch_route(cls, id_: str, fields: str='all') -> Union[str, None]:
+		"""
+		Override to provide the route used to get ``fields`` of this object in a
+		``/batch`` request.
+
+		:returns: The route or ``None`` if this class can't be batched.
+		"""
+		return None
+
 	#####################################
 	## Instance <-> API management
 	#####################################
@@ -349,7 +938,7 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 
 		# TODO: We have other attributes we need to delete.  For example, we change 'idBoard' to a board instance on self.board.
 		response = yield from self._delete_from_api()
-		obj_cache.remove(self.id)
+		self.tc.obj_cache.remove(self.id)
 		for k, v in self._raw_data.items():
 			delattr(self, k)
 		delattr(self, '_raw_data')
@@ -358,6 +947,10 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 	def create(self):
 		create_data = self._get_api_create_from_state()
 		new_data = yield from self._create_on_api(create_data)
+		# Cache it first, so objects created after it that refer to it get
+		# this instance rather than requesting it.
+		self.id = new_data['id']
+		self.tc.obj_cache.set(self)
 		yield from self._state_from_api(new_data)
 
 	@asyncio.coroutine
@@ -365,29 +958,123 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 		"""
 		A coroutine.
 
-		Saves changes to Trello api"""
+		Saves changes to Trello api.  Does nothing if no attributes have been
+		assigned to since we last got data from the API.
+
+		If the client has a write-behind queue (see
+		:class:`~rosetrellis.write_behind.WriteBehindQueue`), the object is
+		queued and this returns straight away."""
+		queue = getattr(self.tc, 'write_behind', None)
+		if queue is not None:
+			queue.enqueue(self)
+			return
+		yield from self.save_now()
+
+	@asyncio.coroutine
+	def save_now(self) -> None:
+		"""
+		A coroutine.
+
+		Like :meth:`.save`, but always makes the requests now, even if the
+		client has a write-behind queue."""
 		if not self.id:
 			# This is a new object, so create it
 			yield from self.create()
 			assert getattr(self, 'id', None) is not None
+		elif not self._dirty:
+			return
 
 		# even if we had to create, not all state
 		# can be sent to Trello on object creation
+		saving = set(self._dirty)
 		changes = self._get_api_update_from_state()
-		if changes:
+		if not changes:
+			self._dirty -= saving
+			return
+
+		# Start afresh, so that we can tell which attributes are assigned to
+		# while the request is out.
+		self._dirty.clear()
+		try:
 			new_data = yield from self._changes_to_api(changes)
-			yield from self._state_from_api(new_data)
+		except BaseException:
+			self._dirty |= saving
+			raise
+
+		# Those edits are newer than the response, so they survive it and
+		# are sent by the next save.
+		edited = set(self._dirty)
+		values = {name: self.__dict__[name] for name in edited if name in self.__dict__}
+		yield from self._state_from_api(new_data)
+		for name, value in values.items():
+			object.__setattr__(self, name, value)
+		self._dirty |= edited
 
 	@asyncio.coroutine
-	def refresh(self, inflate_children=True):
+	def refresh(self, inflate_children=True, fields: Union[str, Sequence[str], None]=None):
 		"""
 		A coroutine.
 
 		Refreshes data from Trello.
+
+		:param fields: Which fields to request.  See :meth:`.get`.
 		"""
-		data = yield from self._get_data(self.id, self.tc)
+		data = yield from self._get_data(self.id, self.tc, **self._fields_kwargs(self.tc, fields))
 		yield from self._state_from_api(data, inflate_children=inflate_children)
 
+	@asyncio.coroutine
+	def fetch_fields(self, *fields: str):
+		"""
+		A coroutine.
+
+		Requests just ``fields`` from Trello and updates our state with them.
+		Use this to fill in fields that weren't requested when we got this
+		object, without refreshing everything.
+
+		:param fields: Names of fields in :attr:`.API_FIELDS`.
+		"""
+		data = yield from self._get_data(self.id, self.tc, **self._fields_kwargs(self.tc, fields))
+		yield from self.merge_api_data(data)
+
+	@asyncio.coroutine
+	def merge_api_data(self, data: dict):
+		"""
+		A coroutine.
+
+		Updates our state with data for some of our fields, like the changes
+		described by an action, leaving the other fields as they are.
+
+		:param data: A dict with an ``'id'`` key and any of :attr:`.API_FIELDS`.
+		"""
+		yield from self._state_from_api(data, inflate_children=self.__dict__.get('_raw_inflated', True))
+
+	@asyncio.coroutine
+	def _revalidate(self, inflate_children=True):
+		"""
+		A coroutine.
+
+		Like :meth:`.refresh`, but shares a request that is already in flight
+		for this object.
+		"""
+		@asyncio.coroutine
+		def refresh():
+			yield from self.refresh(inflate_children=inflate_children)
+			return self
+
+		return (yield from _single_flight(self.tc, self.id, refresh))
+
+	def _refresh_in_background(self, inflate_children=True) -> None:
+		"""
+		Schedules a refresh of this object without waiting for it.
+		"""
+		def log_failure(task):
+			if not task.cancelled() and task.exception() is not None:
+				logger.warning("Background refresh of %r failed: %s", self, task.exception())
+
+		self.tc.obj_cache.stats['background_refreshes'] += 1
+		task = asyncio.ensure_future(self._revalidate(inflate_children=inflate_children))
+		task.add_done_callback(log_failure)
+
 	@asyncio.coroutine
 	def _state_from_api(self, api_data: dict, inflate_children: bool=True):
 		"""
@@ -400,14 +1087,75 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 			a :class:`.Card`.  You will have to just rely on the
 			``idBoard`` attribute in that case.
 		"""
-		self._raw_data = api_data
-		transformations = []
+		if self._is_unchanged(api_data, inflate_children):
+			self._hydrated(applied=False)
+			return
+
+		transformations = [self._inflator(transformer.state_name, value, transformer_func)
+		                   for transformer, value, transformer_func
+		                   in self._apply_api_data(api_data, inflate_children)]
+
+		if transformations:
+			yield from asyncio.wait(transformations)
+
+		self._hydrated()
+
+	def _is_unchanged(self, api_data: dict, inflate_children: bool=True, fetch_missing: bool=True) -> bool:
+		"""
+		:param fetch_missing: Whether hydrating again would fetch related
+			objects that aren't cached.
+		:returns: ``True`` if our state was already built from data equal to
+			``api_data`` in the same way and hasn't been changed locally since,
+			so that setting it again would be a no-op.
+		"""
+		if not self._refreshed_at or self._dirty:
+			return False
+
+		if inflate_children and fetch_missing and self.__dict__.get('_relations_incomplete'):
+			# Some relations were left unresolved because we weren't fetching
+			# them then.  We would now.
+			return False
+
+		raw_data = self.__dict__.get('_raw_data')
+		if raw_data is None or self.__dict__.get('_raw_inflated') != inflate_children:
+			return False
+
+		# Cached API responses are read-only and shared, so an unchanged
+		# response is very often the very same object.  Data for only some
+		# fields is unchanged if those fields are.
+		return api_data is raw_data or api_data.items() <= raw_data.items()
+
+	def _apply_api_data(self, api_data: dict, inflate_children: bool=True) -> List[tuple]:
+		"""
+		Sets state from ``api_data`` for every key whose transformer can run
+		synchronously.
+
+		:param api_data: The data from the API.
+		:param inflate_children: If set to ``False``, set the API values on
+			self without transforming them.
+		:returns: A list of ``(transformer, value, transformer_func)`` for the
+			keys whose transformer is a coroutine and still needs to be run.
+		"""
+		raw_data = self.__dict__.get('_raw_data')
+		if raw_data is not None and not raw_data.keys() <= api_data.keys():
+			# We only got some fields, keep what we know about the rest.
+			self._raw_data = util.FrozenDict(itertools.chain(raw_data.items(), api_data.items()))
+		else:
+			self._raw_data = api_data
+		self._raw_inflated = inflate_children
+		self._relations_incomplete = False
+		skipped = self._skipped_api_keys(api_data, inflate_children)
+		fields = self._api_field_set()
+		pending = []
 		for k, v in api_data.items():
 			if not inflate_children:
-				setattr(self, k, v)
+				self._set_clean(k, v)
 				continue
 
-			if k not in self.API_FIELDS:
+			if k in skipped:
+				continue
+
+			if k not in fields:
 				raise ValueError("Received field from API that we don't know about.  '{}' is unknown".format(k))
 			transformer = self._get_transformer_for_api_key(k)
 
@@ -417,20 +1165,33 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 			try:
 				# We can just run (or get and run) the transformer function...
 				result = self._run_transformer_func(v, transformer_func)
-				setattr(self, transformer.state_name, result)
+				self._set_clean(transformer.state_name, result)
 			except IsCoroutineError:
 				# ... unless it is a coroutine.  We'll run all coroutines later.
-				transformations.append(self._inflator(transformer.state_name, v, transformer_func))
+				pending.append((transformer, v, transformer_func))
 
-		if transformations:
-			yield from asyncio.wait(transformations)
+		return pending
+
+	def _skipped_api_keys(self, api_data: dict, inflate_children: bool) -> Sequence[str]:
+		"""
+		Override to name keys in ``api_data`` that shouldn't be turned into
+		state, for example because another key holds the same information.
+		"""
+		return ()
+
+	def _hydrated(self, applied: bool=True) -> None:
+		"""
+		Called once all state from API data has been set.
 
+		:param applied: ``False`` if the data was unchanged and nothing was set.
+		"""
 		self._refreshed_at = time.time()
+		self.tc.obj_cache.hydrated(self, applied=applied)
 
 	@asyncio.coroutine
 	def _inflator(self, dest_field, orig_value, inflator):
 		new_value = yield from inflator(orig_value, self.tc)
-		setattr(self, dest_field, new_value)
+		self._set_clean(dest_field, new_value)
 
 	#####################################
 	## Abstract methods
@@ -576,9 +1337,9 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 					transformers.append(st)
 
 			if not st:
-				api_transformer = transform_date_from_api if 'date' in fn else None
+				api_transformer = transform_date_from_api if is_date_field(fn) else None
 
-				state_transformer = transform_date_from_state if 'date' in fn else None
+				state_transformer = transform_date_from_state if is_date_field(fn) else None
 				transformers.append(
 					StateTransformer(api_name=fn,
 					                 state_name=fn,
@@ -587,6 +1348,19 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 				)
 		return transformers
 
+	@classmethod
+	def _cached_transformers(cls, api_keys: Sequence[str]) -> list:
+		"""
+		Like :meth:`._make_transformers`, but only builds the transformers once
+		for each distinct set of api keys.  Building them is expensive enough
+		to matter when hydrating thousands of objects.
+		"""
+		key = tuple(api_keys)
+		transformers = _transformers_cache.get(key)
+		if transformers is None:
+			transformers = _transformers_cache[key] = cls._make_transformers(api_keys)
+		return transformers
+
 	@classmethod
 	def _get_state_name_from_api_key(cls, api_key: str) -> str:
 		if api_key == cls.API_SINGLE_KEY:
@@ -625,7 +1399,8 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 			and :attr:`.STATE_SINGLE_ATTR`.
 		"""
 		api_key = cls.API_SINGLE_KEY if not nested else cls.API_NESTED_SINGLE_KEY
-		return StateTransformer(api_key, cls.STATE_SINGLE_ATTR, api_transformer=cls.get)
+		return StateTransformer(api_key, cls.STATE_SINGLE_ATTR, api_transformer=cls.get,
+		                        relation_class=cls)
 
 	@classmethod
 	def _get_transformer_for_many(cls, nested: bool) -> StateTransformer:
@@ -641,7 +1416,8 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 
 		api_key = cls.API_MANY_KEY if not nested else cls.API_NESTED_MANY_KEY
 		return StateTransformer(api_key, cls.STATE_MANY_ATTR,
-		                        api_transformer=cls.get_many, state_transformer=ids_getter)
+		                        api_transformer=cls.get_many, state_transformer=ids_getter,
+		                        relation_class=cls, many=True)
 
 	def _get_additional_transformers(self):
 		"""
@@ -687,9 +1463,16 @@ class TrelloObject(Synchronizer, metaclass=abc.ABCMeta):
 		return create_dict
 
 	def _changes_from_raw_data(self, attr_key_pairs: List[Tuple[str, str]]) -> dict:
+		"""
+		Compares the attributes that have been assigned to since we got data
+		from the API against that data.
+
+		:param attr_key_pairs: ``(attribute name, API key)`` pairs to compare.
+		:returns: A dict of API keys to new values for the attributes that changed.
+		"""
 		changes = {}
 		for attr, key in attr_key_pairs:
-			if not hasattr(self, attr) or not key in self._raw_data:
+			if attr not in self._dirty or not hasattr(self, attr) or not key in self._raw_data:
 				continue
 			state_transformer = self._get_transformer_for_state_attr(attr)
 			transformer_func = state_transformer.state_transformer
@@ -719,10 +1502,20 @@ class Member(TrelloObject):
 	API_NESTED_MANY_KEY = 'members'
 	API_NESTED_SINGLE_KEY = 'member'
 
+	FIELD_PROFILES = {
+		'minimal': ('fullName', 'username'),
+		'listing': ('avatarHash', 'fullName', 'initials', 'url', 'username'),
+		'full': 'all',
+	}
+
 	@classmethod
 	@asyncio.coroutine
-	def _get_data(cls, id_: str, tc: trello_client.TrelloClient, **kwargs):
-		return (yield from tc.get_member(id_))
+	def _get_data(cls, id_: str, tc: trello_client.TrelloClient, fields="all", **kwargs):
+		return (yield from tc.get_member(id_, fields=fields))
+
+	@classmethod
+	def _get_batch_route(cls, id_: str, fields: str='all') -> str:
+		return '/members/{}?fields={}'.format(id_, fields)
 
 	@classmethod
 	@asyncio.coroutine
@@ -783,10 +1576,20 @@ class Organization(TrelloObject):
 	API_NESTED_MANY_KEY = 'organizations'
 	API_NESTED_SINGLE_KEY = 'organization'
 
+	FIELD_PROFILES = {
+		'minimal': ('displayName', 'name'),
+		'listing': ('desc', 'displayName', 'name', 'url', 'website'),
+		'full': 'all',
+	}
+
 	@classmethod
 	@asyncio.coroutine
-	def _get_data(cls, id_: str, tc: trello_client.TrelloClient, **kwargs) -> dict:
-		return (yield from tc.get_organization(id_, fields="all"))
+	def _get_data(cls, id_: str, tc: trello_client.TrelloClient, fields="all", **kwargs) -> dict:
+		return (yield from tc.get_organization(id_, fields=fields))
+
+	@classmethod
+	def _get_batch_route(cls, id_: str, fields: str='all') -> str:
+		return '/organizations/{}?fields={}'.format(id_, fields)
 
 	@classmethod
 	@asyncio.coroutine
@@ -844,10 +1647,21 @@ class Board(TrelloObject):
 	API_NESTED_MANY_KEY = 'boards'
 	API_NESTED_SINGLE_KEY = 'board'
 
+	FIELD_PROFILES = {
+		'minimal': ('closed', 'name'),
+		'listing': ('closed', 'dateLastActivity', 'idOrganization', 'name', 'pinned',
+		            'shortUrl', 'starred', 'url'),
+		'full': 'all',
+	}
+
 	@classmethod
 	@asyncio.coroutine
-	def _get_data(cls, id_: str, tc: trello_client.TrelloClient, **kwargs):
-		return (yield from tc.get_board(id_, fields="all"))
+	def _get_data(cls, id_: str, tc: trello_client.TrelloClient, fields="all", **kwargs):
+		return (yield from tc.get_board(id_, fields=fields))
+
+	@classmethod
+	def _get_batch_route(cls, id_: str, fields: str='all') -> str:
+		return '/boards/{}?fields={}'.format(id_, fields)
 
 	@classmethod
 	@asyncio.coroutine
@@ -899,20 +1713,75 @@ class Board(TrelloObject):
 		return (yield from Label.get_labels(self.id, self.tc))
 
 	@asyncio.coroutine
-	def get_lists(self, inflate_children=True) -> TrelloObjectCollection:
-		lists_data = yield from self.tc.get_board_lists(self.id)
+	def get_lists(self, inflate_children=True, filter: str=None) -> TrelloObjectCollection:
+		"""
+		:param filter: One of :data:`~rosetrellis.trello_client.LIST_FILTERS`
+			to only get those lists, like ``'open'``.
+		"""
+		lists_data = yield from self.tc.get_board_lists(self.id, filter=filter)
 		return (yield from Lists.get_many(lists_data, self.tc, inflate_children=inflate_children))
 
 	@asyncio.coroutine
-	def get_cards(self, inflate_children=True) -> TrelloObjectCollection:
-		cards_data = yield from self.tc.get_board_cards(self.id)
+	def get_cards(self, inflate_children=True, filter: str=None) -> TrelloObjectCollection:
+		"""
+		:param filter: One of :data:`~rosetrellis.trello_client.CARD_FILTERS`
+			to only get those cards, like ``'open'``.
+		"""
+		cards_data = yield from self.tc.get_board_cards(self.id, filter=filter)
 		return (yield from Card.get_many(cards_data, self.tc, inflate_children=inflate_children))
 
+	def query(self, **kwargs) -> TrelloObjectCollection:
+		"""
+		Finds this board's cards among the cards we already have, without
+		making any requests.  Takes the same filters as :meth:`.Card.query`.
+		"""
+		return Card.query(self.tc, board=self, **kwargs)
+
 	@asyncio.coroutine
 	def get_checklists(self, inflate_children=True) -> TrelloObjectCollection:
 		checklists_data = yield from self.tc.get_board_checklists(self.id)
 		return (yield from Checklist.get_many(checklists_data, self.tc, inflate_children=inflate_children))
 
+	@classmethod
+	@asyncio.coroutine
+	def get_full(cls, id_: str, tc: trello_client.TrelloClient, inflate_children=True) -> 'Board':
+		"""
+		A coroutine.
+
+		Gets a board along with all of its lists, cards, checklists, labels and
+		members with a single request.  Relations between them are wired up
+		from the object cache, so nothing else is requested.
+
+		The related objects are also set on the board as :attr:`lists`,
+		:attr:`cards`, :attr:`checklists`, :attr:`labels` and :attr:`members`.
+
+		:param id_: The id of the board.
+		:param tc: Used to communicate with Trello API.
+		:param inflate_children: If set to ``False``, we won't automatically
+			inflate related objects.
+		"""
+		graph = yield from tc.get_board_graph(id_)
+		nested_keys = [klass.API_NESTED_MANY_KEY for klass in cls._graph_classes()]
+		board_data = {k: v for k, v in graph.items() if k not in nested_keys}
+
+		groups = [(cls, [board_data])]
+		groups.extend((klass, graph.get(klass.API_NESTED_MANY_KEY, [])) for klass in cls._graph_classes())
+		board_objs, *related = yield from hydrate_together(groups, tc, inflate_children=inflate_children,
+		                                                   fetch_missing=False)
+
+		board = board_objs[0]
+		for klass, objs in zip(cls._graph_classes(), related):
+			board._set_clean(klass.STATE_MANY_ATTR, objs)
+		return board
+
+	@classmethod
+	def _graph_classes(cls) -> List[type]:
+		"""
+		The types nested in :meth:`.get_full` data, ordered so that objects
+		come before the objects that refer to them.
+		"""
+		return [Member, Label, Lists, Card, Checklist]
+
 	def __repr__(self):
 		if self._refreshed_at:
 			return "<Board: name='{}', id='{}')>".format(self.name, self.id)
@@ -980,18 +1849,56 @@ class Lists(TrelloObject):
 	API_NESTED_MANY_KEY = 'lists'
 	API_NESTED_SINGLE_KEY = 'list'
 
+	FIELD_PROFILES = {
+		'minimal': ('closed', 'idBoard', 'name'),
+		'listing': ('closed', 'idBoard', 'name', 'pos'),
+		'full': 'all',
+	}
+
 	@classmethod
 	@asyncio.coroutine
 	def get_all(cls, tc: trello_client.TrelloClient, *args, inflate_children=True, **kwargs) -> TrelloObjectCollection:
 		boards = yield from Board.get_all(tc, inflate_children=inflate_children)
-		lists_getters = [b.get_lists() for b in boards]
+		lists_getters = [b.get_lists(filter=kwargs.get('filter')) for b in boards]
 		lists = list(itertools.chain.from_iterable((yield from asyncio.gather(*lists_getters))))
 		return TrelloObjectCollection(lists)
 
+	@classmethod
+	def iter_all(cls, tc: trello_client.TrelloClient, concurrency: int=4, buffer_size: int=100,
+	             inflate_children=True, **kwargs) -> TrelloObjectStream:
+		"""
+		Like :meth:`.get_all`, but streams lists as each board's lists are
+		hydrated.  See :class:`~rosetrellis.streams.TrelloObjectStream`.
+
+		:param concurrency: Maximum number of boards fetched at the same time.
+		:param buffer_size: Maximum number of lists waiting to be consumed.
+		"""
+		return TrelloObjectStream(
+			lambda: Board.get_all(tc, inflate_children=inflate_children),
+			lambda board: board.get_lists(inflate_children=inflate_children, filter=kwargs.get('filter')),
+			concurrency=concurrency,
+			buffer_size=buffer_size
+		)
+
 	@classmethod
 	@asyncio.coroutine
-	def _get_data(cls, id_: str, tc: trello_client.TrelloClient, **kwargs):
-		return (yield from tc.get_list(id_, fields="all"))
+	def _get_data(cls, id_: str, tc: trello_client.TrelloClient, fields="all", **kwargs):
+		return (yield from tc.get_list(id_, fields=fields))
+
+	@classmethod
+	def _get_batch_route(cls, id_: str, fields: str='all') -> str:
+		return '/lists/{}?fields={}'.format(id_, fields)
+
+	@asyncio.coroutine
+	def get_cards(self, inflate_children=True, filter: str=None) -> TrelloObjectCollection:
+		"""
+		Gets just the cards on this list.
+
+		:param filter: One of :data:`~rosetrellis.trello_client.CARD_FILTERS`
+			to only get those cards, like ``'open'``.
+		"""
+		cards_data = yield from self.tc.get_list_cards(self.id, filter=filter)
+		return (yield from Card.get_many(cards_data, self.tc, inflate_children=inflate_children))
 
 	@asyncio.coroutine
 	def _delete_from_api(self):
@@ -1050,22 +1957,164 @@ class Card(TrelloObject):
 	API_NESTED_MANY_KEY = 'cards'
 	API_NESTED_SINGLE_KEY = 'card'
 
+	FIELD_PROFILES = {
+		'minimal': ('closed', 'idBoard', 'idList', 'name'),
+		'listing': ('closed', 'dateLastActivity', 'due', 'idBoard', 'idLabels', 'idList',
+		            'idMembers', 'name', 'pos', 'shortUrl'),
+		'full': 'all',
+	}
+
 	@classmethod
 	@asyncio.coroutine
-	def _get_data(cls, id_: str, tc: trello_client.TrelloClient) -> dict:
-		return (yield from tc.get_card(card_id=id_, fields="all"))
+	def _get_data(cls, id_: str, tc: trello_client.TrelloClient, fields="all") -> dict:
+		return (yield from tc.get_card(card_id=id_, fields=fields))
+
+	@classmethod
+	def _get_batch_route(cls, id_: str, fields: str='all') -> str:
+		return '/cards/{}?fields={}'.format(id_, fields)
 
 	@classmethod
 	@asyncio.coroutine
 	def get_all(cls, tc: trello_client.TrelloClient, *args, inflate_children=True, **kwargs):
 		boards = yield from Board.get_all(tc, inflate_children=inflate_children)
-		card_getters = [board.get_cards(inflate_children=inflate_children) for board in boards]
+		card_getters = [board.get_cards(inflate_children=inflate_children, filter=kwargs.get('filter'))
+		                for board in boards]
 		return TrelloObjectCollection(
 			itertools.chain.from_iterable(
 				(yield from asyncio.gather(*card_getters))
 			)
 		)
 
+	@classmethod
+	def iter_all(cls, tc: trello_client.TrelloClient, concurrency: int=4, buffer_size: int=100,
+	             inflate_children=True, **kwargs) -> TrelloObjectStream:
+		"""
+		Like :meth:`.get_all`, but streams cards as each board's cards are
+		hydrated.  See :class:`~rosetrellis.streams.TrelloObjectStream`.
+
+		:param concurrency: Maximum number of boards fetched at the same time.
+		:param buffer_size: Maximum number of cards waiting to be consumed.
+		"""
+		return TrelloObjectStream(
+			lambda: Board.get_all(tc, inflate_children=inflate_children),
+			lambda board: board.get_cards(inflate_children=inflate_children, filter=kwargs.get('filter')),
+			concurrency=concurrency,
+			buffer_size=buffer_size
+		)
+
+	@classmethod
+	def query(cls, tc: trello_client.TrelloClient,
+	          list_: Union['Lists', str]=None,
+	          board: Union['Board', str]=None,
+	          label: Union['Label', str]=None,
+	          label_color: str=None,
+	          member: Union['Member', str]=None,
+	          due_after: Union[datetime.datetime, str]=None,
+	          due_before: Union[datetime.datetime, str]=None,
+	          closed: bool=None) -> TrelloObjectCollection:
+		"""
+		Finds cards among the cards in the object cache, without making any
+		requests.  Only cards we already have are found.
+
+		The object cache keeps indexes of cards by list, board, label, label
+		color, member and due date, updated whenever a card is hydrated, saved
+		or deleted, and whenever a label is hydrated.  They're built the first
+		time they're needed.  Changes to a card that haven't been saved yet
+		aren't indexed.
+
+		Every filter given has to match.  Objects or ids may be given for
+		``list_``, ``board``, ``label`` and ``member``.
+
+		:param due_after: Only cards due at or after this.  Naive datetimes are
+			taken to be UTC.
+		:param due_before: Only cards due before this.
+		:param closed: Only open (``False``) or archived (``True``) cards.
+		:returns: The cards, ordered by due date when filtering on it,
+			otherwise by position.
+		"""
+		cache = tc.obj_cache
+		cls._ensure_indexes(tc)
+
+		candidates = []
+		for name, value in (('idList', list_), ('idBoard', board), ('idLabels', label),
+		                    ('labelColors', label_color), ('idMembers', member)):
+			if value is not None:
+				candidates.append(cache.get_index(cls, name).get(getattr(value, 'id', value)))
+
+		by_due = due_after is not None or due_before is not None
+		if by_due:
+			due_ids = cache.get_index(cls, 'due').range(_index_date(due_after), _index_date(due_before))
+			candidates.append(set(due_ids))
+
+		if candidates:
+			ids = set.intersection(*sorted(candidates, key=len))
+		else:
+			ids = {card.id for card in cache.values(cls)}
+
+		cards = []
+		for id_ in ids:
+			card = cache.get(id_, cls)
+			if card is None:
+				# Garbage collected since it was indexed.
+				cache.remove(id_)
+				continue
+			if closed is not None and bool(card._raw_data.get('closed')) != closed:
+				continue
+			cards.append(card)
+
+		if by_due:
+			cards.sort(key=lambda card: (card._raw_data['due'], card.id))
+		else:
+			cards.sort(key=lambda card: (card._raw_data.get('pos') or 0, card.id))
+		return TrelloObjectCollection(cards)
+
+	@classmethod
+	def _ensure_indexes(cls, tc: trello_client.TrelloClient) -> None:
+		cache = tc.obj_cache
+		if cache.get_index(cls, 'due') is not None:
+			return
+
+		def raw(card):
+			return card.__dict__.get('_raw_data') or {}
+
+		def label_ids(card):
+			data = raw(card)
+			return data.get('idLabels') or [l['id'] for l in data.get('labels') or []]
+
+		def label_colors(card):
+			# A cached label knows its current color better than the copy
+			# embedded in the card, which is as old as the card's data.
+			embedded = {l['id']: l.get('color') for l in raw(card).get('labels') or []}
+			colors = []
+			for id_ in label_ids(card):
+				label = cache.get(id_, Label)
+				label_data = (label.__dict__.get('_raw_data') if label is not None else None) or {}
+				colors.append(label_data.get('color', embedded.get(id_)))
+			return colors
+
+		cache.add_index(cls, 'idList', FieldIndex(lambda card: [raw(card).get('idList')]))
+		cache.add_index(cls, 'idBoard', FieldIndex(lambda card: [raw(card).get('idBoard')]))
+		cache.add_index(cls, 'idLabels', FieldIndex(label_ids))
+		cache.add_index(cls, 'labelColors', FieldIndex(label_colors))
+		cache.add_index(cls, 'idMembers', FieldIndex(lambda card: raw(card).get('idMembers') or []))
+		# Trello's date strings sort in date order.
+		cache.add_index(cls, 'due', SortedIndex(lambda card: raw(card).get('due')))
+
+	@classmethod
+	def _label_hydrated(cls, label: 'Label') -> None:
+		"""
+		Indexes the cached cards with ``label`` under its color again, which
+		may have changed.
+		"""
+		cache = label.tc.obj_cache
+		colors = cache.get_index(cls, 'labelColors')
+		if colors is None:
+			return
+		for id_ in cache.get_index(cls, 'idLabels').get(label.id):
+			card = cache.get(id_, cls)
+			if card is not None:
+				colors.update(card)
+
 	@asyncio.coroutine
 	def _delete_from_api(self):
 		yield from self.tc.delete_card(self.id)
@@ -1105,25 +2154,19 @@ class Card(TrelloObject):
 			raise ValueError("Cannot create a 'Card' without a 'name' and 'list' property")
 
 		data = self._stripped_dict_from_fields(['name', 'desc', 'pos'])
+		data['idList'] = list_id
 		postable_labels = self._postable_labels
 		if postable_labels:
 			data['labels'] = postable_labels
 
 		return data
 
-	@asyncio.coroutine
-	def _state_from_api(self, api_data, inflate_children=True):
-		"""sub"""
-
+	def _skipped_api_keys(self, api_data, inflate_children):
 		if 'labels' in api_data and inflate_children:
 			# Redundant info caused by using 'all' filter when getting
 			# card data
-			try:
-				del api_data['idLabels']
-			except KeyError:
-				pass
-
-		yield from super(Card, self)._state_from_api(api_data, inflate_children=inflate_children)
+			return ('idLabels',)
+		return ()
 
 	@property
 	def label_colors(self) -> List[str]:
@@ -1134,7 +2177,7 @@ class Card(TrelloObject):
 
 	@property
 	def _postable_labels(self) -> List[str]:
-		if 'labels' in self._raw_data and self.label_colors:
+		if 'labels' in self._dirty and 'labels' in self._raw_data and self.label_colors:
 			raw_data_colors = sorted([label['color'] for label in self._raw_data['labels']])
 			state_colors = sorted(self.label_colors)
 
@@ -1158,6 +2201,12 @@ class Checklist(TrelloObject):
 	API_NESTED_MANY_KEY = 'checklists'
 	API_NESTED_SINGLE_KEY = 'checklist'
 
+	FIELD_PROFILES = {
+		'minimal': ('idCard', 'name'),
+		'listing': ('checkItems', 'idBoard', 'idCard', 'name', 'pos'),
+		'full': 'all',
+	}
+
 	def _get_additional_transformers(self):
 		checkitem_transformers = CheckItem._api_transformers(self.id)
 		return [StateTransformer(CheckItem.API_NESTED_MANY_KEY,
@@ -1167,8 +2216,17 @@ class Checklist(TrelloObject):
 
 	@classmethod
 	@asyncio.coroutine
-	def _get_data(cls, id_: str, tc: trello_client.TrelloClient):
-		return (yield from tc.get_checklist(id_))
+	def _get_data(cls, id_: str, tc: trello_client.TrelloClient, fields="all"):
+		if fields == 'all':
+			return (yield from tc.get_checklist(id_))
+
+		# 'cards' and 'checkItems' are nested resources rather than fields.
+		fields = fields.split(',')
+		nested = [f for f in fields if f in ('cards', 'checkItems')]
+		return (yield from tc.get_checklist(id_,
+		                                    include_card='cards' in nested,
+		                                    include_check_items='checkItems' in nested,
+		                                    fields=','.join(f for f in fields if f not in nested)))
 
 	@classmethod
 	@asyncio.coroutine
@@ -1180,6 +2238,23 @@ class Checklist(TrelloObject):
 
 		return checklists
 
+	@classmethod
+	def iter_all(cls, tc: trello_client.TrelloClient, concurrency: int=4, buffer_size: int=100,
+	             inflate_children=True, **kwargs) -> TrelloObjectStream:
+		"""
+		Like :meth:`.get_all`, but streams checklists as each board's checklists
+		are hydrated.  See :class:`~rosetrellis.streams.TrelloObjectStream`.
+
+		:param concurrency: Maximum number of boards fetched at the same time.
+		:param buffer_size: Maximum number of checklists waiting to be consumed.
+		"""
+		return TrelloObjectStream(
+			lambda: Board.get_all(tc, inflate_children=inflate_children),
+			lambda board: board.get_checklists(inflate_children=inflate_children),
+			concurrency=concurrency,
+			buffer_size=buffer_size
+		)
+
 	@asyncio.coroutine
 	def _delete_from_api(self):
 		return (yield from self.tc.delete_checklist(self.id))
@@ -1249,17 +2324,17 @@ class CheckItem(TrelloObject):
 		if not checklist_id:
 			raise ValueError("Must provide checklist id to CheckItem")
 		self.checklist_id = checklist_id
-		super(CheckItem, self).__init__(tc)
+		super(CheckItem, self).__init__(tc, **kwargs)
 
 	@classmethod
 	def _api_transformers(cls, checklist_id: str) -> Dict[str, Callable[dict]]:
 		@asyncio.coroutine
 		def transform_single(data: Union[str, dict], tc: trello_client.TrelloClient) -> Callable[dict]:
-			return cls.get(data, tc, checklist_id=checklist_id)
+			return (yield from cls.get(data, tc, checklist_id=checklist_id))
 
 		@asyncio.coroutine
 		def transform_many(datas: List[str, dict], tc: trello_client.TrelloClient) -> Callable[dict]:
-			return cls.get_many(datas, tc, checklist_id=checklist_id)
+			return (yield from cls.get_many(datas, tc, checklist_id=checklist_id))
 
 		return {'transform_single': transform_single, 'transform_many': transform_many}
 
@@ -1352,8 +2427,12 @@ class Label(TrelloObject):
 
 	@classmethod
 	@asyncio.coroutine
-	def _get_data(cls, id_: str, tc: trello_client.TrelloClient):
-		return (yield from tc.get_label(id_))
+	def _get_data(cls, id_: str, tc: trello_client.TrelloClient, fields="all"):
+		return (yield from tc.get_label(id_, fields=fields))
+
+	@classmethod
+	def _get_batch_route(cls, id_: str, fields: str='all') -> str:
+		return '/labels/{}?fields={}'.format(id_, fields)
 
 	@classmethod
 	@asyncio.coroutine
@@ -1376,13 +2455,8 @@ class Label(TrelloObject):
 	@asyncio.coroutine
 	def get_labels(self, board_id: str, tc: trello_client.TrelloClient) -> 'Label':
 		labels_data = yield from tc.get_labels(board_id)
-		labels = TrelloObjectCollection()
-		for label_data in labels_data:
-			label = Label(label_data['id'], tc)
-			yield from label._state_from_api(label_data)
-			obj_cache.set(label)
-			labels.append(label)
-		return labels
+		# Labels we already have are updated rather than replaced.
+		return (yield from Label.get_many(labels_data, tc))
 
 	def _get_api_update_from_state(self):
 		changes = self._changes_from_raw_data([
@@ -1392,6 +2466,11 @@ class Label(TrelloObject):
 
 		return changes
 
+	def _hydrated(self, applied: bool=True) -> None:
+		super(Label, self)._hydrated(applied)
+		if applied:
+			Card._label_hydrated(self)
+
 	def _get_api_create_from_state(self):
 		data = self._stripped_dict_from_fields(['name', 'color'])
 
@@ -0,0 +1,410 @@
+"""
+Makes a board look like a description of how it should be, with as few
+requests as we can manage.
+
+A spec describes the board's labels, lists, cards, checklists and check
+items::
+
+	spec = {
+		'desc': 'Made from the onboarding template',
+		'labels': [{'name': 'Blocked', 'color': 'red'}],
+		'lists': [
+			{'name': 'To do', 'cards': [
+				{'name': 'Get a laptop', 'labels': ['Blocked'], 'checklists': [
+					{'name': 'Steps', 'items': ['Ask IT', {'name': 'Sign form', 'checked': True}]},
+				]},
+			]},
+			{'name': 'Done'},
+		],
+	}
+
+Labels are matched to the board's by name (or by color, for labels without
+a name), lists by name, cards by name within their list, checklists by name
+within their card and check items by name within their checklist.
+"""
+import asyncio
+import collections
+import logging
+
+from typing import Any, Dict, List, Union
+
+import rosetrellis.trello_client as trello_client
+from rosetrellis.models import Board
+from rosetrellis.util import Synchronizer
+
+
+logger = logging.getLogger(__name__)
+
+#: Operations run in these waves, in order.  Everything in a wave only needs
+#: ids from earlier waves, so a wave's operations run at the same time.
+WAVES = ('board, labels and lists', 'cards', 'checklists', 'check items')
+_BOARD_WAVE, _CARD_WAVE, _CHECKLIST_WAVE, _CHECK_ITEM_WAVE = range(len(WAVES))
+
+# Spacing of the positions we give objects we create, like Trello's own.
+_POS_STEP = 16384
+
+
+class Ref:
+	"""
+	Stands in for the id of an object that an earlier operation creates.
+	"""
+
+	def __init__(self, op: 'Operation') -> None:
+		self.op = op
+
+	def resolve(self) -> str:
+		if self.op.result is None:
+			raise ValueError("'{}' didn't succeed".format(self.op))
+		return self.op.result['id']
+
+	def __repr__(self) -> str:
+		return "<id of {}>".format(self.op)
+
+
+def _resolve(value: Any) -> Any:
+	if isinstance(value, Ref):
+		return value.resolve()
+	if isinstance(value, dict):
+		return {k: _resolve(v) for k, v in value.items()}
+	if isinstance(value, (list, tuple)):
+		return type(value)(_resolve(v) for v in value)
+	return value
+
+
+class Operation:
+	"""
+	A single request that :meth:`.Reconciler.apply` makes.
+	"""
+
+	def __init__(self, action: str, description: str, method: str, *args) -> None:
+		"""
+		:param action: ``'create'``, ``'update'``, ``'close'`` or ``'delete'``.
+		:param description: What it does, like ``"card 'Get a laptop'"``.
+		:param method: The :class:`.TrelloClient` method to call.
+		:param args: Arguments for ``method``.  May contain :class:`.Ref`
+			instances, which are swapped for ids before the call.
+		"""
+		self.action = action
+		self.description = description
+		self.method = method
+		self.args = args
+		self.result = None  #: What the API returned
+		self.error = None  #: The exception the request raised
+
+	@asyncio.coroutine
+	def run(self, tc: trello_client.TrelloClient) -> dict:
+		args = _resolve(self.args)
+		# Trello wants lists of ids comma separated.
+		args = [{k: ','.join(v) if isinstance(v, list) else v for k, v in arg.items()}
+		        if isinstance(arg, dict) else arg for arg in args]
+		self.result = yield from getattr(tc, self.method)(*args)
+		return self.result
+
+	def __str__(self) -> str:
+		return '{} {}'.format(self.action, self.description)
+
+	def __repr__(self) -> str:
+		return '<Operation: {}>'.format(self)
+
+
+class Plan:
+	"""
+	The operations that make a board match a spec, grouped into :data:`WAVES`.
+	"""
+
+	def __init__(self, board_id: str) -> None:
+		self.board_id = board_id
+		self.waves = [[] for __ in WAVES]  #: A list of operations for each wave
+
+	def add(self, wave: int, op: Operation) -> Operation:
+		self.waves[wave].append(op)
+		return op
+
+	@property
+	def operations(self) -> List[Operation]:
+		return [op for wave in self.waves for op in wave]
+
+	@property
+	def failed(self) -> List[Operation]:
+		return [op for op in self.operations if op.error is not None]
+
+	def __len__(self) -> int:
+		return sum(len(wave) for wave in self.waves)
+
+	def __str__(self) -> str:
+		if not len(self):
+			return "Board {} already matches".format(self.board_id)
+		lines = ["{} operations for board {}".format(len(self), self.board_id)]
+		for name, wave in zip(WAVES, self.waves):
+			if wave:
+				lines.append("{}:".format(name))
+				lines.extend("  {}".format(op) for op in wave)
+		return '\n'.join(lines)
+
+
+def _by_name(datas: List[dict]) -> Dict[str, dict]:
+	# Open objects win over closed ones with the same name.
+	found = {}
+	for data in sorted(datas, key=lambda d: bool(d.get('closed'))):
+		found.setdefault(data.get('name'), data)
+	return found
+
+
+def _label_ids(card_data: dict) -> List[str]:
+	if 'idLabels' in card_data:
+		return card_data['idLabels']
+	return [l['id'] for l in card_data.get('labels', [])]
+
+
+def _next_pos(datas: List[dict]) -> float:
+	positions = [d['pos'] for d in datas if isinstance(d.get('pos'), (int, float))]
+	return (max(positions) if positions else 0) + _POS_STEP
+
+
+class Reconciler(Synchronizer):
+	"""
+	Works out and makes the creates, updates and closes that bring a board in
+	line with a spec.
+
+	:meth:`.plan` gets the whole board with :meth:`.Board.get_full` and
+	compares it to the spec.  Only what differs becomes an operation: fields
+	that already match aren't sent, and objects that already exist aren't
+	created.  :meth:`.apply` runs the plan's waves one after another, with up
+	to ``concurrency`` requests of a wave at once.  Requests still go through
+	the client, so its rate limiting applies.
+
+	Objects the spec doesn't mention are left alone unless ``prune`` is set,
+	in which case lists and cards are closed, and labels, checklists and
+	check items are deleted.  New objects are added after the existing ones,
+	in the spec's order.  Existing objects aren't moved.
+
+	Because this is a subclass of :class:`~rosetrellis.util.Synchronizer`,
+	:meth:`.plan` and :meth:`.apply` have synchronous partners, ``plan_s``
+	and ``apply_s``.
+	"""
+
+	def __init__(self, tc: trello_client.TrelloClient, board_id: str, spec: dict,
+	             prune: bool=False, concurrency: int=5) -> None:
+		"""
+		:param tc: Used to communicate with Trello API.
+		:param board_id: The board to reconcile.
+		:param spec: How the board should be.  See :mod:`rosetrellis.reconcile`.
+		:param prune: Whether to close or delete what the spec doesn't mention.
+		:param concurrency: Most requests made at the same time.
+		"""
+		self.tc = tc
+		self.board_id = board_id
+		self.spec = spec
+		self.prune = prune
+		self.concurrency = concurrency
+
+	@asyncio.coroutine
+	def plan(self) -> Plan:
+		"""
+		A coroutine.
+
+		:returns: The :class:`.Plan`.  Print it for a dry run.
+		:raises ValueError: If a card in the spec uses a label the spec
+			doesn't describe.
+		"""
+		# A plan made from a cached response wouldn't see what the last apply
+		# did, and would make it all again.
+		self.tc.invalidate_ids([self.board_id])
+		board = yield from Board.get_full(self.board_id, self.tc)
+		plan = Plan(self.board_id)
+
+		self._plan_board(plan, board._raw_data)
+		label_ids = self._plan_labels(plan, [l._raw_data for l in board.labels])
+
+		cards_by_list = collections.defaultdict(list)
+		for card in board.cards:
+			cards_by_list[card._raw_data.get('idList')].append(card._raw_data)
+		checklists_by_card = collections.defaultdict(list)
+		for checklist in board.checklists:
+			checklists_by_card[checklist._raw_data.get('idCard')].append(checklist._raw_data)
+
+		existing_lists = [l._raw_data for l in board.lists]
+		lists_by_name = _by_name(existing_lists)
+		pos = _next_pos(existing_lists)
+		for list_spec in self.spec.get('lists', []):
+			existing = lists_by_name.pop(list_spec['name'], None)
+			description = "list '{}'".format(list_spec['name'])
+			if existing is None:
+				list_id = Ref(plan.add(_BOARD_WAVE, Operation(
+					'create', description, 'create_list',
+					{'name': list_spec['name'], 'idBoard': self.board_id, 'pos': pos})))
+				pos += _POS_STEP
+				cards = []
+			else:
+				list_id = existing['id']
+				if existing.get('closed'):
+					plan.add(_BOARD_WAVE, Operation('update', description, 'update_list',
+					                                list_id, {'closed': 'false'}))
+				cards = cards_by_list.get(list_id, [])
+
+			self._plan_cards(plan, list_spec, list_id, cards, label_ids, checklists_by_card)
+
+		if self.prune:
+			for data in lists_by_name.values():
+				if not data.get('closed'):
+					plan.add(_BOARD_WAVE, Operation('close', "list '{}'".format(data['name']),
+					                                'update_list', data['id'], {'closed': 'true'}))
+		return plan
+
+	@asyncio.coroutine
+	def apply(self, plan: Plan=None, dry_run: bool=False) -> Plan:
+		"""
+		A coroutine.
+
+		:param plan: A plan from :meth:`.plan`.  Made now if not given.
+		:param dry_run: If ``True``, only make the plan.
+		:returns: The plan.  Each operation's ``result`` or ``error`` is set.
+			Operations that depend on one that failed fail too.
+		"""
+		if plan is None:
+			plan = yield from self.plan()
+		if dry_run:
+			logger.info("%s", plan)
+			return plan
+
+		semaphore = asyncio.Semaphore(self.concurrency)
+
+		@asyncio.coroutine
+		def run(op):
+			with (yield from semaphore):
+				try:
+					yield from op.run(self.tc)
+				except Exception as e:
+					logger.warning("Couldn't %s: %r", op, e)
+					op.error = e
+
+		for name, wave in zip(WAVES, plan.waves):
+			if wave:
+				logger.debug("Running %s operations on %s", len(wave), name)
+				yield from asyncio.wait([run(op) for op in wave])
+		return plan
+
+	#####################################
+	## Planning each kind of object
+	#####################################
+	def _plan_board(self, plan: Plan, board_data: dict) -> None:
+		changes = {k: self.spec[k] for k in ('name', 'desc', 'closed')
+		           if k in self.spec and self.spec[k] != board_data.get(k)}
+		if changes:
+			plan.add(_BOARD_WAVE, Operation('update', "board {}".format(self.board_id), 'update_board',
+			                                self.board_id, changes))
+
+	def _plan_labels(self, plan: Plan, existing: List[dict]) -> Dict[str, Union[str, Ref]]:
+		label_ids = {}
+		unmatched = list(existing)
+		for label_spec in self.spec.get('labels', []):
+			name, color = label_spec.get('name', ''), label_spec.get('color')
+			match = next((l for l in unmatched if l.get('name') == name and (name or l.get('color') == color)),
+			             None)
+			description = "label '{}'".format(name or color)
+			if match is None:
+				data = {'name': name, 'color': color, 'idBoard': self.board_id}
+				label_ids[name] = Ref(plan.add(_BOARD_WAVE, Operation('create', description, 'create_label', data)))
+				continue
+
+			unmatched.remove(match)
+			label_ids[name] = match['id']
+			if color != match.get('color'):
+				plan.add(_BOARD_WAVE, Operation('update', description, 'update_label',
+				                                match['id'], {'color': color}))
+
+		if self.prune:
+			for data in unmatched:
+				plan.add(_BOARD_WAVE, Operation('delete', "label '{}'".format(data.get('name') or data.get('color')),
+				                                'delete_label', data['id']))
+		return label_ids
+
+	def _plan_cards(self, plan: Plan, list_spec: dict, list_id: Union[str, Ref], existing: List[dict],
+	                label_ids: Dict[str, Union[str, Ref]], checklists_by_card: Dict[str, List[dict]]) -> None:
+		cards_by_name = _by_name(existing)
+		pos = _next_pos(existing)
+		for card_spec in list_spec.get('cards', []):
+			try:
+				wanted_labels = [label_ids[name] for name in card_spec.get('labels', [])]
+			except KeyError as e:
+				raise ValueError("Card '{}' uses label {}, which isn't in the spec".format(card_spec['name'], e))
+
+			existing_card = cards_by_name.pop(card_spec['name'], None)
+			description = "card '{}'".format(card_spec['name'])
+			if existing_card is None:
+				data = {'name': card_spec['name'], 'idList': list_id, 'pos': pos}
+				for key in ('desc', 'due'):
+					if card_spec.get(key):
+						data[key] = card_spec[key]
+				if wanted_labels:
+					data['idLabels'] = wanted_labels
+				card_id = Ref(plan.add(_CARD_WAVE, Operation('create', description, 'create_card', data)))
+				pos += _POS_STEP
+				checklists = []
+			else:
+				card_id = existing_card['id']
+				changes = {k: card_spec[k] for k in ('desc', 'due')
+				           if k in card_spec and card_spec[k] != existing_card.get(k)}
+				if existing_card.get('closed'):
+					changes['closed'] = 'false'
+				if 'labels' in card_spec and (any(isinstance(l, Ref) for l in wanted_labels) or
+				                              set(wanted_labels) != set(_label_ids(existing_card))):
+					changes['idLabels'] = wanted_labels
+				if changes:
+					plan.add(_CARD_WAVE, Operation('update', description, 'update_card', card_id, changes))
+				checklists = checklists_by_card.get(card_id, [])
+
+			self._plan_checklists(plan, card_spec, card_id, checklists)
+
+		if self.prune:
+			for data in cards_by_name.values():
+				if not data.get('closed'):
+					plan.add(_CARD_WAVE, Operation('close', "card '{}'".format(data['name']),
+					                               'update_card', data['id'], {'closed': 'true'}))
+
+	def _plan_checklists(self, plan: Plan, card_spec: dict, card_id: Union[str, Ref],
+	                     existing: List[dict]) -> None:
+		checklists_by_name = _by_name(existing)
+		for checklist_spec in card_spec.get('checklists', []):
+			existing_checklist = checklists_by_name.pop(checklist_spec['name'], None)
+			description = "checklist '{}'".format(checklist_spec['name'])
+			if existing_checklist is None:
+				checklist_id = Ref(plan.add(_CHECKLIST_WAVE, Operation(
+					'create', description, 'create_checklist', {'idCard': card_id, 'name': checklist_spec['name']})))
+				items = []
+			else:
+				checklist_id = existing_checklist['id']
+				items = existing_checklist.get('checkItems', [])
+
+			self._plan_check_items(plan, checklist_spec, card_id, checklist_id, items)
+
+		if self.prune:
+			for data in checklists_by_name.values():
+				plan.add(_CHECKLIST_WAVE, Operation('delete', "checklist '{}'".format(data['name']),
+				                                    'delete_checklist', data['id']))
+
+	def _plan_check_items(self, plan: Plan, checklist_spec: dict, card_id: Union[str, Ref],
+	                      checklist_id: Union[str, Ref], existing: List[dict]) -> None:
+		items_by_name = _by_name(existing)
+		pos = _next_pos(existing)
+		for item_spec in checklist_spec.get('items', []):
+			if isinstance(item_spec, str):
+				item_spec = {'name': item_spec}
+			existing_item = items_by_name.pop(item_spec['name'], None)
+			description = "check item '{}'".format(item_spec['name'])
+			if existing_item is None:
+				data = {'name': item_spec['name'], 'pos': pos}
+				if item_spec.get('checked'):
+					data['checked'] = 'true'
+				plan.add(_CHECK_ITEM_WAVE, Operation('create', description, 'create_checkitem', checklist_id, data))
+				pos += _POS_STEP
+			elif 'checked' in item_spec:
+				state = 'complete' if item_spec['checked'] else 'incomplete'
+				if existing_item.get('state') != state:
+					plan.add(_CHECK_ITEM_WAVE, Operation('update', description, 'update_checkitem',
+					                                     card_id, checklist_id, existing_item['id'], {'state': state}))
+
+		if self.prune:
+			for data in items_by_name.values():
+				plan.add(_CHECK_ITEM_WAVE, Operation('delete', "check item '{}'".format(data['name']),
+				                                     'delete_checkitem', card_id, checklist_id, data['id']))
@@ -0,0 +1,227 @@
+"""
+Polls many boards, spending the request budget on the boards that are
+actually changing.
+"""
+import asyncio
+import logging
+import time
+
+from typing import Any, Callable, Dict, List
+
+import rosetrellis.trello_client as trello_client
+from rosetrellis.sync import BoardSync
+from rosetrellis.util import Synchronizer
+
+
+logger = logging.getLogger(__name__)
+
+
+class BoardSchedule:
+	"""
+	When a single board is next due to be polled.
+	"""
+
+	def __init__(self, board_id: str, interval: float) -> None:
+		self.board_id = board_id
+		self.interval = interval  #: Seconds between polls while the board keeps changing
+		self.last_activity = None  #: The board's ``dateLastActivity`` when we last looked
+		self.changed = True  #: Whether the board changed since we last polled it
+		self.next_poll_at = 0.0
+		self.polls = 0
+
+	def __repr__(self):
+		return "<BoardSchedule: {} interval={:.0f}s changed={}>".format(self.board_id, self.interval,
+		                                                                self.changed)
+
+
+class PollScheduler(Synchronizer):
+	"""
+	Decides which of many boards to poll, and when.
+
+	Every ``discovery_interval`` seconds we get the ``dateLastActivity`` of
+	every board with a single request.  Boards whose activity date hasn't moved
+	aren't polled at all.  A board that changes is polled as soon as it's due,
+	and then every ``min_interval`` seconds for as long as it keeps changing.
+	Each time a board is due but hasn't changed, its interval is multiplied by
+	``backoff``, up to ``max_interval``, so a board that goes quiet soon costs
+	nothing but its share of the discovery request.
+
+	Polls are limited to what the request budget allows: ``budget_fraction``
+	of the client's rate limit, and never more than the client can make right
+	now without being throttled.  Boards that don't fit wait for the next
+	:meth:`.tick`, most overdue first.
+
+	Because this is a subclass of :class:`~rosetrellis.util.Synchronizer`,
+	:meth:`.tick` and :meth:`.run` have synchronous partners, ``tick_s`` and
+	``run_s``.
+	"""
+
+	def __init__(self,
+	             tc: trello_client.TrelloClient,
+	             poll: Callable[[str], Any]=None,
+	             board_ids: List[str]=None,
+	             min_interval: float=30,
+	             max_interval: float=6 * 60 * 60,
+	             backoff: float=2.0,
+	             discovery_interval: float=60,
+	             budget_fraction: float=0.5,
+	             poll_cost: int=1) -> None:
+		"""
+		:param tc: Used to communicate with Trello API.
+		:param poll: Coroutine function called with the id of each board to
+			poll.  Defaults to a :meth:`.BoardSync.sync` per board.
+		:param board_ids: Only watch these boards.  Defaults to every open
+			board the client's member can see.
+		:param min_interval: Fewest seconds between polls of a single board.
+		:param max_interval: Most seconds a board's interval backs off to.
+		:param backoff: What a board's interval is multiplied by each time
+			it's due but hasn't changed.
+		:param discovery_interval: Seconds between requests for the activity
+			dates of every board.
+		:param budget_fraction: The share of the client's rate limit polling
+			may use.
+		:param poll_cost: The number of requests a single poll makes.
+		"""
+		self.tc = tc
+		self.poll = poll if poll is not None else self._sync_board
+		self.board_ids = board_ids
+		self.min_interval = min_interval
+		self.max_interval = max_interval
+		self.backoff = backoff
+		self.discovery_interval = discovery_interval
+		self.budget_fraction = budget_fraction
+		self.poll_cost = poll_cost
+
+		self.schedules = {}  # type: Dict[str, BoardSchedule]
+		self.syncs = {}  # type: Dict[str, BoardSync]
+		self._rate = trello_client.RATE_LIMIT_REQUESTS / trello_client.RATE_LIMIT_SECONDS * budget_fraction
+		self._tokens = 0.0
+		self._last_tick_at = None
+		self._next_discovery_at = 0.0
+		self._running = False
+
+	@asyncio.coroutine
+	def tick(self) -> List[str]:
+		"""
+		A coroutine.
+
+		Gets the boards' activity dates if it's time to, and polls the boards
+		that are due and fit in the budget.
+
+		:returns: The ids of the boards polled.
+		"""
+		now = time.time()
+		self._refill(now)
+
+		if now >= self._next_discovery_at:
+			yield from self.discover()
+			self._next_discovery_at = now + self.discovery_interval
+
+		due = sorted((s for s in self.schedules.values() if s.next_poll_at <= now),
+		             key=lambda s: s.next_poll_at)
+
+		to_poll = []
+		for schedule in due:
+			if not schedule.changed:
+				schedule.interval = min(schedule.interval * self.backoff, self.max_interval)
+				schedule.next_poll_at = now + schedule.interval
+				continue
+			to_poll.append(schedule)
+
+		allowed = self._allowed_polls()
+		if len(to_poll) > allowed:
+			logger.debug("%s boards due but only budget for %s", len(to_poll), allowed)
+			to_poll = to_poll[:allowed]
+
+		self._tokens -= len(to_poll) * self.poll_cost
+		if to_poll:
+			yield from asyncio.gather(*[self._poll(s, now) for s in to_poll])
+		return [s.board_id for s in to_poll]
+
+	@asyncio.coroutine
+	def discover(self) -> None:
+		"""
+		A coroutine.
+
+		Gets the activity date of every board with one request, and marks the
+		boards that changed.
+		"""
+		boards_data = yield from self.tc.get_boards(fields=('id', 'dateLastActivity'))
+		self._tokens -= 1
+
+		seen = set()
+		for data in boards_data:
+			board_id = data['id']
+			if self.board_ids is not None and board_id not in self.board_ids:
+				continue
+			seen.add(board_id)
+
+			schedule = self.schedules.get(board_id)
+			if schedule is None:
+				schedule = self.schedules[board_id] = BoardSchedule(board_id, self.min_interval)
+			elif data.get('dateLastActivity') != schedule.last_activity and not schedule.changed:
+				# Waking up: poll as soon as the minimum interval since the
+				# last poll allows.
+				schedule.changed = True
+				schedule.next_poll_at -= schedule.interval - self.min_interval
+				schedule.interval = self.min_interval
+			schedule.last_activity = data.get('dateLastActivity')
+
+		for board_id in set(self.schedules) - seen:
+			logger.debug("No longer watching board %s", board_id)
+			del self.schedules[board_id]
+			self.syncs.pop(board_id, None)
+
+	@asyncio.coroutine
+	def run(self, tick_interval: float=1.0) -> None:
+		"""
+		A coroutine.
+
+		Calls :meth:`.tick` every ``tick_interval`` seconds until :meth:`.stop`
+		is called.
+		"""
+		self._running = True
+		while self._running:
+			try:
+				yield from self.tick()
+			except Exception as e:
+				logger.warning("Polling tick failed: %r", e)
+			yield from asyncio.sleep(tick_interval)
+
+	def stop(self) -> None:
+		self._running = False
+
+	def _refill(self, now: float) -> None:
+		# A token bucket holding at most one discovery interval's worth of
+		# requests.
+		capacity = self._rate * max(self.discovery_interval, self.min_interval)
+		if self._last_tick_at is None:
+			self._tokens = capacity
+		else:
+			self._tokens = min(self._tokens + (now - self._last_tick_at) * self._rate, capacity)
+		self._last_tick_at = now
+
+	def _allowed_polls(self) -> int:
+		budget = min(self._tokens, self.tc.request_budget() * self.budget_fraction)
+		return max(int(budget // self.poll_cost), 0)
+
+	@asyncio.coroutine
+	def _poll(self, schedule: BoardSchedule, now: float) -> None:
+		schedule.changed = False
+		schedule.next_poll_at = now + schedule.interval
+		try:
+			result = self.poll(schedule.board_id)
+			if asyncio.iscoroutine(result):
+				yield from result
+		except Exception as e:
+			logger.warning("Polling board %s failed: %r", schedule.board_id, e)
+			schedule.changed = True
+		else:
+			schedule.polls += 1
+
+	@asyncio.coroutine
+	def _sync_board(self, board_id: str) -> Any:
+		sync = self.syncs.get(board_id)
+		if sync is None:
+			sync = self.syncs[board_id] = BoardSync(self.tc, board_id)
+		return (yield from sync.sync())
@@ -0,0 +1,242 @@
+"""
+Searches the names and descriptions of the cards, and the names of the check
+items, in a client's object cache, without making any requests.
+"""
+import asyncio
+import bisect
+import collections
+import logging
+import math
+import re
+
+from typing import Dict, List, Tuple
+
+import rosetrellis.trello_client as trello_client
+from rosetrellis.models import Card, CheckItem, Checklist, TrelloObjectCollection
+
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+	"""
+	Splits ``text`` into lower case words.
+	"""
+	return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def _match_all(words: List[str], match) -> collections.Counter:
+	"""
+	Sums the scores ``match(word, is_last)`` gives for each word, keeping only
+	the ids every word matched.
+	"""
+	scores = None
+	for i, word in enumerate(words):
+		word_scores = match(word, i == len(words) - 1)
+		if scores is None:
+			scores = collections.Counter(word_scores)
+		else:
+			scores = collections.Counter({id_: score + word_scores[id_]
+			                              for id_, score in scores.items() if id_ in word_scores})
+		if not scores:
+			break
+	return scores or collections.Counter()
+
+
+class SearchIndex:
+	"""
+	An inverted index from words to the objects whose fields contain them.
+
+	It's an object cache index (see :meth:`.ObjectCache.add_index`), so it's
+	kept up to date as objects are hydrated and removed.  Each field's words
+	count ``weight`` times towards an object's score.  Words are kept sorted
+	too, so the last word of a query can match as a prefix.
+	"""
+
+	def __init__(self, fields: Dict[type, Dict[str, float]]) -> None:
+		"""
+		:param fields: Maps each type to index to ``{field name: weight}``.
+		"""
+		self.fields = fields
+		# word -> {id: weighted count}
+		self._postings = {}
+		# id -> {word: weighted count}
+		self._docs = {}
+		self._types = {}
+		self._words = []
+
+	def update(self, obj) -> None:
+		self.discard(obj.id)
+
+		weights = collections.Counter()
+		for field, weight in self.fields.get(type(obj), {}).items():
+			for word in tokenize(obj.__dict__.get('_raw_data', {}).get(field)):
+				weights[word] += weight
+		if not weights:
+			return
+
+		self._docs[obj.id] = weights
+		self._types[obj.id] = type(obj)
+		for word, weight in weights.items():
+			posting = self._postings.get(word)
+			if posting is None:
+				posting = self._postings[word] = {}
+				bisect.insort(self._words, word)
+			posting[obj.id] = weight
+
+	def discard(self, id_: str) -> None:
+		weights = self._docs.pop(id_, None)
+		if weights is None:
+			return
+		del self._types[id_]
+		for word in weights:
+			posting = self._postings[word]
+			del posting[id_]
+			if not posting:
+				del self._postings[word]
+				del self._words[bisect.bisect_left(self._words, word)]
+
+	def clear(self) -> None:
+		self._postings.clear()
+		self._docs.clear()
+		self._types.clear()
+		self._words = []
+
+	def match(self, word: str, prefix: bool=False) -> Dict[str, float]:
+		"""
+		Scores the objects containing a single word.  Scores are weighted word
+		counts scaled by how rare the word is.
+
+		:param word: A word as returned by :func:`.tokenize`.
+		:param prefix: If ``True``, longer words starting with ``word`` match too.
+		:returns: Maps ids to scores.
+		"""
+		scores = collections.Counter()
+		for match in (self._prefixed(word) if prefix else [word]):
+			posting = self._postings.get(match)
+			if not posting:
+				continue
+			idf = 1 + math.log(len(self._docs) / len(posting))
+			for id_, weight in posting.items():
+				scores[id_] += weight * idf
+		return scores
+
+	def search(self, query: str, prefix: bool=True) -> List[Tuple[str, type, float]]:
+		"""
+		Finds the objects containing every word in ``query``.
+
+		:param prefix: If ``True``, the last word of the query also matches
+			longer words starting with it.
+		:returns: ``(id, type, score)`` tuples, best first.
+		"""
+		scores = _match_all(tokenize(query), lambda word, is_last: self.match(word, prefix and is_last))
+		return [(id_, self._types[id_], score) for id_, score in scores.most_common()]
+
+	def type_of(self, id_: str) -> type:
+		return self._types[id_]
+
+	def _prefixed(self, prefix: str) -> List[str]:
+		i = bisect.bisect_left(self._words, prefix)
+		words = []
+		while i < len(self._words) and self._words[i].startswith(prefix):
+			words.append(self._words[i])
+			i += 1
+		return words
+
+	def __len__(self) -> int:
+		return len(self._docs)
+
+
+class CardSearch:
+	"""
+	Searches the cards in a client's object cache by the words in their
+	names, descriptions and check items.
+
+	The :class:`.SearchIndex` is registered with the object cache when this is
+	created, filled with the cards and check items already there, and from then
+	on updated whenever they're hydrated or refreshed.  Matching check items
+	count towards the card their checklist is on, as long as we have the
+	checklist.
+
+	When the local index is empty, :meth:`.search` can fall back to Trello's
+	own search, and the cards it returns are indexed for next time.
+	"""
+
+	#: The index is registered with the object cache under this name.
+	INDEX_NAME = 'search'
+
+	#: How much a word in each field counts towards a card's score.
+	FIELDS = {
+		Card: {'name': 3, 'desc': 1},
+		CheckItem: {'name': 2},
+	}
+
+	def __init__(self, tc: trello_client.TrelloClient, fallback: bool=True) -> None:
+		"""
+		:param tc: The client whose object cache we search.
+		:param fallback: Whether :meth:`.search` uses Trello's search when the
+			local index is empty.
+		"""
+		self.tc = tc
+		self.fallback = fallback
+
+		index = tc.obj_cache.get_index(Card, self.INDEX_NAME)
+		if index is None:
+			index = SearchIndex(self.FIELDS)
+			for klass in self.FIELDS:
+				tc.obj_cache.add_index(klass, self.INDEX_NAME, index)
+		self.index = index
+
+	def search_local(self, query: str, limit: int=20, prefix: bool=True) -> TrelloObjectCollection:
+		"""
+		Searches the local index only.
+
+		:param limit: The most cards to return.
+		:param prefix: See :meth:`.SearchIndex.search`.
+		:returns: Cards, best match first.
+		"""
+		cards = {}
+
+		def match(word, is_last):
+			# Words in a card's check items count as the card's.
+			card_scores = collections.Counter()
+			for id_, score in self.index.match(word, prefix and is_last).items():
+				card = self._card_for(id_, self.index.type_of(id_))
+				if card is not None:
+					cards[card.id] = card
+					card_scores[card.id] += score
+			return card_scores
+
+		scores = _match_all(tokenize(query), match)
+		return TrelloObjectCollection(cards[id_] for id_, __ in scores.most_common(limit))
+
+	@asyncio.coroutine
+	def search(self, query: str, limit: int=20, prefix: bool=True) -> TrelloObjectCollection:
+		"""
+		A coroutine.
+
+		Like :meth:`.search_local`, but if the local index is still empty and
+		``fallback`` is set, asks Trello instead.
+		"""
+		if len(self.index) or not self.fallback:
+			return self.search_local(query, limit=limit, prefix=prefix)
+
+		logger.debug("Search index is empty, searching Trello for '%s'", query)
+		result = yield from self.tc.search(query, model_types='cards', cards_limit=limit, partial=prefix)
+		return (yield from Card.hydrate_many(result.get('cards', []), self.tc))
+
+	def _card_for(self, id_: str, klass: type):
+		cache = self.tc.obj_cache
+		if klass is CheckItem:
+			check_item = cache.get(id_, CheckItem)
+			checklist = cache.get(check_item.checklist_id, Checklist) if check_item is not None else None
+			if checklist is None:
+				return None
+			id_ = checklist.__dict__.get('_raw_data', {}).get('idCard')
+		card = cache.get(id_, Card) if id_ else None
+		if card is None and klass is Card:
+			# Garbage collected since it was indexed.
+			cache.remove(id_)
+		return card
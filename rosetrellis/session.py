@@ -0,0 +1,210 @@
+"""
+Collects changes to many objects and saves them together.
+"""
+import asyncio
+import collections
+import logging
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+import rosetrellis.trello_client as trello_client
+from rosetrellis.models import TrelloObject
+from rosetrellis.util import Synchronizer
+
+
+logger = logging.getLogger(__name__)
+
+
+class DependencyError(Exception):
+	"""
+	Raised in place of saving an object that refers to a new object that
+	couldn't be created.
+	"""
+
+
+class FlushResult:
+	"""
+	What happened to each object in a :meth:`.Session.flush`.
+	"""
+
+	def __init__(self) -> None:
+		self.saved = []  #: Objects created or updated
+		self.deleted = []  #: Objects deleted
+		self.errors = collections.OrderedDict()  #: Maps objects that failed to the exception
+
+	@property
+	def ok(self) -> bool:
+		return not self.errors
+
+	def __repr__(self) -> str:
+		return "<FlushResult: {} saved, {} deleted, {} failed>".format(len(self.saved), len(self.deleted),
+		                                                               len(self.errors))
+
+
+def _related(obj: TrelloObject) -> Iterable[TrelloObject]:
+	""":returns: The objects ``obj``'s attributes refer to."""
+	for name, value in obj.__dict__.items():
+		if name.startswith('_') or name == 'tc':
+			continue
+		values = value if isinstance(value, (list, tuple)) else [value]
+		for v in values:
+			if isinstance(v, TrelloObject) and v is not obj:
+				yield v
+
+
+class Session(Synchronizer):
+	"""
+	A unit of work: tracks new, changed and deleted objects and saves them all
+	with :meth:`.flush`.
+
+	Saving objects one by one with :meth:`.TrelloObject.save` makes a request
+	per object straight away, and a new card can't be saved before the new
+	list it's on.  A session instead:
+
+	* makes at most one update per object, however many of its attributes
+	  were changed, and nothing at all for objects that are deleted in the
+	  same flush;
+	* creates new objects after the new objects they refer to, so a card
+	  added to a new list is created once the list has an id.  New objects
+	  referred to by tracked objects are saved too, even if they weren't
+	  added;
+	* makes the requests that don't depend on each other at the same time,
+	  up to ``concurrency`` at once;
+	* carries on when a request fails, and reports what happened to each
+	  object in a :class:`.FlushResult`.  Objects that failed stay in the
+	  session for the next flush.
+
+	Deletes are made after every create and update.
+
+	Because this is a subclass of :class:`~rosetrellis.util.Synchronizer`,
+	:meth:`.flush` has a synchronous partner, ``flush_s``.
+	"""
+
+	def __init__(self, tc: trello_client.TrelloClient, concurrency: int=5) -> None:
+		"""
+		:param tc: Used to communicate with Trello API.
+		:param concurrency: Most requests made at the same time.
+		"""
+		self.tc = tc
+		self.concurrency = concurrency
+		self._tracked = collections.OrderedDict()
+		self._deleted = collections.OrderedDict()
+
+	def add(self, *objs: TrelloObject) -> None:
+		"""
+		Tracks objects so that the next :meth:`.flush` creates them if they're
+		new, or saves their changes.  Changes made after adding are included.
+		"""
+		for obj in objs:
+			self._deleted.pop(obj, None)
+			self._tracked[obj] = None
+
+	def delete(self, *objs: TrelloObject) -> None:
+		"""
+		Marks objects to be deleted by the next :meth:`.flush`.  Their changes
+		won't be saved, and new objects are just forgotten.
+		"""
+		for obj in objs:
+			self._tracked.pop(obj, None)
+			if obj.id:
+				self._deleted[obj] = None
+
+	@property
+	def new(self) -> List[TrelloObject]:
+		""" The tracked objects that will be created. """
+		return [obj for obj in self._tracked if not obj.id]
+
+	@property
+	def dirty(self) -> List[TrelloObject]:
+		""" The tracked objects that exist and have changes to save. """
+		return [obj for obj in self._tracked if obj.id and obj.is_dirty]
+
+	@property
+	def deleted(self) -> List[TrelloObject]:
+		return list(self._deleted)
+
+	@asyncio.coroutine
+	def flush(self) -> FlushResult:
+		"""
+		A coroutine.
+
+		Saves everything the session tracks.
+
+		:returns: A :class:`.FlushResult`.  Failures are reported there rather
+			than raised.
+		"""
+		result = FlushResult()
+		semaphore = asyncio.Semaphore(self.concurrency)
+
+		@asyncio.coroutine
+		def run(obj, coro_func, done):
+			with (yield from semaphore):
+				try:
+					yield from coro_func()
+				except Exception as e:
+					logger.warning("Couldn't flush %r: %r", obj, e)
+					result.errors[obj] = e
+				else:
+					done.append(obj)
+
+		saving, dependencies = self._pending_saves()
+		for level in self._levels(saving, dependencies, result):
+			ready = []
+			for obj in level:
+				failed = [dep for dep in dependencies[obj] if dep in result.errors]
+				if failed:
+					result.errors[obj] = DependencyError("{!r} refers to {!r}, which wasn't saved".format(obj,
+					                                                                                      failed[0]))
+				else:
+					ready.append(obj)
+			if ready:
+				yield from asyncio.wait([run(obj, obj.save_now, result.saved) for obj in ready])
+
+		deleting = list(self._deleted)
+		if deleting:
+			yield from asyncio.wait([run(obj, obj.delete, result.deleted) for obj in deleting])
+
+		for obj in result.saved:
+			self._tracked.pop(obj, None)
+		for obj in result.deleted:
+			self._deleted.pop(obj, None)
+		return result
+
+	def _pending_saves(self) -> Tuple[List[TrelloObject], Dict[TrelloObject, Set[TrelloObject]]]:
+		"""
+		:returns: The objects to save, including new objects that tracked
+			objects refer to, and the new objects each of them needs created
+			first.
+		"""
+		saving = collections.OrderedDict((obj, None) for obj in self._tracked if obj.is_dirty)
+		dependencies = {}
+		pending = list(saving)
+		while pending:
+			obj = pending.pop()
+			dependencies[obj] = {rel for rel in _related(obj) if not rel.id}
+			for rel in dependencies[obj]:
+				if rel not in saving:
+					saving[rel] = None
+					pending.append(rel)
+		return list(saving), dependencies
+
+	def _levels(self, objs: List[TrelloObject], dependencies: Dict[TrelloObject, Set[TrelloObject]],
+	            result: FlushResult) -> List[List[TrelloObject]]:
+		"""
+		Sorts objects into levels, each only depending on earlier levels.
+		Objects in a dependency cycle are reported as errors.
+		"""
+		waiting = {obj: set(dependencies[obj]) for obj in objs}
+		levels = []
+		while waiting:
+			level = [obj for obj in objs if obj in waiting and not waiting[obj]]
+			if not level:
+				for obj in waiting:
+					result.errors[obj] = DependencyError("{!r} is in a cycle of new objects".format(obj))
+				break
+			for obj in level:
+				del waiting[obj]
+			for deps in waiting.values():
+				deps.difference_update(level)
+			levels.append(level)
+		return levels
@@ -0,0 +1,198 @@
+"""
+Saves the objects in a client's object cache to a file, and loads them back
+without talking to Trello, so a new process can start with a warm cache.
+"""
+import asyncio
+import collections
+import gzip
+import json
+import logging
+import os
+import time
+
+from typing import Any, Union
+
+import rosetrellis.trello_client as trello_client
+from rosetrellis.models import CheckItem, TrelloObject, TrelloObjectCollection, hydrate_together
+from rosetrellis.util import Synchronizer
+
+
+logger = logging.getLogger(__name__)
+
+#: Written in the first line of every snapshot.
+SNAPSHOT_FORMAT = 'rosetrellis-snapshot'
+SNAPSHOT_VERSION = 1
+
+# Rebuilt from the nested data of the object that owns them.
+_NESTED_ONLY = (CheckItem,)
+
+
+def _open(path: str, mode: str, compressed: bool):
+	if compressed:
+		return gzip.open(path, mode + 't', encoding='utf-8')
+	return open(path, mode, encoding='utf-8')
+
+
+def _snapshot_classes() -> dict:
+	return {klass.__name__: klass for klass in TrelloObject.__subclasses__()
+	        if klass not in _NESTED_ONLY}
+
+
+class Snapshot(Synchronizer):
+	"""
+	A file holding the API data every object in an object cache was built
+	from, one JSON object per line.  Paths ending in ``.gz`` are compressed.
+
+	Each line records an object's type, its raw API data (which includes the
+	ids of related objects), whether its relations were inflated, and when it
+	was last refreshed.  :meth:`.load` hydrates everything in one pass with
+	``fetch_missing=False``, so relations are linked to the other loaded
+	objects without any requests.  Objects keep their original refresh time,
+	so the object cache's max age policies see them as exactly as stale as
+	they were when saved.  :meth:`.revalidate` then gets the stale ones again,
+	in the background by default.
+
+	The object cache only holds weak references, so the loaded objects are
+	kept alive in :attr:`.objects` until :meth:`.release` is called.
+
+	Because this is a subclass of :class:`~rosetrellis.util.Synchronizer`,
+	:meth:`.load` and :meth:`.revalidate` have synchronous partners,
+	``load_s`` and ``revalidate_s``.
+	"""
+
+	def __init__(self, tc: trello_client.TrelloClient, path: str) -> None:
+		"""
+		:param tc: The client whose object cache we save or fill.
+		:param path: Where the snapshot is kept.
+		"""
+		self.tc = tc
+		self.path = path
+		self.compressed = path.endswith('.gz')
+		self.objects = TrelloObjectCollection()  #: The objects loaded
+		self.created_at = None  #: When the loaded snapshot was saved
+		self.revalidation = None  #: The background :meth:`.revalidate` task
+
+	def save(self) -> int:
+		"""
+		Writes every object in the object cache that has been built from API
+		data.  Local changes that haven't been saved to Trello aren't included.
+
+		:returns: The number of objects written.
+		"""
+		klasses = set(_snapshot_classes().values())
+		written = 0
+		tmp_path = '{}.tmp'.format(self.path)
+		with _open(tmp_path, 'w', self.compressed) as f:
+			f.write(json.dumps({'format': SNAPSHOT_FORMAT, 'version': SNAPSHOT_VERSION,
+			                    'created_at': time.time()}) + '\n')
+			for obj in self.tc.obj_cache.values():
+				raw_data = obj.__dict__.get('_raw_data')
+				if type(obj) not in klasses or raw_data is None or not obj._refreshed_at:
+					continue
+				f.write(json.dumps({'type': type(obj).__name__,
+				                    'refreshed_at': obj._refreshed_at,
+				                    'inflated': obj.__dict__.get('_raw_inflated', True),
+				                    'data': raw_data}, separators=(',', ':')) + '\n')
+				written += 1
+
+		# Never leave a half-written snapshot behind.
+		os.replace(tmp_path, self.path)
+		logger.info("Saved %s objects to %s", written, self.path)
+		return written
+
+	@asyncio.coroutine
+	def load(self, revalidate: bool=True, max_age: Union[float, None]=None) -> TrelloObjectCollection:
+		"""
+		A coroutine.
+
+		Hydrates every object in the snapshot without making any requests.
+
+		:param revalidate: If ``True``, start a :meth:`.revalidate` in the
+			background.  It's kept in :attr:`.revalidation`.
+		:param max_age: Passed on to :meth:`.revalidate`.
+		:returns: The loaded objects.
+		:raises ValueError: If the file isn't a snapshot we can read.
+		"""
+		klasses = _snapshot_classes()
+		# inflated -> class -> [(data, refreshed_at), ...]
+		groups = {True: collections.OrderedDict(), False: collections.OrderedDict()}
+
+		with _open(self.path, 'r', self.compressed) as f:
+			header = json.loads(f.readline() or '{}')
+			if header.get('format') != SNAPSHOT_FORMAT or header.get('version') != SNAPSHOT_VERSION:
+				raise ValueError("{} isn't a version {} snapshot".format(self.path, SNAPSHOT_VERSION))
+			self.created_at = header.get('created_at')
+
+			for line in f:
+				if not line.strip():
+					continue
+				record = json.loads(line)
+				klass = klasses.get(record['type'])
+				if klass is None:
+					logger.warning("Skipping %s in snapshot, we don't know that type", record['type'])
+					continue
+				groups[bool(record['inflated'])].setdefault(klass, []).append(
+					(record['data'], record['refreshed_at']))
+
+		loaded = []
+		for inflated, by_class in groups.items():
+			if not by_class:
+				continue
+			klass_groups = [(klass, [data for data, __ in records]) for klass, records in by_class.items()]
+			results = yield from hydrate_together(klass_groups, self.tc, inflate_children=inflated,
+			                                      fetch_missing=False)
+			for objs, records in zip(results, by_class.values()):
+				for obj, (__, refreshed_at) in zip(objs, records):
+					obj._refreshed_at = refreshed_at
+					loaded.append(obj)
+
+		self.objects = TrelloObjectCollection(loaded)
+		logger.info("Loaded %s objects from %s", len(loaded), self.path)
+
+		if revalidate:
+			self.revalidation = asyncio.ensure_future(self.revalidate(max_age=max_age))
+		return self.objects
+
+	@asyncio.coroutine
+	def revalidate(self, max_age: Union[float, None]=None) -> int:
+		"""
+		A coroutine.
+
+		Gets the loaded objects that aren't fresh any more again, with batch
+		requests.  Objects Trello doesn't give us back are removed from the
+		object cache.
+
+		:param max_age: Overrides the object cache's max age policies.  With
+			no policy and no ``max_age``, every object is fetched again.
+		:returns: The number of objects fetched again.
+		"""
+		stale = collections.OrderedDict()
+		for obj in self.objects:
+			if self._is_stale(obj, max_age):
+				stale.setdefault((type(obj), obj.__dict__.get('_raw_inflated', True)), []).append(obj.id)
+
+		refetched = 0
+		for (klass, inflated), ids in stale.items():
+			datas = yield from klass._get_many_data(ids, self.tc)
+			objs = yield from klass.hydrate_many(datas, self.tc, inflate_children=inflated)
+			refetched += len(objs)
+
+			gone = set(ids) - {obj.id for obj in objs}
+			for id_ in gone:
+				self.tc.obj_cache.remove(id_)
+			if gone:
+				self.objects = TrelloObjectCollection(o for o in self.objects if o.id not in gone)
+
+		logger.info("Revalidated %s objects from %s", refetched, self.path)
+		return refetched
+
+	def release(self) -> None:
+		"""
+		Stops keeping the loaded objects alive.
+		"""
+		self.objects = TrelloObjectCollection()
+
+	def _is_stale(self, obj: Any, max_age: Union[float, None]) -> bool:
+		if max_age is None and self.tc.obj_cache.max_age_for(obj) is None:
+			return True
+		return not self.tc.obj_cache.is_fresh(obj, max_age)
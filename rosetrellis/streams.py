@@ -0,0 +1,158 @@
+"""
+Streams of :class:`~rosetrellis.models.TrelloObject` instances gathered from
+many sources, like every board you can see, without holding all of them in
+memory at once.
+"""
+import asyncio
+import logging
+
+from typing import Any, Callable, Iterable
+
+from rosetrellis.util import Synchronizer
+
+
+logger = logging.getLogger(__name__)
+
+# Put on the results queue by a worker that has run out of sources.
+_DONE = object()
+
+
+class _Failure:
+	def __init__(self, exception: BaseException) -> None:
+		self.exception = exception
+
+
+class TrelloObjectStream(Synchronizer):
+	"""
+	Yields the objects that ``fetch`` gets for each of the sources
+	``get_sources`` provides, as soon as they've been hydrated.
+
+	Sources are worked through by at most ``concurrency`` workers.  Objects
+	wait in a buffer of at most ``buffer_size`` objects until they're consumed.
+	When the buffer is full, workers stop fetching until the consumer catches
+	up.
+
+	Get objects with :meth:`.next`, which returns ``None`` once every source is
+	done::
+
+		stream = Card.iter_all(tc, concurrency=4)
+		while True:
+			card = yield from stream.next()
+			if card is None:
+				break
+
+	On Python 3.5+ you can use ``async for`` instead, and outside of a running
+	event loop you can iterate over the stream with a plain ``for`` loop.
+
+	Because this is a subclass of :class:`~rosetrellis.util.Synchronizer`,
+	:meth:`.next` has a synchronous partner, ``next_s``.
+	"""
+
+	def __init__(self,
+	             get_sources: Callable[[], Iterable[Any]],
+	             fetch: Callable[[Any], Iterable[Any]],
+	             concurrency: int=4,
+	             buffer_size: int=100) -> None:
+		"""
+		:param get_sources: Callable returning a coroutine that returns the
+			sources, for example every :class:`~rosetrellis.models.Board`.
+		:param fetch: Callable returning a coroutine that returns the objects
+			for a single source.
+		:param concurrency: Maximum number of sources fetched at the same time.
+		:param buffer_size: Maximum number of objects waiting to be consumed.
+		"""
+		if concurrency < 1:
+			raise ValueError("concurrency must be at least 1")
+
+		self.get_sources = get_sources
+		self.fetch = fetch
+		self.concurrency = concurrency
+		self.buffer_size = buffer_size
+
+		self._sources = None
+		self._results = None
+		self._workers = []
+		self._running = 0
+		self._finished = False
+
+	@asyncio.coroutine
+	def next(self):
+		"""
+		A coroutine.
+
+		:returns: The next object, or ``None`` once there are no more.
+		:raises: Whatever getting the sources or fetching one of them raised.
+			The stream is closed first.
+		"""
+		if self._finished:
+			return None
+
+		if self._results is None:
+			yield from self._start()
+
+		while True:
+			if not self._running and self._results.empty():
+				self._finished = True
+				return None
+
+			item = yield from self._results.get()
+			if item is _DONE:
+				self._running -= 1
+			elif isinstance(item, _Failure):
+				self.close()
+				raise item.exception
+			else:
+				return item
+
+	def close(self) -> None:
+		"""
+		Stops fetching.  Objects that haven't been consumed are dropped.
+		"""
+		self._finished = True
+		for worker in self._workers:
+			worker.cancel()
+		self._workers = []
+
+	@asyncio.coroutine
+	def _start(self) -> None:
+		self._results = asyncio.Queue(maxsize=self.buffer_size)
+		self._sources = asyncio.Queue()
+		for source in (yield from self.get_sources()):
+			self._sources.put_nowait(source)
+
+		self._running = min(self.concurrency, self._sources.qsize())
+		self._workers = [asyncio.ensure_future(self._work()) for __ in range(self._running)]
+
+	@asyncio.coroutine
+	def _work(self) -> None:
+		try:
+			while not self._sources.empty():
+				source = self._sources.get_nowait()
+				for obj in (yield from self.fetch(source)):
+					# Waits here while the consumer is behind.
+					yield from self._results.put(obj)
+		except asyncio.CancelledError:
+			raise
+		except Exception as e:
+			logger.debug("Stream worker failed: %s", e)
+			yield from self._results.put(_Failure(e))
+		else:
+			yield from self._results.put(_DONE)
+
+	def __iter__(self):
+		loop = asyncio.get_event_loop()
+		while True:
+			obj = loop.run_until_complete(self.next())
+			if obj is None:
+				return
+			yield obj
+
+	def __aiter__(self):
+		return self
+
+	@asyncio.coroutine
+	def __anext__(self):
+		obj = yield from self.next()
+		if obj is None:
+			raise StopAsyncIteration
+		return obj
@@ -0,0 +1,365 @@
+"""
+Keeps the objects in a client's object cache up to date by applying the
+changes described by Trello actions, instead of downloading everything again.
+"""
+import asyncio
+import collections
+import logging
+
+from typing import Iterable, Union
+
+import rosetrellis.trello_client as trello_client
+from rosetrellis.models import Board, Card, CheckItem, Checklist, Label, Lists
+from rosetrellis.util import Synchronizer
+
+
+logger = logging.getLogger(__name__)
+
+
+class SyncResult:
+	"""
+	What applying a set of actions did.
+	"""
+
+	def __init__(self) -> None:
+		self.applied = 0  #: Actions applied to cached objects
+		self.ignored = 0  #: Actions that didn't concern anything we model or have cached
+		self.refetched = 0  #: Objects we had to get from the API again
+		self.removed = 0  #: Objects removed from the object cache
+		self.full_refetch = False  #: Whether the whole board was fetched again
+
+	def __repr__(self):
+		return "<SyncResult: applied={} ignored={} refetched={} removed={} full_refetch={}>".format(
+			self.applied, self.ignored, self.refetched, self.removed, self.full_refetch
+		)
+
+
+class _Batch:
+	"""
+	State for a single :meth:`.ActionApplier.apply`.
+	"""
+
+	def __init__(self) -> None:
+		self.result = SyncResult()
+		# class -> ids to get again once every action is applied
+		self.refetch = collections.OrderedDict()
+
+	def queue_refetch(self, klass: type, id_: Union[str, None]) -> bool:
+		if not id_:
+			return False
+		self.refetch.setdefault(klass, collections.OrderedDict())[id_] = None
+		return True
+
+
+class ActionApplier:
+	"""
+	Applies Trello actions to the objects in a client's object cache.
+
+	Changes that an action fully describes, like a card being renamed or
+	moved, are applied to the cached object directly.  Objects that were
+	created, or changed in ways the action doesn't fully describe, are fetched
+	again, in batches, once all of the actions are applied.  Objects we don't
+	have cached are left alone, unless the action created them.
+	"""
+
+	#: Maps action types to the name of the method that applies them.
+	HANDLERS = {
+		'updateBoard': '_update_board',
+
+		'createList': '_refetch_list',
+		'moveListToBoard': '_refetch_list',
+		'moveListFromBoard': '_refetch_list',
+		'updateList': '_update_list',
+
+		'createCard': '_refetch_card',
+		'copyCard': '_refetch_card',
+		'convertToCardFromCheckItem': '_refetch_card',
+		'moveCardToBoard': '_refetch_card',
+		'moveCardFromBoard': '_refetch_card',
+		'addMemberToCard': '_refetch_card',
+		'removeMemberFromCard': '_refetch_card',
+		'updateCard': '_update_card',
+		'deleteCard': '_delete_card',
+
+		'addLabelToCard': '_add_label_to_card',
+		'removeLabelFromCard': '_remove_label_from_card',
+		'createLabel': '_refetch_label',
+		'updateLabel': '_update_label',
+		'deleteLabel': '_delete_label',
+
+		'addChecklistToCard': '_refetch_checklist',
+		'removeChecklistFromCard': '_remove_checklist',
+		'updateChecklist': '_refetch_checklist',
+		'createCheckItem': '_refetch_checklist',
+		'updateCheckItem': '_refetch_checklist',
+		'deleteCheckItem': '_refetch_checklist',
+		'updateCheckItemStateOnCard': '_update_check_item_state',
+	}
+
+	def __init__(self, tc: trello_client.TrelloClient) -> None:
+		self.tc = tc
+
+	@asyncio.coroutine
+	def apply(self, actions: Iterable[dict]) -> SyncResult:
+		"""
+		A coroutine.
+
+		:param actions: Actions as returned by the Trello API, oldest first.
+		:returns: A :class:`.SyncResult`.
+		"""
+		batch = _Batch()
+		for action in actions:
+			handler = self.HANDLERS.get(action.get('type'))
+			if handler is None:
+				logger.debug("Ignoring '%s' action %s", action.get('type'), action.get('id'))
+				batch.result.ignored += 1
+				continue
+
+			applied = yield from getattr(self, handler)(action.get('data', {}), batch)
+			if applied:
+				batch.result.applied += 1
+			else:
+				batch.result.ignored += 1
+
+		yield from self._refetch_all(batch)
+		return batch.result
+
+	#####################################
+	## Helpers
+	#####################################
+	def _remove(self, klass: type, id_: Union[str, None], batch: '_Batch') -> bool:
+		if not id_:
+			return False
+		batch.refetch.get(klass, {}).pop(id_, None)
+		if self.tc.obj_cache.get(id_, klass) is None:
+			return False
+		self.tc.obj_cache.remove(id_)
+		batch.result.removed += 1
+		return True
+
+	@asyncio.coroutine
+	def _update(self, klass: type, entity: dict, old: dict, batch: '_Batch') -> bool:
+		"""
+		Applies the new values of the fields named in ``old`` to the cached
+		object ``entity`` describes.
+		"""
+		obj = self.tc.obj_cache.get(entity.get('id'), klass)
+		if obj is None:
+			return False
+
+		fields = klass._api_field_set()
+		changed = {k: entity[k] for k in old if k in fields and k in entity}
+		if not changed or len(changed) != len(old):
+			# The action doesn't tell us everything that changed.
+			return batch.queue_refetch(klass, obj.id)
+
+		changed['id'] = obj.id
+		yield from obj.merge_api_data(changed)
+		return True
+
+	@asyncio.coroutine
+	def _refetch_all(self, batch: '_Batch') -> None:
+		# Responses the client cached from before the actions are out of date.
+		self.tc.invalidate_ids([id_ for ids in batch.refetch.values() for id_ in ids])
+		for klass, ids in batch.refetch.items():
+			if not ids:
+				continue
+			datas = yield from klass._get_many_data(list(ids), self.tc)
+			objs = yield from klass.hydrate_many(datas, self.tc)
+			batch.result.refetched += len(objs)
+
+	#####################################
+	## Handlers
+	#####################################
+	@asyncio.coroutine
+	def _update_board(self, data: dict, batch: '_Batch') -> bool:
+		return (yield from self._update(Board, data.get('board', {}), data.get('old', {}), batch))
+
+	@asyncio.coroutine
+	def _refetch_list(self, data: dict, batch: '_Batch') -> bool:
+		return batch.queue_refetch(Lists, data.get('list', {}).get('id'))
+
+	@asyncio.coroutine
+	def _update_list(self, data: dict, batch: '_Batch') -> bool:
+		return (yield from self._update(Lists, data.get('list', {}), data.get('old', {}), batch))
+
+	@asyncio.coroutine
+	def _refetch_card(self, data: dict, batch: '_Batch') -> bool:
+		return batch.queue_refetch(Card, data.get('card', {}).get('id'))
+
+	@asyncio.coroutine
+	def _update_card(self, data: dict, batch: '_Batch') -> bool:
+		return (yield from self._update(Card, data.get('card', {}), data.get('old', {}), batch))
+
+	@asyncio.coroutine
+	def _delete_card(self, data: dict, batch: '_Batch') -> bool:
+		return self._remove(Card, data.get('card', {}).get('id'), batch)
+
+	@asyncio.coroutine
+	def _add_label_to_card(self, data: dict, batch: '_Batch') -> bool:
+		return (yield from self._change_card_labels(data, batch, add=True))
+
+	@asyncio.coroutine
+	def _remove_label_from_card(self, data: dict, batch: '_Batch') -> bool:
+		return (yield from self._change_card_labels(data, batch, add=False))
+
+	@asyncio.coroutine
+	def _change_card_labels(self, data: dict, batch: '_Batch', add: bool) -> bool:
+		card = self.tc.obj_cache.get(data.get('card', {}).get('id'), Card)
+		label = data.get('label')
+		if card is None or not label:
+			return False
+
+		raw_labels = card._raw_data.get('labels')
+		if raw_labels is None:
+			# We only have the label ids, the action can't fill in the rest.
+			return batch.queue_refetch(Card, card.id)
+
+		labels = [l for l in raw_labels if l['id'] != label['id']]
+		if add:
+			fields = Label._api_field_set()
+			labels.append({k: v for k, v in label.items() if k in fields})
+
+		yield from card.merge_api_data({'id': card.id,
+		                                'labels': labels,
+		                                'idLabels': [l['id'] for l in labels]})
+		return True
+
+	@asyncio.coroutine
+	def _refetch_label(self, data: dict, batch: '_Batch') -> bool:
+		return batch.queue_refetch(Label, data.get('label', {}).get('id'))
+
+	@asyncio.coroutine
+	def _update_label(self, data: dict, batch: '_Batch') -> bool:
+		return (yield from self._update(Label, data.get('label', {}), data.get('old', {}), batch))
+
+	@asyncio.coroutine
+	def _delete_label(self, data: dict, batch: '_Batch') -> bool:
+		return self._remove(Label, data.get('label', {}).get('id'), batch)
+
+	@asyncio.coroutine
+	def _refetch_checklist(self, data: dict, batch: '_Batch') -> bool:
+		queued = batch.queue_refetch(Checklist, data.get('checklist', {}).get('id'))
+		if queued and self.tc.obj_cache.get(data.get('card', {}).get('id'), Card) is not None:
+			# The card's idChecklists or badges may have changed too.
+			batch.queue_refetch(Card, data['card']['id'])
+		return queued
+
+	@asyncio.coroutine
+	def _remove_checklist(self, data: dict, batch: '_Batch') -> bool:
+		removed = self._remove(Checklist, data.get('checklist', {}).get('id'), batch)
+		if self.tc.obj_cache.get(data.get('card', {}).get('id'), Card) is not None:
+			batch.queue_refetch(Card, data['card']['id'])
+			return True
+		return removed
+
+	@asyncio.coroutine
+	def _update_check_item_state(self, data: dict, batch: '_Batch') -> bool:
+		check_item = data.get('checkItem', {})
+		if 'state' not in check_item:
+			return False
+		return (yield from self._update(CheckItem, check_item, {'state': None}, batch))
+
+
+class BoardSync(Synchronizer):
+	"""
+	Keeps a board and everything on it up to date by polling the board's
+	actions.
+
+	The first :meth:`.sync` gets the whole board with :meth:`.Board.get_full`.
+	Later calls only get the actions since the last one we saw and apply them
+	with an :class:`.ActionApplier`.  If there are more new actions than we
+	ask for at once, we may have missed some, so we get the whole board again.
+
+	Because this is a subclass of :class:`~rosetrellis.util.Synchronizer`,
+	:meth:`.sync` has a synchronous partner, ``sync_s``.
+	"""
+
+	def __init__(self, tc: trello_client.TrelloClient, board_id: str, limit: int=100,
+	             last_action_id: str=None) -> None:
+		"""
+		:param tc: Used to communicate with Trello API.
+		:param board_id: The board to keep up to date.
+		:param limit: The most actions to get per poll.  Trello allows up to 1000.
+		:param last_action_id: The newest action already reflected in the object
+			cache, to carry on from an earlier sync.
+		"""
+		self.tc = tc
+		self.board_id = board_id
+		self.limit = limit
+		self.last_action_id = last_action_id
+		self.applier = ActionApplier(tc)
+		self.board = None
+
+	@asyncio.coroutine
+	def sync(self) -> SyncResult:
+		"""
+		A coroutine.
+
+		Brings the object cache up to date with the board.
+
+		:returns: A :class:`.SyncResult`.
+		"""
+		if self.last_action_id is None:
+			return (yield from self.full_refetch())
+
+		# A poll made within the client's cache expiry would otherwise get the
+		# last poll's response.
+		self.tc.invalidate_ids([self.board_id])
+		actions = yield from self.tc.get_board_actions(self.board_id, since=self.last_action_id,
+		                                               limit=self.limit)
+		actions = [a for a in actions if a['id'] != self.last_action_id]
+		if len(actions) >= self.limit:
+			logger.info("More than %s new actions on board %s, getting the whole board",
+			            self.limit - 1, self.board_id)
+			return (yield from self.full_refetch())
+
+		# Actions come newest first.
+		result = yield from self.applier.apply(reversed(actions))
+		if actions:
+			self.last_action_id = actions[0]['id']
+		return result
+
+	@asyncio.coroutine
+	def full_refetch(self) -> SyncResult:
+		"""
+		A coroutine.
+
+		Gets the whole board again and carries on from its newest action.
+		Objects that were on the board before but aren't anymore are removed
+		from the object cache.
+		"""
+		result = SyncResult()
+		result.full_refetch = True
+
+		# Get the newest action first, so that anything that happens while
+		# we're getting the board is applied (again) by the next sync.
+		self.tc.invalidate_ids([self.board_id])
+		latest = yield from self.tc.get_board_actions(self.board_id, limit=1)
+
+		previous = self._cached_objects()
+		self.board = yield from Board.get_full(self.board_id, self.tc)
+		current = {(type(obj), obj.id)
+		           for attr in ('lists', 'cards', 'checklists', 'labels')
+		           for obj in getattr(self.board, attr, [])}
+
+		for klass, id_ in previous - current:
+			if self.tc.obj_cache.get(id_, klass) is not None:
+				self.tc.obj_cache.remove(id_)
+				result.removed += 1
+
+		result.refetched = len(current) + 1
+		if latest:
+			self.last_action_id = latest[0]['id']
+		return result
+
+	def _cached_objects(self) -> set:
+		"""
+		:returns: ``(class, id)`` pairs of the cached objects on our board.
+			Taken from the object cache rather than :attr:`board`, whose lists
+			don't change as actions create and delete things.
+		"""
+		return {(klass, obj.id)
+		        for klass in (Lists, Card, Checklist, Label)
+		        for obj in self.tc.obj_cache.values(klass)
+		        if (obj.__dict__.get('_raw_data') or {}).get('idBoard') == self.board_id}
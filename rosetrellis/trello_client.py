@@ -10,12 +10,26 @@ import aiohttp
 from typing import Any, Union, List, Sequence, Tuple
 
 import rosetrellis.util
+from rosetrellis.base.obj_cache import ObjectCache
 
 
 __all__ = ('TrelloClient',)
 
 logger = logging.getLogger(__name__)
 
+#: Trello allows this many requests per token every :data:`RATE_LIMIT_SECONDS`.
+RATE_LIMIT_REQUESTS = 100
+RATE_LIMIT_SECONDS = 10
+
+#: The most routes Trello accepts in a single ``/batch`` request.
+BATCH_MAX_URLS = 10
+
+#: Values Trello accepts for the ``filter`` parameter when getting cards.
+CARD_FILTERS = ('all', 'closed', 'none', 'open', 'visible')
+
+#: Values Trello accepts for the ``filter`` parameter when getting lists.
+LIST_FILTERS = ('all', 'closed', 'none', 'open')
+
 
 class InvalidIdError(Exception):
 	pass
@@ -45,6 +59,20 @@ def _prepare_list_param(list_param: Union[Sequence[str], str]) -> Union[str, Non
 		return ','.join(list_param)
 
 
+def _filter_params(filter: Union[str, None], allowed: Sequence[str]) -> dict:
+	"""
+	:param filter: The value for a ``filter`` query parameter or ``None`` to
+		leave it to Trello.
+	:param allowed: The values the endpoint accepts.
+	:raises ValueError: If ``filter`` isn't one of ``allowed``.
+	"""
+	if filter is None:
+		return {}
+	if filter not in allowed:
+		raise ValueError("filter must be one of {}, not '{}'".format(', '.join(allowed), filter))
+	return {'filter': filter}
+
+
 def _parse_batch(batch_resp: list) -> Tuple[Union[List[dict], List[tuple]]]:
 	good = []
 	bad = []
@@ -73,7 +101,7 @@ def _dict_to_params(data: dict, field_names: List[str]) -> dict:
 class CachedUrl:
 	def __init__(self, url: str, params: Union[None, dict]=None) -> None:
 		self.url = url
-		self.params = params if params else {}
+		self.params = dict(params) if params else {}
 
 	def __hash__(self) -> None:
 		return hash((self.url, tuple(self.params.items())))
@@ -89,19 +117,42 @@ class CachedUrl:
 
 
 class CachedUrlDict(dict):
+	"""
+	Caches API responses by :class:`.CachedUrl` for ``expire_seconds``.
+
+	Values are handed out as-is, so they should be read-only structures like
+	the ones :func:`rosetrellis.util.loads_frozen` builds.
+	"""
+
 	def __init__(self, *args, **kwargs) -> None:
 		try:
-			self.expire_seconds = kwargs['expire_seconds']
+			self.expire_seconds = kwargs.pop('expire_seconds')
 		except KeyError:
 			raise ValueError("Must provide expire_seconds kwarg to CacheDict")
 
 		super(CachedUrlDict, self).__init__(*args, **kwargs)
 
 	def vacuum(self) -> None:
-		for k, v in self.items():
+		for k, v in list(self.items()):
 			if self._is_expired(v):
 				del self[k]
 
+	def invalidate(self, ids: Sequence[str]) -> int:
+		"""
+		Drops every cached response whose url or params mention one of ``ids``.
+
+		:returns: The number of responses dropped.
+		"""
+		ids = [id_ for id_ in ids if id_]
+		if not ids:
+			return 0
+
+		stale = [k for k in self
+		         if any(id_ in k.url or any(id_ in str(v) for v in k.params.values()) for id_ in ids)]
+		for k in stale:
+			del self[k]
+		return len(stale)
+
 	def _is_expired(self, value: tuple) -> bool:
 		return time.time() - value[0] > self.expire_seconds
 
@@ -225,7 +276,7 @@ class TrelloClientCheckItemMixin:
 		url = "cards/{card_id}/checklist/{checklist_id}/checkItem/{checkitem_id}"
 		url = url.format(card_id=card_id, checklist_id=checklist_id, checkitem_id=checkitem_id)
 		if 'state' in data:
-			data['state'] = str(data['state']).lower()
+			data = dict(data, state=str(data['state']).lower())
 
 		return (yield from self.put(url, params=data))
 
@@ -256,11 +307,17 @@ class TrelloClientBoardMixin:
 			return (yield from self.get(url, params=params))
 
 	@asyncio.coroutine
-	def get_boards(self, only_open: bool=True) -> List[dict]:
+	def get_boards(self, only_open: bool=True, fields: Union[Sequence[str], str]=None) -> List[dict]:
+		"""
+		:param fields: Only get these fields of each board, like
+			``('id', 'dateLastActivity')``.  Defaults to Trello's default fields.
+		"""
 		url = 'member/me/boards'
 		params = {}
 		if only_open:
 			params['filter'] = 'open'
+		if fields:
+			params['fields'] = _prepare_list_param(fields)
 		return (yield from self.get(url, params=params))
 
 	@asyncio.coroutine
@@ -269,26 +326,78 @@ class TrelloClientBoardMixin:
 		return (yield from self.put(url, params=data))
 
 	@asyncio.coroutine
-	def get_board_lists(self, board_id) -> Sequence[str]:
+	def get_board_lists(self, board_id, filter: str=None) -> Sequence[str]:
+		"""
+		:param filter: One of :data:`LIST_FILTERS` to have Trello only send
+			those lists.  Defaults to Trello's default, ``'open'``.
+		"""
 		url = 'boards/{}/lists'.format(board_id)
-		return (yield from self.get(url))
+		return (yield from self.get(url, params=_filter_params(filter, LIST_FILTERS)))
 
 	@asyncio.coroutine
-	def get_board_cards(self, board_id) -> Sequence[str]:
+	def get_board_cards(self, board_id, filter: str=None) -> Sequence[str]:
+		"""
+		:param filter: One of :data:`CARD_FILTERS` to have Trello only send
+			those cards.  Defaults to Trello's default, ``'visible'``.
+		"""
 		url = 'boards/{}/cards'.format(board_id)
-		return (yield from self.get(url))
+		return (yield from self.get(url, params=_filter_params(filter, CARD_FILTERS)))
 
 	@asyncio.coroutine
 	def get_board_checklists(self, board_id) -> Sequence[dict]:
 		url = 'boards/{}/checklists'.format(board_id)
 		return (yield from self.get(url))
 
+	@asyncio.coroutine
+	def get_board_actions(self, board_id: str, since: str=None, limit: int=50,
+	                      filter: Union[Sequence[str], str]=None) -> List[dict]:
+		"""
+		Gets a board's actions, newest first.
+
+		:param since: Only get actions after this action id (or date).
+		:param limit: The most actions to get.  Trello allows up to 1000.
+		:param filter: Only get actions of these types.
+		"""
+		url = 'boards/{}/actions'.format(board_id)
+		params = {'limit': limit}
+		if since:
+			params['since'] = since
+		if filter:
+			params['filter'] = _prepare_list_param(filter)
+		return (yield from self.get(url, params=params))
+
+	@asyncio.coroutine
+	def get_board_graph(self, board_id: str) -> dict:
+		"""
+		Gets all of a board's fields, with its lists, cards, checklists, labels
+		and members nested under those keys.
+		"""
+		url = self.get_board_url(board_id)
+		params = {
+			'fields': 'all',
+			'lists': 'all',
+			'list_fields': 'all',
+			'cards': 'all',
+			'card_fields': 'all',
+			'checklists': 'all',
+			'checklist_fields': 'all',
+			'labels': 'all',
+			'label_fields': 'all',
+			'members': 'all',
+			'member_fields': 'all',
+		}
+		return (yield from self.get(url, params=params))
+
 
 class TrelloClientLabelMixin:
 	@asyncio.coroutine
-	def get_label(self, label_id: str) -> dict:
+	def get_label(self, label_id: str, fields: Union[Sequence[str], str]="all") -> dict:
 		url = 'labels/{}'.format(label_id)
-		return (yield from self.get(url))
+		params = {}
+		fields = _prepare_list_param(fields)
+		if fields:
+			params['fields'] = fields
+		return (yield from self.get(url, params=params))
 
 	@asyncio.coroutine
 	def create_label(self, data: dict) ->  dict:
@@ -369,6 +478,15 @@ class TrelloClientListsMixin:
 		url = 'lists/{}'.format(list_id)
 		return (yield from self.put(url, params=changes))
 
+	@asyncio.coroutine
+	def get_list_cards(self, list_id: str, filter: str=None) -> List[dict]:
+		"""
+		:param filter: One of :data:`CARD_FILTERS` to have Trello only send
+			those cards.  Defaults to Trello's default, ``'open'``.
+		"""
+		url = 'lists/{}/cards'.format(list_id)
+		return (yield from self.get(url, params=_filter_params(filter, CARD_FILTERS)))
+
 	@asyncio.coroutine
 	def archive_cards_on_list(self, list_id):
 		url = "lists/{}/archiveAllCards".format(list_id)
@@ -391,6 +509,54 @@ class TrelloClientMemberMixin:
 		return (yield from self.put(url, params=params))
 
 
+class TrelloClientWebhookMixin:
+	@asyncio.coroutine
+	def create_webhook(self, callback_url: str, id_model: str, description: str=None) -> dict:
+		"""
+		Asks Trello to POST the actions on the model with id ``id_model`` to
+		``callback_url``.  Trello makes a HEAD request to ``callback_url``
+		first, which has to succeed.
+		"""
+		params = {'callbackURL': callback_url, 'idModel': id_model}
+		if description:
+			params['description'] = description
+		return (yield from self.post('webhooks', params=params))
+
+	@asyncio.coroutine
+	def get_webhooks(self) -> List[dict]:
+		url = 'tokens/{}/webhooks'.format(self._api_token)
+		return (yield from self.get(url))
+
+	@asyncio.coroutine
+	def delete_webhook(self, webhook_id: str) -> dict:
+		url = 'webhooks/{}'.format(webhook_id)
+		return (yield from self.delete(url))
+
+
+class TrelloClientSearchMixin:
+	@asyncio.coroutine
+	def search(self, query: str, model_types: Union[Sequence[str], str]='all', cards_limit: int=10,
+	           card_fields: Union[Sequence[str], str]='all', board_ids: Sequence[str]=None,
+	           partial: bool=False) -> dict:
+		"""
+		Uses Trello's search.
+
+		:param model_types: What to search for, like ``'cards'``.
+		:param cards_limit: The most cards to get.  Trello allows up to 1000.
+		:param board_ids: Only search these boards.
+		:param partial: Whether the last word matches as a prefix.
+		:returns: Matches keyed by type, like ``{'cards': [...]}``.
+		"""
+		params = {'query': query,
+		          'modelTypes': _prepare_list_param(model_types),
+		          'cards_limit': cards_limit,
+		          'card_fields': _prepare_list_param(card_fields),
+		          'partial': 'true' if partial else 'false'}
+		if board_ids:
+			params['idBoards'] = _prepare_list_param(board_ids)
+		return (yield from self.get('search', params=params))
+
+
 class TrelloClient(TrelloClientCardMixin,
                    TrelloClientChecklistMixin,
                    TrelloClientCheckItemMixin,
@@ -398,13 +564,29 @@ class TrelloClient(TrelloClientCardMixin,
                    TrelloClientLabelMixin,
                    TrelloClientOrgMixin,
                    TrelloClientListsMixin,
-                   TrelloClientMemberMixin):
+                   TrelloClientMemberMixin,
+                   TrelloClientWebhookMixin,
+                   TrelloClientSearchMixin):
 	def __init__(self,
 	             api_key: str=None,
 	             api_token: str=None,
 	             verify_credentials: bool=False,
 	             cache_for: int=10,
-	             loop: BaseEventLoop=None) -> None:
+	             loop: BaseEventLoop=None,
+	             obj_cache: ObjectCache=None,
+	             field_profile: str='full') -> None:
+		"""
+		:param api_key: Your Trello API key.  Defaults to the ``TRELLO_API_KEY``
+			environment variable.
+		:param api_token: Your Trello API token.  Defaults to the ``TRELLO_API_TOKEN``
+			environment variable.
+		:param cache_for: Number of seconds to cache GET responses for.
+		:param obj_cache: The identity map holding objects built with this client.
+			Defaults to a new, weakly-referencing :class:`.ObjectCache`.
+		:param field_profile: Name of the field profile (like ``'minimal'``,
+			``'listing'`` or ``'full'``) models request when not told otherwise.
+			See :attr:`.TrelloObject.FIELD_PROFILES`.
+		"""
 		self._api_key = api_key if api_key else os.environ.get('TRELLO_API_KEY')
 		self._api_token = api_token if api_token else os.environ.get('TRELLO_API_TOKEN')
 
@@ -428,8 +610,63 @@ class TrelloClient(TrelloClientCardMixin,
 
 		self._conx_sema = Semaphore(5)
 		self._cache = CachedUrlDict(expire_seconds=cache_for)
+		self.obj_cache = obj_cache if obj_cache is not None else ObjectCache()
+		self.field_profile = field_profile
+		self.field_profiles = {}
+		#: Set by :class:`~rosetrellis.write_behind.WriteBehindQueue` to queue
+		#: saves instead of making them straight away.
+		self.write_behind = None
+
+		self._request_history = collections.deque([], RATE_LIMIT_REQUESTS)
+
+	def set_field_profile(self, klass: type, profile: Union[str, Sequence[str], None]) -> None:
+		"""
+		:param klass: The :class:`.TrelloObject` subclass the profile applies to.
+		:param profile: The name of one of ``klass.FIELD_PROFILES``, a sequence
+			of field names, or ``None`` to go back to :attr:`field_profile`.
+		"""
+		if profile is None:
+			self.field_profiles.pop(klass, None)
+		else:
+			# Raises ValueError for profiles klass doesn't have.
+			klass._fields_for(self, profile)
+			self.field_profiles[klass] = profile
+
+	def request_budget(self) -> int:
+		"""
+		:returns: How many requests we can make right now without being
+			throttled.
+		"""
+		window_start = time.time() - RATE_LIMIT_SECONDS
+		recent = sum(1 for t in self._request_history if t > window_start)
+		return RATE_LIMIT_REQUESTS - recent
+
+	def _reserve_request_slot(self) -> float:
+		"""
+		Books the earliest time we can make a request without going over the
+		rate limit.  There's no ``yield`` between looking at the history and
+		adding to it, so requests waiting at the same time each get their own
+		slot instead of all seeing the same free one.
+
+		:returns: Seconds to wait before making the request.
+		"""
+		now = time.time()
+		start = now
+		if len(self._request_history) == self._request_history.maxlen:
+			# The oldest of the last RATE_LIMIT_REQUESTS requests has to be
+			# RATE_LIMIT_SECONDS old before we make another.
+			start = max(now, self._request_history[0] + RATE_LIMIT_SECONDS)
+		self._request_history.append(start)
+		return start - now
+
+	def invalidate_ids(self, ids: Sequence[str]) -> int:
+		"""
+		Forgets cached GET responses that mention any of ``ids``, so the next
+		request for them goes to Trello.
 
-		self._request_history = collections.deque([], 100)
+		:returns: The number of responses forgotten.
+		"""
+		return self._cache.invalidate(ids)
 
 	@asyncio.coroutine
 	def get(self, url, params=None):
@@ -482,26 +719,18 @@ class TrelloClient(TrelloClientCardMixin,
 				logger.debug("cache hit")
 				return cached
 
-		params['key'] = self._api_key
-		params['token'] = self._api_token
-
-		if len(self._request_history) == self._request_history.maxlen:
-			now = time.time()
-
-			past = now - 10 * 1000
-
-			oldest_request_time = self._request_history[0]
-			oldest_request_time_delta = now - oldest_request_time
-
-			if oldest_request_time_delta <= past:
-				throttle_time = past - oldest_request_time_delta
-				logger.debug("Throttling for {} seconds".format(throttle_time))
-				yield from asyncio.sleep(throttle_time)
+		# Don't change the caller's params, or the key we cached under.
+		request_params = dict(params)
+		request_params['key'] = self._api_key
+		request_params['token'] = self._api_token
 
 		logger.debug("current connections: {}".format(self._conx_sema._value))
 		with (yield from self._conx_sema):
-			self._request_history.append(time.time())
-			r = yield from aiohttp.request(method, rosetrellis.util.join_url(url), params=params)
+			throttle_time = self._reserve_request_slot()
+			if throttle_time > 0:
+				logger.debug("Throttling for {} seconds".format(throttle_time))
+				yield from asyncio.sleep(throttle_time)
+			r = yield from aiohttp.request(method, rosetrellis.util.join_url(url), params=request_params)
 
 		if 200 <= r.status > 299:
 			logger.error("Received bad status: %s.  Response content: %s", r.status, (yield from r.text()))
@@ -510,11 +739,13 @@ class TrelloClient(TrelloClientCardMixin,
 
 			raise CommFail("Error communicating with Trello", url, params, r.status, (yield from r.text()))
 
-		json = yield from r.json()
+		# Responses are decoded into read-only structures so that the same
+		# object can be handed out from the cache without being copied.
+		data = rosetrellis.util.loads_frozen((yield from r.text()))
 		if method.lower() == 'get':
-			self._cache[cached_url] = json
+			self._cache[cached_url] = data
 
-		return json
+		return data
 
 	@asyncio.coroutine
 	def batch_get(self, routes: List[Union[Sequence[str], str]]):
@@ -522,6 +753,16 @@ class TrelloClient(TrelloClientCardMixin,
 		params = {'urls': _prepare_list_param(routes)}
 		return (yield from self.get(url, params=params))
 
+	@asyncio.coroutine
+	def batch(self, routes: List[str]) -> Tuple[Union[List[dict], List[tuple]]]:
+		"""
+		Gets up to :data:`BATCH_MAX_URLS` routes in one request.
+
+		:returns: A tuple of the successful responses and a list of
+			``(status, response)`` tuples for the failures.
+		"""
+		return _parse_batch((yield from self.batch_get(routes)))
+
 	@asyncio.coroutine
 	def create(self, url: str, data: dict, post_fields: List[str]) -> dict:
 		params = _dict_to_params(data, post_fields)
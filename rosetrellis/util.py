@@ -1,7 +1,10 @@
 import abc
 from urllib.parse import urljoin
 import asyncio
+import datetime
+import json
 
+from dateutil import parser
 from typing import Any, Callable, Sequence, List
 
 
@@ -24,6 +27,45 @@ def join_url(part: str) -> str:
 	return newpath
 
 
+def parse_date(date_str: str) -> datetime.datetime:
+	"""
+	Parses a date string from the Trello API.
+
+	Trello always sends dates formatted like ``2015-04-01T20:50:42.123Z``, so we
+	parse that format directly and only fall back to :func:`dateutil.parser.parse`
+	for anything else.
+
+	:param date_str: The date string.
+	:return: A timezone-aware datetime.
+	:raises ValueError: If the string can't be parsed as a date.
+	"""
+	if (len(date_str) == 24 and date_str[4] == '-' and date_str[7] == '-' and
+			date_str[10] == 'T' and date_str[13] == ':' and date_str[16] == ':' and
+			date_str[19] == '.' and date_str[23] == 'Z'):
+		try:
+			return datetime.datetime(int(date_str[0:4]), int(date_str[5:7]), int(date_str[8:10]),
+			                         int(date_str[11:13]), int(date_str[14:16]), int(date_str[17:19]),
+			                         int(date_str[20:23]) * 1000,
+			                         tzinfo=datetime.timezone.utc)
+		except ValueError:
+			pass
+
+	return parser.parse(date_str)
+
+
+def format_date(dt: datetime.datetime) -> str:
+	"""
+	Formats a datetime the way the Trello API does.  UTC datetimes are formatted
+	exactly like Trello sends them so they compare equal to the original strings.
+
+	:param dt: The datetime to format.
+	:return: The date string.
+	"""
+	if dt.utcoffset() == datetime.timedelta(0):
+		return '{:%Y-%m-%dT%H:%M:%S}.{:03d}Z'.format(dt, dt.microsecond // 1000)
+	return dt.isoformat()
+
+
 def make_sequence_attrgetter(attr_name: str) -> Callable[Sequence[object]]:
 	"""
 	Get a callable which takes a sequence of objects and returns a list of
@@ -46,6 +88,70 @@ def make_sequence_attrgetter(attr_name: str) -> Callable[Sequence[object]]:
 	return sequence_attrgetter
 
 
+def _read_only(self, *args, **kwargs):
+	raise TypeError("'{}' object is read-only".format(type(self).__name__))
+
+
+class FrozenDict(dict):
+	"""
+	A ``dict`` that can't be changed after it is built.
+
+	Used for API responses we cache, so that code consuming a response can't
+	change what the next consumer gets.  Because it is still a ``dict``, it can
+	be read and compared just like the original data.
+	"""
+	__setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _read_only
+
+	def __ior__(self, other):
+		_read_only(self)
+
+	def __reduce__(self):
+		return type(self), (dict(self),)
+
+	def __repr__(self):
+		return '{}({})'.format(type(self).__name__, dict.__repr__(self))
+
+
+class FrozenList(list):
+	"""
+	A ``list`` that can't be changed after it is built.  See :class:`.FrozenDict`.
+	"""
+	__setitem__ = __delitem__ = append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+	def __iadd__(self, other):
+		_read_only(self)
+
+	def __imul__(self, other):
+		_read_only(self)
+
+	def __reduce__(self):
+		return type(self), (list(self),)
+
+	def __repr__(self):
+		return '{}({})'.format(type(self).__name__, list.__repr__(self))
+
+
+def _freeze_value(value: Any) -> Any:
+	if type(value) is list:
+		return FrozenList(_freeze_value(item) for item in value)
+	return value
+
+
+def _frozen_object_pairs(pairs: List[tuple]) -> FrozenDict:
+	return FrozenDict((k, _freeze_value(v)) for k, v in pairs)
+
+
+def loads_frozen(text: str) -> Any:
+	"""
+	Decodes JSON, building :class:`.FrozenDict` and :class:`.FrozenList`
+	instead of ``dict`` and ``list``.
+
+	:param text: The JSON to decode.
+	:return: The decoded data.
+	"""
+	return _freeze_value(json.loads(text, object_pairs_hook=_frozen_object_pairs))
+
+
 class _Synchronizer(abc.ABCMeta):
 	"""
 	This metaclass functions as a replacement for abc.ABCMeta that adds a synchronous
@@ -0,0 +1,220 @@
+"""
+Receives the actions Trello pushes to webhooks and applies them to the objects
+in a client's object cache, so there's nothing to poll for.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import time
+
+from aiohttp import web
+from typing import Iterable, Iterator, List
+
+import rosetrellis.trello_client as trello_client
+from rosetrellis.sync import ActionApplier, SyncResult
+from rosetrellis.util import Synchronizer
+
+
+logger = logging.getLogger(__name__)
+
+#: The header Trello signs webhook requests with.
+SIGNATURE_HEADER = 'X-Trello-Webhook'
+
+
+def sign_payload(body: bytes, callback_url: str, secret: str) -> str:
+	"""
+	Signs a webhook request body the way Trello does.
+
+	:param body: The raw request body.
+	:param callback_url: The ``callbackURL`` the webhook was created with.
+	:param secret: Your Trello API secret.
+	"""
+	digest = hmac.new(secret.encode('utf-8'), body + callback_url.encode('utf-8'), hashlib.sha1).digest()
+	return base64.b64encode(digest).decode('ascii')
+
+
+def action_ids(action: dict) -> List[str]:
+	"""
+	:returns: The ids of every object an action's data mentions.
+	"""
+	ids = []
+	for value in action.get('data', {}).values():
+		if isinstance(value, dict) and value.get('id') and value['id'] not in ids:
+			ids.append(value['id'])
+	return ids
+
+
+class WebhookReceiver(Synchronizer):
+	"""
+	Applies the actions in webhook payloads with an :class:`.ActionApplier`.
+
+	Before an action is applied, cached API responses that mention any of the
+	objects it touches are dropped, so objects that have to be fetched again
+	don't come out of the client's response cache.  Payloads are applied one
+	at a time, in the order they arrive.
+
+	Serve it with :meth:`.start`, or add :meth:`.handle` to your own
+	:class:`aiohttp.web.Application`, then register the url with
+	:meth:`.TrelloClient.create_webhook`.
+
+	Because this is a subclass of :class:`~rosetrellis.util.Synchronizer`,
+	:meth:`.receive` has a synchronous partner, ``receive_s``.
+	"""
+
+	def __init__(self,
+	             tc: trello_client.TrelloClient,
+	             path: str='/trello/webhook',
+	             secret: str=None,
+	             callback_url: str=None,
+	             record_path: str=None) -> None:
+		"""
+		:param tc: The client whose object cache we keep up to date.
+		:param path: The path we answer on.
+		:param secret: Your Trello API secret.  If given along with
+			``callback_url``, requests without a valid signature are rejected.
+		:param callback_url: The ``callbackURL`` the webhook was created with.
+		:param record_path: If given, every payload received is appended to
+			this file as a line of JSON, for use with :func:`.replay`.
+		"""
+		self.tc = tc
+		self.path = path
+		self.secret = secret
+		self.callback_url = callback_url
+		self.record_path = record_path
+		self.applier = ActionApplier(tc)
+		self.received = 0
+		self._lock = asyncio.Lock()
+
+	@asyncio.coroutine
+	def receive(self, payload: dict) -> SyncResult:
+		"""
+		A coroutine.
+
+		Applies a decoded webhook payload.
+
+		:returns: A :class:`.SyncResult`.
+		"""
+		action = payload.get('action', {})
+		with (yield from self._lock):
+			self.received += 1
+			self.tc.invalidate_ids(action_ids(action))
+			return (yield from self.applier.apply([action]))
+
+	@asyncio.coroutine
+	def handle(self, request: web.Request) -> web.Response:
+		"""
+		A coroutine.
+
+		The :mod:`aiohttp.web` handler.  Answers Trello's HEAD request when a
+		webhook is created, and applies the payloads POSTed to it.
+		"""
+		if request.method == 'HEAD':
+			return web.Response(status=200)
+
+		body = yield from request.read()
+		if self.secret and self.callback_url:
+			expected = sign_payload(body, self.callback_url, self.secret)
+			if not hmac.compare_digest(expected, request.headers.get(SIGNATURE_HEADER, '')):
+				logger.warning("Rejecting webhook request with a bad signature")
+				return web.Response(status=401)
+
+		try:
+			payload = json.loads(body.decode('utf-8'))
+		except ValueError:
+			return web.Response(status=400)
+
+		if self.record_path:
+			with open(self.record_path, 'a', encoding='utf-8') as f:
+				f.write(json.dumps(payload) + '\n')
+
+		result = yield from self.receive(payload)
+		logger.debug("Applied %s action %s: %r", payload.get('action', {}).get('type'),
+		             payload.get('action', {}).get('id'), result)
+		return web.Response(status=200)
+
+	def make_app(self, loop: asyncio.AbstractEventLoop=None) -> web.Application:
+		app = web.Application(loop=loop)
+		app.router.add_route('HEAD', self.path, self.handle)
+		app.router.add_route('POST', self.path, self.handle)
+		return app
+
+	@asyncio.coroutine
+	def start(self, host: str='0.0.0.0', port: int=8080, loop: asyncio.AbstractEventLoop=None):
+		"""
+		A coroutine.
+
+		Starts serving :meth:`.make_app`.
+
+		:returns: The server, as returned by ``loop.create_server``.
+		"""
+		loop = loop if loop is not None else asyncio.get_event_loop()
+		handler = self.make_app(loop).make_handler()
+		server = yield from loop.create_server(handler, host, port)
+		logger.info("Receiving Trello webhooks on %s:%s%s", host, port, self.path)
+		return server
+
+
+class ReplayStats:
+	"""
+	How a :func:`.replay` went.
+	"""
+
+	def __init__(self) -> None:
+		self.payloads = 0  #: Payloads replayed
+		self.failed = 0  #: Payloads the receiver raised an exception for
+		self.seconds = 0.0  #: How long the replay took
+
+	@property
+	def per_second(self) -> float:
+		return self.payloads / self.seconds if self.seconds else 0.0
+
+	def __repr__(self):
+		return "<ReplayStats: {} payloads ({} failed) in {:.3f}s, {:.1f}/s>".format(
+			self.payloads, self.failed, self.seconds, self.per_second
+		)
+
+
+def load_payloads(path: str) -> Iterator[dict]:
+	"""
+	Reads the payloads a :class:`.WebhookReceiver` recorded with ``record_path``.
+	"""
+	with open(path, encoding='utf-8') as f:
+		for line in f:
+			if line.strip():
+				yield json.loads(line)
+
+
+@asyncio.coroutine
+def replay(receiver: WebhookReceiver, payloads: Iterable[dict], concurrency: int=1) -> ReplayStats:
+	"""
+	A coroutine.
+
+	Feeds recorded payloads straight to :meth:`.WebhookReceiver.receive`, to
+	measure how quickly the receiver keeps up.  No HTTP is involved.
+
+	:param payloads: Decoded payloads, like from :func:`.load_payloads`.
+	:param concurrency: How many payloads are in flight at once.  The receiver
+		still applies them one at a time.
+	"""
+	stats = ReplayStats()
+	semaphore = asyncio.Semaphore(concurrency)
+
+	@asyncio.coroutine
+	def replay_one(payload):
+		with (yield from semaphore):
+			try:
+				yield from receiver.receive(payload)
+			except Exception as e:
+				logger.warning("Replaying action %s failed: %r", payload.get('action', {}).get('id'), e)
+				stats.failed += 1
+			stats.payloads += 1
+
+	started_at = time.time()
+	tasks = [replay_one(payload) for payload in payloads]
+	if tasks:
+		yield from asyncio.wait(tasks)
+	stats.seconds = time.time() - started_at
+	return stats
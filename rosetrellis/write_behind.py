@@ -0,0 +1,181 @@
+"""
+Write-behind saving: :meth:`.TrelloObject.save` queues the object, and
+repeated edits to it are sent together a moment later.
+"""
+import asyncio
+import atexit
+import collections
+import logging
+
+from typing import Callable, List
+
+import rosetrellis.trello_client as trello_client
+from rosetrellis.models import TrelloObject
+from rosetrellis.session import FlushResult, Session
+from rosetrellis.util import Synchronizer
+
+
+logger = logging.getLogger(__name__)
+
+
+def _log_error(obj: TrelloObject, error: Exception) -> None:
+	logger.error("Write-behind save of %r failed: %r", obj, error)
+
+
+class WriteBehindQueue(Synchronizer):
+	"""
+	Makes saves on a client asynchronous and debounced.
+
+	Creating a queue switches its client to write-behind mode: from then on
+	:meth:`.TrelloObject.save` adds the object to the queue and returns
+	without making a request.  An object is saved once it hasn't been saved
+	again for ``delay`` seconds, or ``max_delay`` seconds after it was first
+	queued, whichever comes first.  Because only the attributes assigned to
+	since the last save are sent, all the edits made in that time go in a
+	single request::
+
+		queue = WriteBehindQueue(tc, delay=0.5)
+		card.name = 'Renamed'
+		yield from card.save()
+		card.due = tomorrow
+		yield from card.save()  # One update_card call, half a second later
+		...
+		yield from queue.close()
+
+	A background task saves due objects with a :class:`.Session`, so new
+	objects are created after the new objects they refer to.  The client's
+	throttle keeps the requests within Trello's rate limit.  An object saved
+	again while its request is out stays queued, and its new edits aren't
+	overwritten by the response.
+
+	Nothing is saved if the program exits with objects still queued.  Call
+	:meth:`.flush` or :meth:`.close` before shutting down, or use
+	:meth:`.register_atexit`.  Failed saves are passed to ``on_error`` and
+	aren't retried, but the objects keep their unsaved changes.
+
+	Because this is a subclass of :class:`~rosetrellis.util.Synchronizer`,
+	:meth:`.flush` and :meth:`.close` have synchronous partners, ``flush_s``
+	and ``close_s``.
+	"""
+
+	def __init__(self, tc: trello_client.TrelloClient, delay: float=0.5, max_delay: float=5.0,
+	             concurrency: int=5, on_error: Callable[[TrelloObject, Exception], None]=_log_error,
+	             loop: asyncio.AbstractEventLoop=None) -> None:
+		"""
+		:param tc: The client to switch to write-behind mode.
+		:param delay: Seconds to wait for further saves of an object before
+			saving it.
+		:param max_delay: Most seconds an object waits in the queue.
+		:param concurrency: Most requests made at the same time.
+		:param on_error: Called with each object whose save failed and the
+			exception.  Defaults to logging it.
+		:param loop: The event loop to flush on.
+		"""
+		self.tc = tc
+		self.delay = delay
+		self.max_delay = max_delay
+		self.concurrency = concurrency
+		self.on_error = on_error
+		self.loop = loop or asyncio.get_event_loop()
+		# object -> (when first queued, when due)
+		self._queue = collections.OrderedDict()
+		# One batch of saves at a time, so an object is never saved twice at once.
+		self._lock = asyncio.Lock(loop=self.loop)
+		self._task = None
+		tc.write_behind = self
+
+	@property
+	def pending(self) -> List[TrelloObject]:
+		""" The objects waiting to be saved. """
+		return list(self._queue)
+
+	def enqueue(self, obj: TrelloObject) -> None:
+		"""
+		Queues ``obj`` to be saved, or pushes back its save if it's already
+		queued.  This is what :meth:`.TrelloObject.save` calls in write-behind
+		mode.
+		"""
+		now = self.loop.time()
+		first_queued = self._queue.pop(obj, (now, None))[0]
+		self._queue[obj] = (first_queued, min(now + self.delay, first_queued + self.max_delay))
+		self._ensure_running()
+
+	@asyncio.coroutine
+	def flush(self) -> FlushResult:
+		"""
+		A coroutine.
+
+		Saves every queued object now, without waiting for it to be due.
+		"""
+		return (yield from self._save(list(self._queue)))
+
+	@asyncio.coroutine
+	def close(self) -> FlushResult:
+		"""
+		A coroutine.
+
+		Flushes the queue, stops the background task and switches the client
+		back to saving straight away.
+		"""
+		if self.tc.write_behind is self:
+			self.tc.write_behind = None
+		result = yield from self.flush()
+		if self._task is not None:
+			self._task.cancel()
+			self._task = None
+		return result
+
+	def register_atexit(self) -> None:
+		"""
+		Flushes the queue when the interpreter exits, if the event loop isn't
+		running or closed by then.
+		"""
+		def close_at_exit():
+			if self._queue and not self.loop.is_closed() and not self.loop.is_running():
+				self.loop.run_until_complete(self.close())
+
+		atexit.register(close_at_exit)
+
+	def _ensure_running(self) -> None:
+		if self._queue and (self._task is None or self._task.done()):
+			self._task = asyncio.ensure_future(self._run(), loop=self.loop)
+
+	@asyncio.coroutine
+	def _run(self) -> None:
+		"""
+		Saves objects as they become due, until the queue is empty.
+		"""
+		while self._queue:
+			now = self.loop.time()
+			due = [obj for obj, (__, due_at) in self._queue.items() if due_at <= now]
+			if due:
+				yield from self._save(due)
+			else:
+				# Anything queued from now on is due after the earliest
+				# object already queued, so sleeping until then misses nothing.
+				wake_at = min(due_at for __, due_at in self._queue.values())
+				yield from asyncio.sleep(wake_at - now, loop=self.loop)
+
+	@asyncio.coroutine
+	def _save(self, objs: List[TrelloObject]) -> FlushResult:
+		wanted = {obj: self._queue.get(obj) for obj in objs}
+		with (yield from self._lock):
+			# Objects stay queued while they're saved.  Skip any the batch
+			# before us saved, or that were queued again while we waited.
+			entries = {obj: entry for obj, entry in wanted.items()
+			           if entry is not None and self._queue.get(obj) is entry}
+			session = Session(self.tc, concurrency=self.concurrency)
+			session.add(*[obj for obj in objs if obj in entries])
+			try:
+				result = yield from session.flush()
+			finally:
+				for obj, entry in entries.items():
+					# Saved again while the request was out, so it has edits
+					# we haven't sent.
+					if self._queue.get(obj) is entry:
+						del self._queue[obj]
+
+		for obj, error in result.errors.items():
+			self.on_error(obj, error)
+		self._ensure_running()
+		return result
@@ -1,15 +1,20 @@
 import asyncio
+import gc
+import time
 from collections import namedtuple
 import unittest
 from unittest.mock import Mock, patch, call
 
-from rosetrellis.models import TrelloObject, IsCoroutineError, ids_getter
+from rosetrellis import models
+from rosetrellis.models import TrelloObject, IsCoroutineError, ids_getter, get_class_for_data
 from rosetrellis.trello_client import TrelloClient
+from rosetrellis.base.obj_cache import ObjectCache
 from tests import async_test, get_mock_coro
 
 class TestRoseTrellisBase(unittest.TestCase):
 	def setUp(self):
 		self.tc = Mock(TrelloClient)
+		self.tc.obj_cache = ObjectCache()
 
 
 class TestTrelloObjectBase(TestRoseTrellisBase):
@@ -29,7 +34,6 @@ class TestTrelloObjectBase(TestRoseTrellisBase):
 
 		self.CTO = ConcretedTrelloObject
 
-@patch('rosetrellis.base.obj_cache.get', lambda x: None)
 class TestTrelloObjectMisc(TestTrelloObjectBase):
 	def test_tc_available(self):
 		to = self.CTO(self.tc)
@@ -62,19 +66,100 @@ class TestTrelloObjectMisc(TestTrelloObjectBase):
 		self.assertEqual(len(missing), 1)
 		self.assertEqual(missing[0], to.API_FIELDS[0])
 
-@patch('rosetrellis.base.obj_cache.get', lambda x: None)
+	def test_is_valid_data_partial(self):
+		valid, extra, missing = self.CTO.is_valid_data({'id': 'hi'}, partial=True)
+		self.assertTrue(valid)
+		self.assertEqual(missing, ['data'])
+
+		valid, extra, missing = self.CTO.is_valid_data({'id': 'hi', 'nope': None}, partial=True)
+		self.assertFalse(valid)
+
+
+class TestTrelloObjectFieldProfiles(TestTrelloObjectBase):
+	def setUp(self):
+		super(TestTrelloObjectFieldProfiles, self).setUp()
+		self.CTO.FIELD_PROFILES = {'minimal': ('data',), 'full': 'all'}
+
+	def test_fields_for(self):
+		self.assertEqual(self.CTO._fields_for(self.tc), 'all')
+		self.assertEqual(self.CTO._fields_for(self.tc, 'minimal'), 'data,id')
+		self.assertEqual(self.CTO._fields_for(self.tc, ['data']), 'data,id')
+		with self.assertRaises(ValueError):
+			self.CTO._fields_for(self.tc, 'nope')
+
+	def test_fields_for_client_profiles(self):
+		self.tc.field_profile = 'listing'
+		self.tc.field_profiles = {}
+		# we don't have that profile, so we get everything
+		self.assertEqual(self.CTO._fields_for(self.tc), 'all')
+
+		self.tc.field_profiles[self.CTO] = 'minimal'
+		self.assertEqual(self.CTO._fields_for(self.tc), 'data,id')
+
+	@async_test
+	def test_get_with_profile_accepts_partial_data(self):
+		self.CTO._get_data = get_mock_coro({'id': 'an id'})
+
+		obj = yield from self.CTO.get('an id', self.tc, fields='minimal')
+
+		self.CTO._get_data.assert_called_with('an id', self.tc, fields='data,id')
+		self.assertFalse('data' in obj.__dict__)
+
+	@async_test
+	def test_get_many_data_unbatched_with_profile(self):
+		self.tc.field_profiles = {self.CTO: 'minimal'}
+
+		@asyncio.coroutine
+		def get_data(id_, tc, **kwargs):
+			if id_ == 'gone':
+				raise ValueError('not found')
+			return {'id': id_}
+
+		self.CTO._get_data = Mock(wraps=get_data)
+
+		datas = yield from self.CTO._get_many_data(['one', 'gone', 'two'], self.tc)
+
+		self.assertEqual(datas, [{'id': 'one'}, {'id': 'two'}])
+		self.CTO._get_data.assert_called_with('two', self.tc, fields='data,id')
+
+	def test_unfetched_field_fetched_on_access(self):
+		loop = asyncio.get_event_loop()
+		obj = self.CTO(self.tc, id='an id')
+		loop.run_until_complete(obj._state_from_api({'id': 'an id'}))
+		self.CTO._get_data = get_mock_coro({'id': 'an id', 'data': 'some data'})
+
+		self.assertEqual(obj.data, 'some data')
+		self.CTO._get_data.assert_called_once_with('an id', self.tc, fields='data,id')
+		# and we remember it
+		self.assertEqual(obj._raw_data, {'id': 'an id', 'data': 'some data'})
+
+		# attributes that aren't fields still raise
+		with self.assertRaises(AttributeError):
+			obj.nope
+
+	def test_partial_data_keeps_other_fields(self):
+		loop = asyncio.get_event_loop()
+		obj = self.CTO(self.tc, id='an id')
+		loop.run_until_complete(obj._state_from_api({'id': 'an id', 'data': 'some data'}))
+		loop.run_until_complete(obj._state_from_api({'id': 'an id'}))
+
+		self.assertEqual(obj.data, 'some data')
+		self.assertEqual(obj._raw_data, {'id': 'an id', 'data': 'some data'})
+
+
 class TestTrelloObjectGet(TestTrelloObjectBase):
-	@patch('rosetrellis.models.obj_cache')
 	@async_test
-	def test_get_no_cache_creates_obj(self, obj_cache):
+	def test_get_no_cache_creates_obj(self):
+		obj_cache = self.tc.obj_cache = Mock(ObjectCache)
 		obj_cache.get.return_value = None
+		obj_cache.get_in_flight.return_value = None
 		an_id = 'not a real id'
 		self.CTO._get_data = get_mock_coro({'data': None, 'id': 'not a real id'})
 		self.CTO._state_from_api = get_mock_coro(None)
 		obj = yield from self.CTO.get(an_id, self.tc)
 
 		# tries to get obj from cache
-		obj_cache.get.assert_called_with(an_id)
+		obj_cache.get.assert_called_with(an_id, self.CTO)
 
 		# builds obj
 		self.assertIsInstance(obj, self.CTO)
@@ -85,9 +170,9 @@ class TestTrelloObjectGet(TestTrelloObjectBase):
 		# cached obj
 		obj_cache.set.assert_called_with(obj)
 
-	@patch('rosetrellis.models.obj_cache')
 	@async_test
-	def test_get_cached_from_id(self, obj_cache):
+	def test_get_cached_from_id(self):
+		obj_cache = self.tc.obj_cache = Mock(ObjectCache)
 		some_object = 'some object'
 		obj_cache.get.return_value = some_object
 		self.CTO._get_data = get_mock_coro({'API_FIELDS': None})
@@ -101,12 +186,13 @@ class TestTrelloObjectGet(TestTrelloObjectBase):
 		self.assertEqual(obj, some_object)
 
 		# yeah, we got it from cache
-		obj_cache.get.assert_called_with(an_id)
+		obj_cache.get.assert_called_with(an_id, self.CTO)
 
-	@patch('rosetrellis.models.obj_cache')
 	@async_test
-	def test_get_no_cache_data_creates_obj(self, obj_cache):
+	def test_get_no_cache_data_creates_obj(self):
+		obj_cache = self.tc.obj_cache = Mock(ObjectCache)
 		obj_cache.get.return_value = None
+		obj_cache.get_in_flight.return_value = None
 		self.CTO._get_data = get_mock_coro({'API_FIELDS': None})
 		self.CTO._state_from_api = get_mock_coro(None)
 		an_id = 'not a real id'
@@ -125,10 +211,11 @@ class TestTrelloObjectGet(TestTrelloObjectBase):
 		# cached new obj
 		obj_cache.set.assert_called_with(obj)
 
-	@patch('rosetrellis.models.obj_cache')
 	@async_test
-	def test_get_cached_and_new_data(self, obj_cache):
+	def test_get_cached_and_new_data(self):
+		obj_cache = self.tc.obj_cache = Mock(ObjectCache)
 		obj_cache.get.return_value = None
+		obj_cache.get_in_flight.return_value = None
 		self.CTO._state_from_api = get_mock_coro(None)
 		an_id = 'not a real id'
 		self.CTO._get_data = get_mock_coro({'data': None, 'id': an_id})
@@ -169,12 +256,204 @@ class TestTrelloObjectGet(TestTrelloObjectBase):
 		self.assertEqual(self.CTO.get.call_count, len(ids))
 		self.assertTrue(all([result == 'a result' for result in many]))
 
-@patch('rosetrellis.base.obj_cache.get', lambda x: None)
+
+class TestTrelloObjectGetConcurrency(TestTrelloObjectBase):
+	@async_test
+	def test_concurrent_gets_share_request(self):
+		an_id = 'not a real id'
+
+		@asyncio.coroutine
+		def get_data(id_, tc):
+			# give the other getters a chance to run while we're "fetching"
+			yield from asyncio.sleep(0)
+			return {'data': None, 'id': id_}
+
+		self.CTO._get_data = Mock(wraps=get_data)
+		self.CTO._state_from_api = get_mock_coro(None)
+
+		objs = yield from asyncio.gather(*[self.CTO.get(an_id, self.tc) for __ in range(3)])
+
+		# only fetched once...
+		self.assertEqual(self.CTO._get_data.call_count, 1)
+
+		# ...and everybody got the same instance
+		self.assertTrue(all(obj is objs[0] for obj in objs))
+
+	@async_test
+	def test_concurrent_get_failure_propagates(self):
+		@asyncio.coroutine
+		def get_data(id_, tc):
+			yield from asyncio.sleep(0)
+			raise ValueError("nope")
+
+		self.CTO._get_data = Mock(wraps=get_data)
+
+		results = yield from asyncio.gather(*[self.CTO.get('an id', self.tc) for __ in range(2)],
+		                                    return_exceptions=True)
+
+		self.assertEqual(self.CTO._get_data.call_count, 1)
+		self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+class TestTrelloObjectGetFreshness(TestTrelloObjectBase):
+	def setUp(self):
+		super(TestTrelloObjectGetFreshness, self).setUp()
+		self.CTO.refresh = get_mock_coro(None)
+		self.obj = self.CTO(self.tc, id='an id')
+		self.obj._refreshed_at = time.time() - 60
+		self.tc.obj_cache.set(self.obj)
+
+	@async_test
+	def test_fresh_object_not_refreshed(self):
+		obj = yield from self.CTO.get('an id', self.tc)
+
+		self.assertIs(obj, self.obj)
+		self.assertEqual(self.CTO.refresh.call_count, 0)
+
+	@async_test
+	def test_stale_object_refreshed(self):
+		self.tc.obj_cache.set_max_age(self.CTO, 30)
+		obj = yield from self.CTO.get('an id', self.tc)
+
+		self.assertIs(obj, self.obj)
+		self.assertEqual(self.CTO.refresh.call_count, 1)
+
+	@async_test
+	def test_max_age_override(self):
+		self.tc.obj_cache.set_max_age(self.CTO, 30)
+		yield from self.CTO.get('an id', self.tc, max_age=120)
+
+		self.assertEqual(self.CTO.refresh.call_count, 0)
+
+	@async_test
+	def test_stale_object_refreshed_in_background(self):
+		self.tc.obj_cache.set_max_age(self.CTO, 30)
+		obj = yield from self.CTO.get('an id', self.tc, background_refresh=True)
+
+		# we didn't wait on the refresh...
+		self.assertIs(obj, self.obj)
+		self.assertEqual(self.CTO.refresh.call_count, 0)
+
+		# ...but it happens soon after
+		yield from asyncio.sleep(0)
+		self.assertEqual(self.CTO.refresh.call_count, 1)
+
+
+class TestTrelloObjectHydrateMany(TestRoseTrellisBase):
+	def setUp(self):
+		super(TestTrelloObjectHydrateMany, self).setUp()
+
+		# Made for each test and dropped afterwards, so they don't stay
+		# registered as TrelloObject subclasses for the rest of the tests.
+		class BulkParent(TrelloObject):
+			API_FIELDS = ('id', 'name')
+			API_SINGLE_KEY = 'idBulkParent'
+			STATE_SINGLE_ATTR = 'bulk_parent'
+			API_MANY_KEY = 'idBulkParents'
+			STATE_MANY_ATTR = 'bulk_parents'
+			API_NESTED_MANY_KEY = 'bulkParents'
+			API_NESTED_SINGLE_KEY = 'bulkParent'
+
+		class BulkChild(TrelloObject):
+			API_FIELDS = ('id', 'idBulkParent')
+			API_SINGLE_KEY = 'idBulkChild'
+			STATE_SINGLE_ATTR = 'bulk_child'
+			API_MANY_KEY = 'idBulkChildren'
+			STATE_MANY_ATTR = 'bulk_children'
+			API_NESTED_MANY_KEY = 'bulkChildren'
+			API_NESTED_SINGLE_KEY = 'bulkChild'
+
+		BulkParent.__abstractmethods__ = set()
+		BulkChild.__abstractmethods__ = set()
+		self.BulkParent, self.BulkChild = BulkParent, BulkChild
+		self.addCleanup(self._unregister_bulk_classes)
+
+		self.datas = [{'id': 'c1', 'idBulkParent': 'p1'},
+		              {'id': 'c2', 'idBulkParent': 'p1'},
+		              {'id': 'c3', 'idBulkParent': 'p2'}]
+
+		@asyncio.coroutine
+		def get_many_data(ids, tc):
+			return [{'id': id_, 'name': 'parent ' + id_} for id_ in ids]
+
+		patcher = patch.object(self.BulkParent, '_get_many_data', Mock(wraps=get_many_data))
+		self.get_many_data = patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def _unregister_bulk_classes(self):
+		for klass in (self.BulkParent, self.BulkChild):
+			models._transformers_cache.pop(tuple(klass.API_FIELDS), None)
+		# The dispatch index holds on to every subclass it has seen.
+		models._dispatch_index = None
+		del self.BulkParent, self.BulkChild, self.tc, self.get_many_data
+		gc.collect()
+
+	@async_test
+	def test_get_many_with_data_resolves_each_relation_once(self):
+		children = yield from self.BulkChild.get_many(self.datas, self.tc)
+
+		self.assertEqual([c.id for c in children], ['c1', 'c2', 'c3'])
+
+		# fetched every distinct parent in one go
+		self.assertEqual(self.get_many_data.call_count, 1)
+		self.assertCountEqual(self.get_many_data.call_args[0][0], ['p1', 'p2'])
+
+		# children share parent instances
+		self.assertIs(children[0].bulk_parent, children[1].bulk_parent)
+		self.assertEqual(children[2].bulk_parent.name, 'parent p2')
+
+	@async_test
+	def test_hydrate_many_uses_cached_relations(self):
+		parent = self.BulkParent(self.tc, id='p1')
+		self.tc.obj_cache.set(parent)
+
+		children = yield from self.BulkChild.hydrate_many(self.datas, self.tc)
+
+		self.assertIs(children[0].bulk_parent, parent)
+		self.assertEqual(self.get_many_data.call_args[0][0], ['p2'])
+
+	@async_test
+	def test_hydrate_many_without_fetching(self):
+		children = yield from self.BulkChild.hydrate_many(self.datas, self.tc, fetch_missing=False)
+
+		self.assertEqual(self.get_many_data.call_count, 0)
+		self.assertEqual(children[0].idBulkParent, 'p1')
+		self.assertFalse(hasattr(children[0], 'bulk_parent'))
+
+	@async_test
+	def test_hydrate_many_skips_unchanged(self):
+		# Hold on to them, or the weakly-referencing cache lets them go.
+		first = yield from self.BulkChild.hydrate_many(self.datas, self.tc)
+		changed = [dict(self.datas[0], idBulkParent='p2')] + self.datas[1:]
+
+		children = yield from self.BulkChild.hydrate_many(changed, self.tc)
+
+		self.assertEqual(children, first)
+		self.assertEqual(self.tc.obj_cache.stats['hydrations_skipped'], 2)
+		self.assertEqual(children[0].bulk_parent.id, 'p2')
+		self.assertEqual(children[1].bulk_parent.id, 'p1')
+
+	@async_test
+	def test_hydrate_many_resolves_relations_skipped_before(self):
+		first = yield from self.BulkChild.hydrate_many(self.datas, self.tc, fetch_missing=False)
+
+		children = yield from self.BulkChild.hydrate_many(self.datas, self.tc)
+
+		self.assertEqual(children, first)
+		self.assertEqual(self.tc.obj_cache.stats['hydrations_skipped'], 0)
+		self.assertEqual(self.get_many_data.call_count, 1)
+		self.assertEqual(children[0].bulk_parent.id, 'p1')
+
+		# Now that they're complete, the same data is skipped.
+		yield from self.BulkChild.hydrate_many(self.datas, self.tc)
+		self.assertEqual(self.tc.obj_cache.stats['hydrations_skipped'], 3)
+
+
 class TestTrelloObjectApiStateComm(TestTrelloObjectBase):
-	@patch('rosetrellis.models.obj_cache')
 	@async_test
-	def test_delete(self, obj_cache):
+	def test_delete(self):
+		obj_cache = self.tc.obj_cache = Mock(ObjectCache)
 		obj_cache.get.return_value = None
+		obj_cache.get_in_flight.return_value = None
 		an_id = 'not a real id'
 		self.CTO._get_data = get_mock_coro({'data': None, 'id': 'not a real id'})
 		self.CTO._state_from_api = get_mock_coro(None)
@@ -199,10 +478,11 @@ class TestTrelloObjectApiStateComm(TestTrelloObjectBase):
 		self.assertFalse(hasattr(obj, 'one'))
 		self.assertFalse(hasattr(obj, 'two'))
 
-	@patch('rosetrellis.models.obj_cache')
 	@async_test
-	def test_save_obj_already_on_api(self, obj_cache):
+	def test_save_obj_already_on_api(self):
+		obj_cache = self.tc.obj_cache = Mock(ObjectCache)
 		obj_cache.get.return_value = None
+		obj_cache.get_in_flight.return_value = None
 		an_id = 'not a real id'
 
 		# don't hit internet, just return this stuff
@@ -233,6 +513,9 @@ class TestTrelloObjectApiStateComm(TestTrelloObjectBase):
 		# that already exists on the Trello API
 		self.assertIsNotNone(getattr(obj, 'id', None))
 
+		# change something so there's something to save
+		obj.data = 'new data'
+
 		yield from obj.save()
 
 		# test that we don't try to create since we already exist
@@ -247,6 +530,38 @@ class TestTrelloObjectApiStateComm(TestTrelloObjectBase):
 		# test that we set the data we get back from api on self
 		self.CTO._state_from_api.assert_called_with(new_data)
 
+	@async_test
+	def test_save_clean_obj_does_nothing(self):
+		self.CTO._changes_to_api = get_mock_coro('new data')
+		obj = yield from self.CTO.get({'data': 'some data', 'id': 'an id'}, self.tc)
+
+		yield from obj.save()
+
+		self.assertFalse(obj.is_dirty)
+		self.assertEqual(self.CTO._changes_to_api.call_count, 0)
+
+	@async_test
+	def test_save_sends_only_dirty_fields(self):
+		self.CTO._changes_to_api = get_mock_coro({'data': 'new data', 'id': 'an id'})
+		self.CTO._get_api_update_from_state = lambda self: self._changes_from_raw_data([('data', 'data'),
+		                                                                               ('id', 'id')])
+		obj = yield from self.CTO.get({'data': 'some data', 'id': 'an id'}, self.tc)
+
+		obj.data = 'new data'
+		self.assertEqual(obj._dirty, {'data'})
+
+		yield from obj.save()
+
+		self.CTO._changes_to_api.assert_called_with({'data': 'new data'})
+		self.assertFalse(obj.is_dirty)
+
+	def test_mark_dirty(self):
+		obj = self.CTO(self.tc, id='an id')
+		self.assertFalse(obj.is_dirty)
+
+		obj.mark_dirty('data')
+		self.assertTrue(obj.is_dirty)
+
 	@async_test
 	def test_save_obj_not_on_api_yet(self):
 		# make up some changes
@@ -299,7 +614,6 @@ class TestTrelloObjectApiStateComm(TestTrelloObjectBase):
 		self.CTO._get_data.assert_called_with(obj.id, self.tc)
 		self.CTO._state_from_api.assert_called_with(some_new_data, inflate_children=True)
 
-@patch('rosetrellis.base.obj_cache.get', lambda x: None)
 class TestTrelloObjectStateSetting(TestTrelloObjectBase):
 	@async_test
 	def test_state_from_api_not_inflate_children(self):
@@ -360,7 +674,33 @@ class TestTrelloObjectStateSetting(TestTrelloObjectBase):
 
 		self.CTO._inflator.assert_has_calls(calls, any_order=True)
 
-@patch('rosetrellis.base.obj_cache.get', lambda x: None)
+	@async_test
+	def test_state_from_api_unchanged_data_skipped(self):
+		obj = self.CTO(self.tc)
+		yield from obj._state_from_api({'data': 'some data', 'id': 'an id'})
+		obj._apply_api_data = Mock(wraps=obj._apply_api_data)
+
+		# equal data, whether or not it's the same dict, changes nothing
+		yield from obj._state_from_api({'data': 'some data', 'id': 'an id'})
+		yield from obj._state_from_api(obj._raw_data)
+		self.assertEqual(obj._apply_api_data.call_count, 0)
+		self.assertEqual(self.tc.obj_cache.stats['hydrations_skipped'], 2)
+		self.assertEqual(self.tc.obj_cache.stats['hydrations_applied'], 1)
+
+		# different data is applied
+		yield from obj._state_from_api({'data': 'new data', 'id': 'an id'})
+		self.assertEqual(obj.data, 'new data')
+
+		# local changes are overwritten even if the data hasn't changed
+		obj.data = 'local data'
+		yield from obj._state_from_api({'data': 'new data', 'id': 'an id'})
+		self.assertEqual(obj.data, 'new data')
+
+		# as is state built without inflating children
+		yield from obj._state_from_api({'data': 'new data', 'id': 'an id'}, inflate_children=False)
+		self.assertEqual(obj._apply_api_data.call_count, 3)
+		self.assertEqual(self.tc.obj_cache.stats['hydrations_applied'], 4)
+
 class TestTrelloObjectTransformerMethods(TestTrelloObjectBase):
 	def test_run_transformer_func_with_valid_str(self):
 		def test_func(self, value):
@@ -568,3 +908,24 @@ class TestTrelloObjectTransformerMethods(TestTrelloObjectBase):
 
 		changes = obj._changes_from_raw_data((('data', 'some_other_name'), ('id', 'id')))
 		self.assertEqual(changes, {'some_other_name': 'some other data'})
+
+
+class TestGetClassForData(unittest.TestCase):
+	def test_exact_fields(self):
+		from rosetrellis.models import Card, Lists, Label
+		for klass in (Card, Lists, Label):
+			data = dict.fromkeys(klass.API_FIELDS)
+			self.assertIs(get_class_for_data(data), klass)
+
+	def test_partial_data_with_discriminating_key(self):
+		from rosetrellis.models import Card
+		self.assertIs(get_class_for_data({'id': 'an id', 'idList': 'a list', 'name': 'a card'}), Card)
+
+	def test_ambiguous_or_unknown_data(self):
+		self.assertIsNone(get_class_for_data({'id': 'an id', 'name': 'a name'}))
+		self.assertIsNone(get_class_for_data({'id': 'an id', 'idList': 'a list', 'not a field': 1}))
+
+	def test_is_valid_data_is_falsey_for_other_classes(self):
+		from rosetrellis.models import Card, Lists
+		valid, extra, missing = Lists.is_valid_data(dict.fromkeys(Card.API_FIELDS))
+		self.assertFalse(valid)
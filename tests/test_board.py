@@ -7,7 +7,6 @@ from tests.test_base import TestRoseTrellisBase
 import rosetrellis.models
 
 
-@patch('rosetrellis.base.obj_cache.get', lambda x: None)
 class TestBoard(TestRoseTrellisBase):
 	@async_test
 	def test_get_data(self):
@@ -114,6 +113,17 @@ class TestBoard(TestRoseTrellisBase):
 
 		Label.get_labels.assert_called_with(an_id, self.tc)
 
+	@async_test
+	def test_get_labels_reuses_cached_labels(self):
+		label_data = {'id': 'lb1', 'color': 'red', 'name': 'Blocked', 'uses': 1}
+		label = yield from rosetrellis.models.Label.get(label_data, self.tc)
+		self.tc.get_labels = get_mock_coro([dict(label_data, color='green')])
+
+		labels = yield from rosetrellis.models.Label.get_labels('b1', self.tc)
+
+		self.assertIs(labels[0], label)
+		self.assertEqual(label.color, 'green')
+
 	@async_test
 	def test_get_lists(self):
 		Lists = Mock(rosetrellis.models.Lists)
@@ -145,7 +155,21 @@ class TestBoard(TestRoseTrellisBase):
 			cards = yield from board.get_cards()
 
 		Card.get_many.assert_called_with(board_cards, self.tc, inflate_children=True)
-		
+		self.tc.get_board_cards.assert_called_with(an_id, filter=None)
+
+	@async_test
+	def test_get_cards_filtered(self):
+		Card = Mock(rosetrellis.models.Card)
+		Card.get_many = get_mock_coro('buncha cards')
+		self.tc.get_board_cards = get_mock_coro('board cards')
+
+		board = yield from Board.get({'name': 'a name', 'id': 'an id'}, self.tc)
+
+		with patch('rosetrellis.models.Card', Card):
+			yield from board.get_cards(filter='open')
+
+		self.tc.get_board_cards.assert_called_with('an id', filter='open')
+
 	@async_test
 	def test_get_checklists(self):
 		Checklist = Mock(rosetrellis.models.Checklist)
@@ -161,3 +185,27 @@ class TestBoard(TestRoseTrellisBase):
 			checklists = yield from board.get_checklists()
 
 		Checklist.get_many.assert_called_with(board_checklists, self.tc, inflate_children=True)
+
+	@async_test
+	def test_get_full(self):
+		self.tc.get_board_graph = get_mock_coro({
+			'id': 'b1', 'name': 'a board',
+			'members': [{'id': 'm1', 'username': 'someone'}],
+			'labels': [{'id': 'lb1', 'idBoard': 'b1', 'color': 'red', 'name': ''}],
+			'lists': [{'id': 'l1', 'idBoard': 'b1', 'name': 'a list'}],
+			'cards': [{'id': 'c1', 'idBoard': 'b1', 'idList': 'l1', 'idMembers': ['m1'], 'name': 'a card',
+			           'labels': [{'id': 'lb1', 'idBoard': 'b1', 'color': 'red', 'name': ''}]}],
+			'checklists': [{'id': 'cl1', 'idBoard': 'b1', 'idCard': 'c1', 'name': 'a checklist',
+			                'checkItems': [{'id': 'ci1', 'name': 'an item', 'state': 'complete'}]}],
+		})
+
+		board = yield from Board.get_full('b1', self.tc)
+
+		self.tc.get_board_graph.assert_called_once_with('b1')
+		card = board.cards[0]
+		self.assertIs(card.board, board)
+		self.assertIs(card.list, board.lists[0])
+		self.assertIs(card.members[0], board.members[0])
+		self.assertIs(card.labels[0], board.labels[0])
+		self.assertIs(board.checklists[0].card, card)
+		self.assertEqual(board.checklists[0].checkitems[0].name, 'an item')
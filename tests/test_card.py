@@ -0,0 +1,64 @@
+import datetime
+
+from rosetrellis.models import Board, Card, Label
+from tests import async_test
+from tests.test_base import TestRoseTrellisBase
+
+
+class TestCardQuery(TestRoseTrellisBase):
+	@async_test
+	def setUp(self):
+		super(TestCardQuery, self).setUp()
+		datas = [
+			{'id': 'c1', 'idBoard': 'b1', 'idList': 'l1', 'pos': 3, 'closed': False,
+			 'idLabels': ['lb1'], 'labels': [{'id': 'lb1', 'color': 'red'}], 'idMembers': ['m1'],
+			 'due': '2015-04-02T12:00:00.000Z'},
+			{'id': 'c2', 'idBoard': 'b1', 'idList': 'l1', 'pos': 1, 'closed': False,
+			 'idLabels': [], 'labels': [], 'idMembers': [], 'due': None},
+			{'id': 'c3', 'idBoard': 'b1', 'idList': 'l2', 'pos': 2, 'closed': True,
+			 'idLabels': ['lb1'], 'labels': [{'id': 'lb1', 'color': 'red'}], 'idMembers': ['m1'],
+			 'due': '2015-04-01T12:00:00.000Z'},
+			{'id': 'c4', 'idBoard': 'b2', 'idList': 'l3', 'pos': 1, 'closed': False,
+			 'idLabels': [], 'labels': [], 'idMembers': ['m1'], 'due': '2015-05-01T12:00:00.000Z'},
+		]
+		self.cards = []
+		for data in datas:
+			self.cards.append((yield from Card.get(data, self.tc, inflate_children=False)))
+
+	def ids(self, cards):
+		return [card.id for card in cards]
+
+	def test_query(self):
+		self.assertEqual(self.ids(Card.query(self.tc, list_='l1')), ['c2', 'c1'])
+		self.assertEqual(self.ids(Card.query(self.tc, label_color='red')), ['c3', 'c1'])
+		self.assertEqual(self.ids(Card.query(self.tc, member='m1', closed=False)), ['c4', 'c1'])
+		self.assertEqual(self.ids(Card.query(self.tc, due_after=datetime.datetime(2015, 4, 1, 13),
+		                                     due_before=datetime.datetime(2015, 6, 1))), ['c1', 'c4'])
+		self.assertEqual(self.tc.method_calls, [])
+
+	@async_test
+	def test_board_query(self):
+		board = yield from Board.get({'id': 'b1', 'name': 'a board'}, self.tc)
+		self.assertEqual(self.ids(board.query(label='lb1')), ['c3', 'c1'])
+
+	@async_test
+	def test_label_colors_follow_labels(self):
+		self.assertEqual(self.ids(Card.query(self.tc, label_color='red')), ['c3', 'c1'])
+
+		label = yield from Label.get({'id': 'lb1', 'idBoard': 'b1', 'color': 'green', 'name': ''}, self.tc)
+
+		self.assertEqual(self.ids(Card.query(self.tc, label_color='red')), [])
+		self.assertEqual(self.ids(Card.query(self.tc, label_color='green')), ['c3', 'c1'])
+
+		yield from label.merge_api_data({'id': 'lb1', 'color': 'blue'})
+		self.assertEqual(self.ids(Card.query(self.tc, label_color='blue')), ['c3', 'c1'])
+
+	@async_test
+	def test_indexes_follow_hydration_and_removal(self):
+		Card.query(self.tc)
+
+		yield from self.cards[1]._state_from_api(dict(self.cards[1]._raw_data, idList='l2'))
+		self.assertEqual(self.ids(Card.query(self.tc, list_='l2')), ['c2', 'c3'])
+
+		self.tc.obj_cache.remove('c3')
+		self.assertEqual(self.ids(Card.query(self.tc, list_='l2')), ['c2'])
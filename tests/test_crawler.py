@@ -0,0 +1,87 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from rosetrellis.crawler import Checkpoint, Crawler
+from rosetrellis.models import Board
+from tests import async_test, get_mock_coro
+from tests.test_base import TestRoseTrellisBase
+
+
+class TestCrawler(TestRoseTrellisBase):
+	def setUp(self):
+		super(TestCrawler, self).setUp()
+		self.dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.dir)
+		self.path = os.path.join(self.dir, 'checkpoint.json')
+
+		self.tc.request_budget.return_value = 100
+		self.tc.get_member = get_mock_coro({'id': 'me', 'idOrganizations': ['o1', 'o2']})
+		orgs = {'o1': {'id': 'o1', 'idBoards': ['b1', 'b2']},
+		        'o2': {'id': 'o2', 'idBoards': ['b2', 'b3']}}
+		self.tc.get_organization = Mock(side_effect=lambda id_, fields: get_mock_coro(orgs[id_])())
+
+		def get_full(id_, tc):
+			board = Mock(Board, id=id_, lists=[1], cards=[1, 2], checklists=[])
+			return get_mock_coro(board)()
+
+		patcher = patch.object(Board, 'get_full', Mock(side_effect=get_full))
+		self.get_full = patcher.start()
+		self.addCleanup(patcher.stop)
+
+	@async_test
+	def test_crawl(self):
+		progress_reports = []
+		crawler = Crawler(self.tc, self.path, on_progress=progress_reports.append)
+
+		progress = yield from crawler.crawl()
+
+		self.assertCountEqual([c[0][0] for c in self.get_full.call_args_list], ['b1', 'b2', 'b3'])
+		self.assertEqual(progress.done, 3)
+		self.assertEqual(progress.objects, 3 * 4)
+		self.assertEqual(progress.remaining, 0)
+		self.assertEqual(len(progress_reports), 3)
+
+		with open(self.path) as f:
+			self.assertEqual(json.load(f)['boards']['b1']['cards'], 2)
+
+	@async_test
+	def test_resume_after_failure(self):
+		def on_board(board):
+			if board.id == 'b2':
+				raise ValueError("boom")
+
+		progress = yield from Crawler(self.tc, self.path, on_board=on_board).crawl()
+		self.assertEqual((progress.done, progress.failed), (2, 1))
+		self.assertIn('b2', Checkpoint(self.path).failed)
+
+		self.get_full.reset_mock()
+		progress = yield from Crawler(self.tc, self.path, organization_ids=['o1', 'o2']).crawl()
+
+		# only the board that failed is fetched again
+		self.assertEqual([c[0][0] for c in self.get_full.call_args_list], ['b2'])
+		self.assertEqual((progress.resumed, progress.done, progress.failed), (2, 1, 0))
+		self.assertEqual(Checkpoint(self.path).failed, {})
+
+	@async_test
+	def test_waits_for_request_budget(self):
+		self.tc.request_budget.side_effect = [0, 0, 100, 100, 100]
+
+		with patch('rosetrellis.crawler.BUDGET_WAIT', 0):
+			progress = yield from Crawler(self.tc, self.path, concurrency=1).crawl()
+
+		self.assertEqual(progress.done, 3)
+		self.assertEqual(self.tc.request_budget.call_count, 5)
+
+	@async_test
+	def test_leaves_budget_for_others(self):
+		self.tc.request_budget.side_effect = [50, 50, 51, 100, 100]
+
+		with patch('rosetrellis.crawler.BUDGET_WAIT', 0):
+			progress = yield from Crawler(self.tc, self.path, concurrency=1, budget_fraction=0.5).crawl()
+
+		self.assertEqual(progress.done, 3)
+		self.assertEqual(self.tc.request_budget.call_count, 5)
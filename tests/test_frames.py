@@ -0,0 +1,49 @@
+import datetime
+import unittest
+
+from rosetrellis.frames import CardFrame
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+CARDS = [
+	{'id': 'c1', 'name': 'one', 'idList': 'l1', 'idBoard': 'b1', 'closed': False, 'pos': 1,
+	 'due': '2015-04-01T12:00:00.000Z', 'dateLastActivity': '2015-03-01T12:00:00.000Z',
+	 'idLabels': ['red', 'blue'], 'idMembers': ['m1']},
+	{'id': 'c2', 'name': 'two', 'idList': 'l2', 'idBoard': 'b1', 'closed': False, 'pos': 2,
+	 'due': None, 'dateLastActivity': '2015-03-02T12:00:00.000Z',
+	 'idLabels': [], 'idMembers': []},
+	{'id': 'c3', 'name': 'three', 'idList': 'l1', 'idBoard': 'b1', 'closed': True, 'pos': 3,
+	 'due': '2015-04-01T12:00:00.000Z', 'dateLastActivity': '2015-03-03T12:00:00.000Z',
+	 'idLabels': ['blue'], 'idMembers': ['m1', 'm2']},
+	{'id': 'c4', 'name': 'four', 'idList': 'l2', 'idBoard': 'b1', 'closed': False, 'pos': 4,
+	 'due': '2015-06-01T12:00:00.000Z', 'dateLastActivity': '2015-03-04T12:00:00.000Z',
+	 'idLabels': ['blue'], 'idMembers': []},
+]
+
+
+@unittest.skipIf(numpy is None, "NumPy isn't installed")
+class TestCardFrame(unittest.TestCase):
+	def setUp(self):
+		self.frame = CardFrame.from_datas(CARDS)
+
+	def test_counts(self):
+		self.assertEqual(self.frame.lists.counts(), {'l1': 2, 'l2': 2})
+		self.assertEqual(self.frame.labels.counts(), {'blue': 3, 'red': 1})
+		self.assertEqual(list(self.frame.members.lengths()), [1, 0, 2, 0])
+
+	def test_overdue(self):
+		overdue = self.frame.overdue(now=datetime.datetime(2015, 5, 1))
+		self.assertEqual(list(self.frame.ids[overdue]), ['c1'])
+
+	def test_filter(self):
+		blue_on_l2 = self.frame[self.frame.labels.contains('blue') & self.frame.lists.mask('l2')]
+		self.assertEqual(list(blue_on_l2.ids), ['c4'])
+
+		open_cards = self.frame[~self.frame.closed]
+		self.assertEqual(len(open_cards), 3)
+		self.assertEqual(open_cards.labels.counts(), {'blue': 2, 'red': 1})
+		self.assertEqual(list(open_cards.labels.contains('red')), [True, False, False])
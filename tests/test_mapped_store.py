@@ -0,0 +1,57 @@
+import os
+import tempfile
+
+from rosetrellis.mapped_store import CardView, ListView, MappedStore
+from rosetrellis.models import Board, Card, Label, Lists
+from tests import async_test
+from tests.test_base import TestRoseTrellisBase
+
+
+class TestMappedStore(TestRoseTrellisBase):
+	def setUp(self):
+		super(TestMappedStore, self).setUp()
+		fd, self.path = tempfile.mkstemp(suffix='.rtms')
+		os.close(fd)
+		self.addCleanup(os.remove, self.path)
+
+		written = MappedStore.write(self.path, [
+			(Card, {'id': 'c2', 'name': 'second', 'idList': 'l1', 'idLabels': ['lb1', 'nope']}),
+			(Lists, {'id': 'l1', 'name': 'a list'}),
+			(Board, {'id': 'b1', 'name': 'not stored'}),
+			(Card, {'id': 'c1', 'name': 'first', 'idList': 'l1', 'idLabels': []}),
+			(Label, {'id': 'lb1', 'name': 'urgent', 'color': 'red'}),
+		])
+		self.assertEqual(written, 4)
+
+		self.store = MappedStore(self.path)
+		self.addCleanup(self.store.close)
+
+	def test_get(self):
+		card = self.store.get('c2')
+
+		self.assertIsInstance(card, CardView)
+		self.assertEqual(card.name, 'second')
+		self.assertIsInstance(card.list, ListView)
+		self.assertEqual(card.list.name, 'a list')
+		self.assertEqual([l.name for l in card.labels], ['urgent'])
+		self.assertIsNone(self.store.get('b1'))
+		self.assertNotIn('zzz', self.store)
+
+	def test_decodes_lazily(self):
+		card = self.store.get('c1')
+		self.assertIsNone(card._data)
+		self.assertEqual(card.name, 'first')
+		self.assertIsNotNone(card._data)
+
+	def test_values(self):
+		self.assertEqual(len(self.store), 4)
+		self.assertEqual([c.id for c in self.store.values(Card)], ['c1', 'c2'])
+		self.assertEqual([c.id for c in self.store.get('l1').cards], ['c1', 'c2'])
+
+	@async_test
+	def test_to_object(self):
+		card = yield from self.store.get('c1').to_object(self.tc)
+
+		self.assertIsInstance(card, Card)
+		self.assertIs(self.tc.obj_cache.get('c1'), card)
+		self.assertEqual(card.idList, 'l1')
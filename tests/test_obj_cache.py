@@ -0,0 +1,129 @@
+import gc
+import time
+import unittest
+
+from rosetrellis.base.indexes import FieldIndex, SortedIndex
+from rosetrellis.base.obj_cache import ObjectCache
+
+
+class Thing:
+	def __init__(self, id_, raw_data=None):
+		self.id = id_
+		self._raw_data = raw_data or {}
+
+
+class OtherThing(Thing):
+	pass
+
+
+class TestObjectCache(unittest.TestCase):
+	def test_get_set_remove(self):
+		cache = ObjectCache()
+		thing = Thing('an id')
+		cache.set(thing)
+
+		self.assertIs(cache.get('an id'), thing)
+		self.assertIs(cache.get('an id', Thing), thing)
+		self.assertIsNone(cache.get('an id', OtherThing))
+
+		cache.remove('an id')
+		self.assertIsNone(cache.get('an id'))
+
+		# removing something we don't have is fine
+		cache.remove('an id')
+
+	def test_weak_by_default(self):
+		cache = ObjectCache()
+		cache.set(Thing('an id'))
+		gc.collect()
+
+		self.assertIsNone(cache.get('an id'))
+		self.assertEqual(len(cache), 0)
+
+	def test_strong_tier_evicts_lru(self):
+		cache = ObjectCache(max_objects=2)
+		for id_ in ('one', 'two', 'three'):
+			cache.set(Thing(id_))
+		gc.collect()
+
+		self.assertIsNone(cache.get('one'))
+		self.assertIsNotNone(cache.get('two'))
+		self.assertIsNotNone(cache.get('three'))
+		self.assertEqual(cache.stats['evictions'], 1)
+
+	def test_strong_tier_byte_budget(self):
+		cache = ObjectCache(max_bytes=100, sizer=lambda obj: 60)
+		cache.set(Thing('one'))
+		cache.set(Thing('two'))
+		gc.collect()
+
+		self.assertIsNone(cache.get('one'))
+		self.assertIsNotNone(cache.get('two'))
+		self.assertEqual(cache.info()['strong_bytes'], 60)
+
+	def test_stats(self):
+		cache = ObjectCache()
+		thing = Thing('an id')
+		cache.set(thing)
+		cache.get('an id')
+		cache.get('nope')
+
+		self.assertEqual(cache.stats['hits'], 1)
+		self.assertEqual(cache.stats['misses'], 1)
+		self.assertEqual(cache.info()['partitions'], {'Thing': 1})
+
+	def test_clients_do_not_share(self):
+		one, two = ObjectCache(), ObjectCache()
+		thing = Thing('an id')
+		one.set(thing)
+
+		self.assertIsNone(two.get('an id'))
+
+	def test_is_fresh(self):
+		cache = ObjectCache(max_age={Thing: 30})
+		thing = Thing('an id')
+
+		# never refreshed, so still being built
+		self.assertTrue(cache.is_fresh(thing))
+
+		thing._refreshed_at = time.time() - 60
+		self.assertFalse(cache.is_fresh(thing))
+		self.assertTrue(cache.is_fresh(thing, max_age=120))
+
+		# no policy for this type means it never goes stale
+		other = OtherThing('another id')
+		other._refreshed_at = time.time() - 60
+		self.assertTrue(cache.is_fresh(other))
+
+		cache.default_max_age = 10
+		self.assertFalse(cache.is_fresh(other))
+
+
+class TestObjectCacheIndexes(unittest.TestCase):
+	def test_index_updated_on_hydration_and_removal(self):
+		cache = ObjectCache()
+		thing = Thing('an id', {'color': 'red'})
+		thing._refreshed_at = time.time()
+		cache.set(thing)
+
+		index = cache.add_index(Thing, 'color', FieldIndex(lambda t: [t._raw_data.get('color')]))
+		self.assertIs(cache.get_index(Thing, 'color'), index)
+		self.assertEqual(index.get('red'), {'an id'})
+
+		thing._raw_data = {'color': 'blue'}
+		cache.hydrated(thing)
+		self.assertEqual(index.get('red'), set())
+		self.assertEqual(index.get('blue'), {'an id'})
+
+		cache.remove('an id')
+		self.assertEqual(index.get('blue'), set())
+
+	def test_sorted_index(self):
+		index = SortedIndex(lambda t: t._raw_data.get('due'))
+		for id_, due in (('a', 3), ('b', 1), ('c', None), ('d', 2)):
+			index.update(Thing(id_, {'due': due}))
+
+		self.assertEqual(index.range(), ['b', 'd', 'a'])
+		self.assertEqual(index.range(2, 3), ['d'])
+		index.discard('d')
+		self.assertEqual(index.range(start=2), ['a'])
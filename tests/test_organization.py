@@ -4,7 +4,6 @@ from rosetrellis.models import Organization
 from tests import async_test, get_mock_coro
 from tests.test_base import TestRoseTrellisBase
 
-@patch('rosetrellis.base.obj_cache.get', lambda x: None)
 class TestOrganization(TestRoseTrellisBase):
 	@async_test
 	def test_get_data(self):
@@ -0,0 +1,146 @@
+from unittest.mock import Mock
+
+from rosetrellis.reconcile import Reconciler
+from tests import async_test, get_mock_coro
+from tests.test_base import TestRoseTrellisBase
+
+
+def _graph():
+	return {
+		'id': 'b1', 'name': 'a board', 'desc': '',
+		'members': [],
+		'labels': [{'id': 'lb1', 'idBoard': 'b1', 'color': 'red', 'name': 'Blocked'},
+		           {'id': 'lb2', 'idBoard': 'b1', 'color': 'blue', 'name': 'Old'}],
+		'lists': [{'id': 'l1', 'idBoard': 'b1', 'name': 'To do', 'pos': 100, 'closed': False},
+		          {'id': 'l2', 'idBoard': 'b1', 'name': 'Done', 'pos': 200, 'closed': True},
+		          {'id': 'l3', 'idBoard': 'b1', 'name': 'Junk', 'pos': 300, 'closed': False}],
+		'cards': [{'id': 'c1', 'idBoard': 'b1', 'idList': 'l1', 'name': 'Get a laptop', 'desc': 'old',
+		           'pos': 10, 'closed': False, 'idMembers': [], 'idLabels': ['lb1'],
+		           'labels': [{'id': 'lb1', 'idBoard': 'b1', 'color': 'red', 'name': 'Blocked'}]},
+		          {'id': 'c2', 'idBoard': 'b1', 'idList': 'l1', 'name': 'Stray', 'desc': '',
+		           'pos': 20, 'closed': False, 'idMembers': [], 'idLabels': [], 'labels': []}],
+		'checklists': [{'id': 'cl1', 'idBoard': 'b1', 'idCard': 'c1', 'name': 'Steps',
+		                'checkItems': [{'id': 'ci1', 'name': 'Ask IT', 'state': 'incomplete', 'pos': 1},
+		                               {'id': 'ci2', 'name': 'Gone', 'state': 'incomplete', 'pos': 2}]}],
+	}
+
+
+SPEC = {
+	'name': 'a board',
+	'desc': 'Onboarding',
+	'labels': [{'name': 'Blocked', 'color': 'red'}, {'name': 'Urgent', 'color': 'orange'}],
+	'lists': [
+		{'name': 'To do', 'cards': [
+			{'name': 'Get a laptop', 'desc': 'old', 'labels': ['Blocked'], 'checklists': [
+				{'name': 'Steps', 'items': [{'name': 'Ask IT', 'checked': True}, 'Sign form']},
+			]},
+			{'name': 'Meet the team', 'labels': ['Urgent'], 'checklists': [
+				{'name': 'People', 'items': ['Alice']},
+			]},
+		]},
+		{'name': 'Done'},
+	],
+}
+
+
+class TestReconciler(TestRoseTrellisBase):
+	def _mock_writes(self):
+		created = iter(range(1, 100))
+		for method in ('create_label', 'create_list', 'create_card', 'create_checklist', 'create_checkitem'):
+			setattr(self.tc, method,
+			        Mock(side_effect=lambda *args: get_mock_coro({'id': 'new{}'.format(next(created))})()))
+		for method in ('update_board', 'update_label', 'update_list', 'update_card', 'update_checkitem',
+		               'delete_label', 'delete_checklist', 'delete_checkitem'):
+			setattr(self.tc, method, get_mock_coro({}))
+
+	@async_test
+	def test_plan_only_has_differences(self):
+		self.tc.get_board_graph = get_mock_coro(_graph())
+
+		plan = yield from Reconciler(self.tc, 'b1', SPEC).plan()
+
+		self.assertEqual([[str(op) for op in wave] for wave in plan.waves], [
+			["update board b1", "create label 'Urgent'", "update list 'Done'"],
+			["create card 'Meet the team'"],
+			["create checklist 'People'"],
+			["update check item 'Ask IT'", "create check item 'Sign form'", "create check item 'Alice'"],
+		])
+		self.assertIn("create card 'Meet the team'", str(plan))
+
+	@async_test
+	def test_prune(self):
+		self.tc.get_board_graph = get_mock_coro(_graph())
+
+		plan = yield from Reconciler(self.tc, 'b1', SPEC, prune=True).plan()
+
+		ops = [str(op) for op in plan.operations]
+		for expected in ("delete label 'Old'", "close list 'Junk'", "close card 'Stray'",
+		                 "delete check item 'Gone'"):
+			self.assertIn(expected, ops)
+
+	@async_test
+	def test_apply_fills_in_created_ids(self):
+		self.tc.get_board_graph = get_mock_coro(_graph())
+		self._mock_writes()
+
+		plan = yield from Reconciler(self.tc, 'b1', SPEC).apply()
+
+		self.assertEqual(plan.failed, [])
+		self.tc.update_board.assert_called_once_with('b1', {'desc': 'Onboarding'})
+		self.tc.update_list.assert_called_once_with('l2', {'closed': 'false'})
+		self.tc.create_label.assert_called_once_with({'name': 'Urgent', 'color': 'orange', 'idBoard': 'b1'})
+		self.tc.create_card.assert_called_once_with(
+			{'name': 'Meet the team', 'idList': 'l1', 'pos': 20 + 16384, 'idLabels': 'new1'})
+		self.tc.create_checklist.assert_called_once_with({'idCard': 'new2', 'name': 'People'})
+		self.tc.update_checkitem.assert_called_once_with('c1', 'cl1', 'ci1', {'state': 'complete'})
+		self.tc.create_checkitem.assert_any_call('new3', {'name': 'Alice', 'pos': 16384})
+		self.tc.create_checkitem.assert_any_call('cl1', {'name': 'Sign form', 'pos': 2 + 16384})
+
+	@async_test
+	def test_dry_run_makes_no_changes(self):
+		self.tc.get_board_graph = get_mock_coro(_graph())
+		self._mock_writes()
+
+		plan = yield from Reconciler(self.tc, 'b1', SPEC).apply(dry_run=True)
+
+		self.assertEqual(len(plan), 8)
+		self.assertFalse(self.tc.create_card.called)
+		self.assertFalse(self.tc.update_board.called)
+
+	@async_test
+	def test_failures_skip_dependents(self):
+		self.tc.get_board_graph = get_mock_coro(_graph())
+		self._mock_writes()
+		self.tc.create_label.side_effect = ValueError('nope')
+
+		plan = yield from Reconciler(self.tc, 'b1', SPEC).apply()
+
+		self.assertEqual([str(op) for op in plan.failed], ["create label 'Urgent'", "create card 'Meet the team'",
+		                                                   "create checklist 'People'", "create check item 'Alice'"])
+		self.tc.update_checkitem.assert_called_once_with('c1', 'cl1', 'ci1', {'state': 'complete'})
+
+	@async_test
+	def test_unknown_label(self):
+		self.tc.get_board_graph = get_mock_coro(_graph())
+		spec = {'lists': [{'name': 'To do', 'cards': [{'name': 'x', 'labels': ['Nope']}]}]}
+
+		with self.assertRaises(ValueError):
+			yield from Reconciler(self.tc, 'b1', spec).plan()
+
+	@async_test
+	def test_plan_after_apply_gets_board_again(self):
+		calls = []
+		self.tc.invalidate_ids = Mock(side_effect=lambda ids: calls.append(('invalidate', ids)))
+
+		def get_board_graph(board_id):
+			calls.append(('get', board_id))
+			return get_mock_coro(_graph())()
+
+		self.tc.get_board_graph = Mock(side_effect=get_board_graph)
+		self._mock_writes()
+		reconciler = Reconciler(self.tc, 'b1', SPEC)
+
+		yield from reconciler.apply()
+		yield from reconciler.plan()
+
+		self.assertEqual(calls, [('invalidate', ['b1']), ('get', 'b1')] * 2)
@@ -0,0 +1,51 @@
+from unittest.mock import patch
+
+from rosetrellis.scheduler import PollScheduler
+from tests import async_test, get_mock_coro
+from tests.test_base import TestRoseTrellisBase
+
+
+class TestPollScheduler(TestRoseTrellisBase):
+	def setUp(self):
+		super(TestPollScheduler, self).setUp()
+		self.tc.request_budget.return_value = 100
+		self.poll = get_mock_coro(None)
+		self.scheduler = PollScheduler(self.tc, poll=self.poll, min_interval=10, max_interval=80,
+		                               discovery_interval=5)
+
+	def set_activity(self, **activity):
+		self.tc.get_boards = get_mock_coro([{'id': id_, 'dateLastActivity': date}
+		                                    for id_, date in sorted(activity.items())])
+
+	@async_test
+	def tick_at(self, now):
+		with patch('rosetrellis.scheduler.time.time', return_value=now):
+			return (yield from self.scheduler.tick())
+
+	def polled_at(self, now):
+		self.poll.reset_mock()
+		self.tick_at(now)
+		return sorted(c[0][0] for c in self.poll.call_args_list)
+
+	def test_idle_boards_back_off_and_changed_boards_wake_up(self):
+		self.set_activity(b1='day 1', b2='day 1')
+		self.assertEqual(self.polled_at(1000), ['b1', 'b2'])
+		self.tc.get_boards.assert_called_with(fields=('id', 'dateLastActivity'))
+
+		# Not due yet, then due but unchanged.
+		self.assertEqual(self.polled_at(1005), [])
+		self.assertEqual(self.polled_at(1010), [])
+		self.assertEqual(self.scheduler.schedules['b1'].interval, 20)
+
+		# b2 changes, and is polled once min_interval has passed since its last poll.
+		self.set_activity(b1='day 1', b2='day 2')
+		self.assertEqual(self.polled_at(1020), ['b2'])
+		self.assertEqual(self.scheduler.schedules['b2'].interval, 10)
+
+	def test_budget_limits_polls(self):
+		self.tc.request_budget.return_value = 4
+		self.set_activity(b1='x', b2='x', b3='x')
+
+		self.assertEqual(len(self.polled_at(1000)), 2)
+		self.tc.request_budget.return_value = 100
+		self.assertEqual(len(self.polled_at(1001)), 1)
@@ -0,0 +1,43 @@
+from rosetrellis.models import Card, Checklist
+from rosetrellis.search import CardSearch, SearchIndex, tokenize
+from tests import async_test, get_mock_coro
+from tests.test_base import TestRoseTrellisBase
+
+
+class TestCardSearch(TestRoseTrellisBase):
+	@async_test
+	def test_search_local(self):
+		search = CardSearch(self.tc)
+		cards = []
+		for data in ({'id': 'c1', 'name': 'Printer broken', 'desc': 'The office printer is on fire'},
+		             {'id': 'c2', 'name': 'Order paper', 'desc': 'For the printer'},
+		             {'id': 'c3', 'name': 'Lunch', 'desc': ''}):
+			cards.append((yield from Card.get(data, self.tc, inflate_children=False)))
+		checklist = yield from Checklist.get({'id': 'cl1', 'idCard': 'c3', 'name': 'todo',
+		                                      'checkItems': [{'id': 'ci1', 'name': 'Buy printer ink'}]},
+		                                     self.tc, inflate_children=True)
+
+		self.assertEqual([c.id for c in search.search_local('printer')], ['c1', 'c3', 'c2'])
+		self.assertEqual([c.id for c in search.search_local('the pri')], ['c1', 'c2'])
+		self.assertEqual([c.id for c in search.search_local('lunch ink')], ['c3'])
+
+		yield from cards[0]._state_from_api(dict(cards[0]._raw_data, name='Fixed', desc=''))
+		self.assertEqual([c.id for c in search.search_local('printer')], ['c3', 'c2'])
+		self.assertEqual(self.tc.method_calls, [])
+
+	@async_test
+	def test_falls_back_to_trello_when_cold(self):
+		self.tc.search = get_mock_coro({'cards': [{'id': 'c1', 'name': 'Printer broken'}]})
+		search = CardSearch(self.tc)
+
+		cards = yield from search.search('printer')
+
+		self.tc.search.assert_called_once_with('printer', model_types='cards', cards_limit=20, partial=True)
+		self.assertEqual([c.id for c in cards], ['c1'])
+		self.assertEqual(len(search.index), 1)
+
+
+class TestSearchIndex(TestRoseTrellisBase):
+	def test_tokenize(self):
+		self.assertEqual(tokenize("Don't PANIC, it's fine"), ['don', 't', 'panic', 'it', 's', 'fine'])
+		self.assertEqual(tokenize(None), [])
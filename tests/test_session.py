@@ -0,0 +1,92 @@
+import asyncio
+
+from rosetrellis.models import Board, Card, Lists
+from rosetrellis.session import DependencyError, Session
+from tests import async_test, get_mock_coro
+from tests.test_base import TestRoseTrellisBase
+
+
+class TestSession(TestRoseTrellisBase):
+	def setUp(self):
+		super(TestSession, self).setUp()
+		self.tc.create_list = get_mock_coro({'id': 'l1', 'idBoard': 'b1', 'name': 'New list'})
+		self.tc.create_card = get_mock_coro({'id': 'c1', 'idBoard': 'b1', 'idList': 'l1', 'name': 'New card'})
+		self.tc.update_card = get_mock_coro({'id': 'c2', 'idBoard': 'b1', 'name': 'Renamed', 'desc': 'Changed'})
+		self.tc.delete_card = get_mock_coro({})
+
+	@asyncio.coroutine
+	def _new_card_on_new_list(self):
+		board = yield from Board.get({'id': 'b1', 'name': 'a board'}, self.tc, inflate_children=False)
+		new_list = Lists(self.tc)
+		new_list.name = 'New list'
+		new_list.board = board
+		card = Card(self.tc)
+		card.name = 'New card'
+		card.list = new_list
+		return new_list, card
+
+	@async_test
+	def test_creates_in_dependency_order(self):
+		new_list, card = yield from self._new_card_on_new_list()
+		session = Session(self.tc)
+		# Only the card is added, the list it's on is created first anyway.
+		session.add(card)
+
+		result = yield from session.flush()
+
+		self.assertTrue(result.ok)
+		self.assertEqual(result.saved, [new_list, card])
+		self.tc.create_list.assert_called_once_with({'name': 'New list', 'idBoard': 'b1'})
+		self.tc.create_card.assert_called_once_with({'name': 'New card', 'idList': 'l1'})
+		self.assertEqual(card.id, 'c1')
+		self.assertEqual(session.new, [])
+
+	@async_test
+	def test_changes_coalesce_into_one_update(self):
+		card = yield from Card.get({'id': 'c2', 'idBoard': 'b1', 'name': 'Old', 'desc': ''}, self.tc,
+		                           inflate_children=False)
+		session = Session(self.tc)
+		session.add(card)
+		card.name = 'Renamed'
+		card.name = 'Renamed'
+		card.desc = 'Changed'
+		session.add(card)
+
+		result = yield from session.flush()
+
+		self.assertEqual(result.saved, [card])
+		self.tc.update_card.assert_called_once_with('c2', {'name': 'Renamed', 'desc': 'Changed'})
+
+	@async_test
+	def test_deleted_objects_are_not_updated(self):
+		card = yield from Card.get({'id': 'c2', 'idBoard': 'b1', 'name': 'Old', 'desc': ''}, self.tc,
+		                           inflate_children=False)
+		session = Session(self.tc)
+		session.add(card)
+		card.name = 'Renamed'
+		session.delete(card)
+
+		result = yield from session.flush()
+
+		self.assertEqual(result.deleted, [card])
+		self.assertFalse(self.tc.update_card.called)
+		self.tc.delete_card.assert_called_once_with('c2')
+
+	@async_test
+	def test_failure_is_reported_and_skips_dependents(self):
+		new_list, card = yield from self._new_card_on_new_list()
+		other = yield from Card.get({'id': 'c2', 'idBoard': 'b1', 'name': 'Old', 'desc': ''}, self.tc,
+		                            inflate_children=False)
+		other.desc = 'Changed'
+		self.tc.create_list.side_effect = ValueError('nope')
+		session = Session(self.tc)
+		session.add(card, other)
+
+		result = yield from session.flush()
+
+		self.assertFalse(result.ok)
+		self.assertIsInstance(result.errors[new_list], ValueError)
+		self.assertIsInstance(result.errors[card], DependencyError)
+		self.assertFalse(self.tc.create_card.called)
+		self.assertEqual(result.saved, [other])
+		self.assertEqual(session.new, [card])
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import tempfile
+from unittest.mock import Mock, patch
+
+from rosetrellis.base.obj_cache import ObjectCache
+from rosetrellis.models import Board, Card, Lists
+from rosetrellis.snapshot import Snapshot
+from rosetrellis.trello_client import TrelloClient
+from tests import async_test, get_mock_coro
+from tests.test_base import TestRoseTrellisBase
+
+
+class TestSnapshot(TestRoseTrellisBase):
+	def setUp(self):
+		super(TestSnapshot, self).setUp()
+		fd, self.path = tempfile.mkstemp(suffix='.jsonl.gz')
+		os.close(fd)
+		self.addCleanup(os.remove, self.path)
+
+		self.new_tc = Mock(TrelloClient)
+		self.new_tc.obj_cache = ObjectCache()
+
+	@asyncio.coroutine
+	def save_board(self):
+		self.tc.get_board_graph = get_mock_coro({
+			'id': 'b1', 'name': 'a board',
+			'lists': [{'id': 'l1', 'idBoard': 'b1', 'name': 'a list'}],
+			'cards': [{'id': 'c1', 'idBoard': 'b1', 'idList': 'l1', 'name': 'a card'}],
+			'checklists': [{'id': 'cl1', 'idBoard': 'b1', 'idCard': 'c1', 'name': 'a checklist',
+			                'checkItems': [{'id': 'ci1', 'name': 'an item', 'state': 'complete'}]}],
+			'labels': [], 'members': [],
+		})
+		self.board = yield from Board.get_full('b1', self.tc)
+		self.board.cards[0]._refreshed_at = 1234.0
+		self.assertEqual(Snapshot(self.tc, self.path).save(), 4)
+
+	@async_test
+	def test_load_links_relations_without_requests(self):
+		yield from self.save_board()
+
+		snapshot = Snapshot(self.new_tc, self.path)
+		yield from snapshot.load(revalidate=False)
+
+		card = self.new_tc.obj_cache.get('c1', Card)
+		self.assertEqual(card.name, 'a card')
+		self.assertIs(card.board, self.new_tc.obj_cache.get('b1', Board))
+		self.assertIs(card.list, self.new_tc.obj_cache.get('l1', Lists))
+		self.assertEqual(card._refreshed_at, 1234.0)
+		self.assertEqual(self.new_tc.obj_cache.get('cl1').checkitems[0].name, 'an item')
+		self.assertEqual(len(snapshot.objects), 4)
+		self.assertEqual(self.new_tc.method_calls, [])
+
+	@async_test
+	def test_revalidate_drops_stale_objects_gone_from_api(self):
+		yield from self.save_board()
+		snapshot = Snapshot(self.new_tc, self.path)
+		yield from snapshot.load(revalidate=False)
+
+		with patch.object(Card, '_get_many_data', get_mock_coro([])) as get_many_data:
+			refetched = yield from snapshot.revalidate(max_age=60)
+
+		get_many_data.assert_called_once_with(['c1'], self.new_tc)
+		self.assertEqual(refetched, 0)
+		self.assertIsNone(self.new_tc.obj_cache.get('c1'))
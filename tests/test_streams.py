@@ -0,0 +1,71 @@
+import asyncio
+import unittest
+
+from rosetrellis.streams import TrelloObjectStream
+from tests import async_test
+
+
+class TestTrelloObjectStream(unittest.TestCase):
+	def setUp(self):
+		self.fetching = 0
+		self.most_fetching = 0
+
+		@asyncio.coroutine
+		def get_sources():
+			return ['a', 'b', 'c', 'd']
+
+		@asyncio.coroutine
+		def fetch(source):
+			self.fetching += 1
+			self.most_fetching = max(self.most_fetching, self.fetching)
+			yield from asyncio.sleep(0)
+			self.fetching -= 1
+			return [source + str(i) for i in range(3)]
+
+		self.get_sources = get_sources
+		self.fetch = fetch
+
+	@async_test
+	def test_yields_everything(self):
+		stream = TrelloObjectStream(self.get_sources, self.fetch, concurrency=2)
+		objs = []
+		while True:
+			obj = yield from stream.next()
+			if obj is None:
+				break
+			objs.append(obj)
+
+		self.assertCountEqual(objs, [s + str(i) for s in 'abcd' for i in range(3)])
+		self.assertEqual(self.most_fetching, 2)
+
+		# stays finished
+		self.assertIsNone((yield from stream.next()))
+
+	@async_test
+	def test_back_pressure(self):
+		stream = TrelloObjectStream(self.get_sources, self.fetch, concurrency=1, buffer_size=2)
+		yield from stream.next()
+		for __ in range(5):
+			yield from asyncio.sleep(0)
+
+		# workers wait for us instead of fetching everything
+		self.assertLessEqual(stream._results.qsize(), 2)
+		self.assertEqual(stream._sources.qsize(), 2)
+		stream.close()
+		yield from asyncio.sleep(0)
+
+	@async_test
+	def test_failure_propagates(self):
+		@asyncio.coroutine
+		def fetch(source):
+			raise ValueError(source)
+
+		stream = TrelloObjectStream(self.get_sources, fetch)
+		with self.assertRaises(ValueError):
+			yield from stream.next()
+		self.assertIsNone((yield from stream.next()))
+		yield from asyncio.sleep(0)
+
+	def test_sync_iteration(self):
+		stream = TrelloObjectStream(self.get_sources, self.fetch)
+		self.assertEqual(len(list(stream)), 12)
@@ -0,0 +1,99 @@
+from unittest.mock import Mock, patch
+
+from rosetrellis.models import Board, Card
+from rosetrellis.sync import ActionApplier, BoardSync, SyncResult
+from tests import async_test, get_mock_coro
+from tests.test_base import TestRoseTrellisBase
+
+
+class TestActionApplier(TestRoseTrellisBase):
+	def setUp(self):
+		super(TestActionApplier, self).setUp()
+		self.applier = ActionApplier(self.tc)
+
+	@async_test
+	def test_update_card(self):
+		card = yield from Card.get({'id': 'c1', 'name': 'old name', 'idList': 'l1'}, self.tc,
+		                           inflate_children=False)
+
+		result = yield from self.applier.apply([{
+			'id': 'a1', 'type': 'updateCard',
+			'data': {'card': {'id': 'c1', 'name': 'new name'}, 'old': {'name': 'old name'}}
+		}])
+
+		self.assertEqual(card.name, 'new name')
+		self.assertEqual(card.idList, 'l1')
+		self.assertEqual(result.applied, 1)
+		self.assertEqual(result.refetched, 0)
+
+	@async_test
+	def test_delete_card(self):
+		card = yield from Card.get({'id': 'c1', 'name': 'a card'}, self.tc, inflate_children=False)
+
+		result = yield from self.applier.apply([{'id': 'a1', 'type': 'deleteCard',
+		                                         'data': {'card': {'id': 'c1'}}}])
+
+		self.assertIsNone(self.tc.obj_cache.get('c1'))
+		self.assertEqual(result.removed, 1)
+
+	@async_test
+	def test_created_objects_refetched_together(self):
+		actions = [{'id': 'a1', 'type': 'createCard', 'data': {'card': {'id': 'c1'}}},
+		           {'id': 'a2', 'type': 'createCard', 'data': {'card': {'id': 'c2'}}},
+		           {'id': 'a3', 'type': 'commentCard', 'data': {'card': {'id': 'c1'}}}]
+
+		with patch.object(Card, '_get_many_data', get_mock_coro(['d1', 'd2'])) as get_many_data, \
+				patch.object(Card, 'hydrate_many', get_mock_coro(['card 1', 'card 2'])) as hydrate_many:
+			result = yield from self.applier.apply(actions)
+
+		self.tc.invalidate_ids.assert_called_once_with(['c1', 'c2'])
+		get_many_data.assert_called_once_with(['c1', 'c2'], self.tc)
+		hydrate_many.assert_called_once_with(['d1', 'd2'], self.tc)
+		self.assertEqual((result.applied, result.ignored, result.refetched), (2, 1, 2))
+
+
+class TestBoardSync(TestRoseTrellisBase):
+	@async_test
+	def test_applies_new_actions_oldest_first(self):
+		self.tc.get_board_actions = get_mock_coro([{'id': 'a3'}, {'id': 'a2'}, {'id': 'a1'}])
+		sync = BoardSync(self.tc, 'b1', limit=10, last_action_id='a1')
+
+		with patch.object(sync.applier, 'apply', get_mock_coro(SyncResult())) as apply:
+			yield from sync.sync()
+
+		self.tc.invalidate_ids.assert_called_once_with(['b1'])
+		self.tc.get_board_actions.assert_called_once_with('b1', since='a1', limit=10)
+		self.assertEqual(list(apply.call_args[0][0]), [{'id': 'a2'}, {'id': 'a3'}])
+		self.assertEqual(sync.last_action_id, 'a3')
+
+	@async_test
+	def test_gap_gets_whole_board(self):
+		sync = BoardSync(self.tc, 'b1', limit=2, last_action_id='a1')
+		self.tc.get_board_actions = get_mock_coro([{'id': 'a3'}, {'id': 'a2'}])
+
+		with patch.object(sync, 'full_refetch', get_mock_coro('full')) as full_refetch:
+			result = yield from sync.sync()
+
+		full_refetch.assert_called_once_with()
+		self.assertEqual(result, 'full')
+
+	@async_test
+	def test_full_refetch_removes_objects_gone_from_board(self):
+		kept = yield from Card.get({'id': 'c1', 'idBoard': 'b1', 'name': 'kept'}, self.tc, inflate_children=False)
+		# Cached since the board was last fetched, say by a createCard action.
+		gone = yield from Card.get({'id': 'c2', 'idBoard': 'b1', 'name': 'gone'}, self.tc, inflate_children=False)
+		other = yield from Card.get({'id': 'c3', 'idBoard': 'b2', 'name': 'other'}, self.tc,
+		                            inflate_children=False)
+		self.tc.get_board_actions = get_mock_coro([{'id': 'a9'}])
+		board = Mock(Board, lists=[], cards=[kept], checklists=[], labels=[])
+		sync = BoardSync(self.tc, 'b1')
+
+		with patch.object(Board, 'get_full', get_mock_coro(board)):
+			result = yield from sync.sync()
+
+		self.tc.invalidate_ids.assert_called_once_with(['b1'])
+		self.assertEqual(result.removed, 1)
+		self.assertIsNone(self.tc.obj_cache.get('c2'))
+		self.assertIs(self.tc.obj_cache.get('c1'), kept)
+		self.assertIs(self.tc.obj_cache.get('c3'), other)
+		self.assertEqual(sync.last_action_id, 'a9')
@@ -0,0 +1,39 @@
+import unittest
+from unittest.mock import patch
+
+from rosetrellis.trello_client import RATE_LIMIT_REQUESTS, TrelloClient
+from tests import async_test, get_mock_coro
+
+
+class TestThrottle(unittest.TestCase):
+	def setUp(self):
+		self.tc = TrelloClient(api_key='a key', api_token='a token')
+
+	def test_waiting_requests_get_their_own_slots(self):
+		for i in range(RATE_LIMIT_REQUESTS):
+			with patch('rosetrellis.trello_client.time.time', return_value=1000 + i / 10):
+				self.assertEqual(self.tc._reserve_request_slot(), 0)
+
+		with patch('rosetrellis.trello_client.time.time', return_value=1010.0):
+			waits = [self.tc._reserve_request_slot() for __ in range(3)]
+			self.assertEqual(self.tc.request_budget(), 0)
+
+		self.assertEqual([round(w, 6) for w in waits], [0, 0.1, 0.2])
+
+
+class TestGetBoards(unittest.TestCase):
+	def setUp(self):
+		self.tc = TrelloClient(api_key='a key', api_token='a token')
+		self.tc.get = get_mock_coro([])
+
+	@async_test
+	def test_default_fields(self):
+		yield from self.tc.get_boards()
+
+		self.tc.get.assert_called_once_with('member/me/boards', params={'filter': 'open'})
+
+	@async_test
+	def test_fields(self):
+		yield from self.tc.get_boards(only_open=False, fields=('id', 'dateLastActivity'))
+
+		self.tc.get.assert_called_once_with('member/me/boards', params={'fields': 'id,dateLastActivity'})
@@ -1,5 +1,6 @@
+import datetime
 import unittest
-from rosetrellis.util import join_url
+from rosetrellis.util import join_url, parse_date, format_date, loads_frozen
 
 
 class TestUtil(unittest.TestCase):
@@ -11,3 +12,35 @@ class TestUtil(unittest.TestCase):
 		self.assertEqual(join_url(''), url_base[:-1])
 		self.assertEqual(join_url('what/'), expected)
 		self.assertEqual(join_url('/what/'), expected)
+
+	def test_parse_date(self):
+		expected = datetime.datetime(2015, 4, 1, 20, 50, 42, 123000, tzinfo=datetime.timezone.utc)
+		self.assertEqual(parse_date('2015-04-01T20:50:42.123Z'), expected)
+
+		# not in Trello's format, so falls back to dateutil
+		self.assertEqual(parse_date('2015-04-01T20:50:42.123+00:00'), expected)
+
+		with self.assertRaises(ValueError):
+			parse_date('not a date')
+
+	def test_format_date_round_trips(self):
+		date_str = '2015-04-01T20:50:42.123Z'
+		self.assertEqual(format_date(parse_date(date_str)), date_str)
+
+	def test_loads_frozen(self):
+		data = loads_frozen('{"id": "an id", "idLabels": ["one", "two"], "prefs": {"a": [1]}}')
+
+		# reads and compares like the plain data...
+		self.assertEqual(data, {'id': 'an id', 'idLabels': ['one', 'two'], 'prefs': {'a': [1]}})
+		self.assertIsInstance(data, dict)
+
+		# ...but can't be changed
+		with self.assertRaises(TypeError):
+			del data['idLabels']
+		with self.assertRaises(TypeError):
+			data['idLabels'].append('three')
+		with self.assertRaises(TypeError):
+			data['prefs']['a'][0] = 2
+
+		# copies are still possible
+		self.assertEqual(dict(data, id='another id')['id'], 'another id')
@@ -0,0 +1,69 @@
+import json
+from unittest.mock import Mock, patch
+
+from rosetrellis.sync import SyncResult
+from rosetrellis.trello_client import CachedUrl, CachedUrlDict
+from rosetrellis.webhooks import WebhookReceiver, action_ids, replay, sign_payload
+from tests import async_test, get_mock_coro
+from tests.test_base import TestRoseTrellisBase
+
+
+ACTION = {'id': 'a1', 'type': 'updateCard',
+          'data': {'card': {'id': 'c1', 'name': 'new'}, 'old': {'name': 'old'}, 'board': {'id': 'b1'}}}
+
+
+class TestWebhookReceiver(TestRoseTrellisBase):
+	def setUp(self):
+		super(TestWebhookReceiver, self).setUp()
+		self.receiver = WebhookReceiver(self.tc, secret='shh', callback_url='https://example.com/hook')
+		self.receiver.applier.apply = get_mock_coro(SyncResult())
+
+	def make_request(self, payload, signature=None):
+		body = json.dumps(payload).encode('utf-8')
+		if signature is None:
+			signature = sign_payload(body, self.receiver.callback_url, self.receiver.secret)
+		request = Mock(method='POST', headers={'X-Trello-Webhook': signature})
+		request.read = get_mock_coro(body)
+		return request
+
+	def test_action_ids(self):
+		self.assertEqual(action_ids(ACTION), ['c1', 'b1'])
+
+	@async_test
+	def test_receive_invalidates_then_applies(self):
+		yield from self.receiver.receive({'action': ACTION})
+
+		self.tc.invalidate_ids.assert_called_once_with(['c1', 'b1'])
+		self.receiver.applier.apply.assert_called_once_with([ACTION])
+
+	@async_test
+	def test_handle(self):
+		response = yield from self.receiver.handle(self.make_request({'action': ACTION}))
+
+		self.assertEqual(response.status, 200)
+		self.receiver.applier.apply.assert_called_once_with([ACTION])
+
+	@async_test
+	def test_handle_bad_signature(self):
+		response = yield from self.receiver.handle(self.make_request({'action': ACTION}, signature='nope'))
+
+		self.assertEqual(response.status, 401)
+		self.assertFalse(self.receiver.applier.apply.called)
+
+	@async_test
+	def test_replay(self):
+		stats = yield from replay(self.receiver, [{'action': ACTION}] * 3, concurrency=2)
+
+		self.assertEqual(stats.payloads, 3)
+		self.assertEqual(self.receiver.received, 3)
+
+
+class TestCachedUrlDictInvalidate(TestRoseTrellisBase):
+	def test_invalidate(self):
+		cache = CachedUrlDict(expire_seconds=10)
+		cache[CachedUrl('cards/c1')] = 'card'
+		cache[CachedUrl('batch', {'urls': '/cards/c2,/cards/c1'})] = 'batch'
+		cache[CachedUrl('cards/c2')] = 'other card'
+
+		self.assertEqual(cache.invalidate(['c1']), 2)
+		self.assertEqual(list(cache), [CachedUrl('cards/c2')])
@@ -0,0 +1,112 @@
+import asyncio
+from unittest.mock import Mock
+
+from rosetrellis.models import Card
+from rosetrellis.write_behind import WriteBehindQueue
+from tests import async_test, get_mock_coro
+from tests.test_base import TestRoseTrellisBase
+
+
+class TestWriteBehindQueue(TestRoseTrellisBase):
+	def setUp(self):
+		super(TestWriteBehindQueue, self).setUp()
+		self.tc.update_card = get_mock_coro({'id': 'c1', 'name': 'Renamed', 'desc': 'Changed'})
+
+	@asyncio.coroutine
+	def _card(self):
+		return (yield from Card.get({'id': 'c1', 'idBoard': 'b1', 'name': 'Old', 'desc': ''}, self.tc,
+		                            inflate_children=False))
+
+	@async_test
+	def test_edits_within_delay_are_one_update(self):
+		queue = WriteBehindQueue(self.tc, delay=0.02)
+		card = yield from self._card()
+
+		card.name = 'Renamed'
+		yield from card.save()
+		card.desc = 'Changed'
+		yield from card.save()
+
+		self.assertFalse(self.tc.update_card.called)
+		self.assertEqual(queue.pending, [card])
+		yield from asyncio.sleep(0.05)
+		self.tc.update_card.assert_called_once_with('c1', {'name': 'Renamed', 'desc': 'Changed'})
+		self.assertEqual(queue.pending, [])
+
+	@async_test
+	def test_max_delay(self):
+		queue = WriteBehindQueue(self.tc, delay=0.02, max_delay=0.05)
+		card = yield from self._card()
+
+		for i in range(10):
+			card.name = 'Renamed'
+			yield from card.save()
+			yield from asyncio.sleep(0.01)
+
+		self.assertTrue(self.tc.update_card.called)
+		yield from queue.close()
+
+	@async_test
+	def test_flush_and_close(self):
+		queue = WriteBehindQueue(self.tc, delay=60)
+		card = yield from self._card()
+		card.name = 'Renamed'
+		yield from card.save()
+
+		result = yield from queue.flush()
+
+		self.assertEqual(result.saved, [card])
+		self.assertEqual(self.tc.update_card.call_count, 1)
+
+		yield from queue.close()
+		self.assertIsNone(self.tc.write_behind)
+		card.desc = 'Saved straight away'
+		yield from card.save()
+		self.assertEqual(self.tc.update_card.call_count, 2)
+
+	@async_test
+	def test_errors_go_to_on_error(self):
+		on_error = Mock()
+		queue = WriteBehindQueue(self.tc, delay=60, on_error=on_error)
+		self.tc.update_card.side_effect = ValueError('nope')
+		card = yield from self._card()
+		card.name = 'Renamed'
+		yield from card.save()
+
+		result = yield from queue.close()
+
+		self.assertFalse(result.ok)
+		on_error.assert_called_once_with(card, result.errors[card])
+		self.assertTrue(card.is_dirty)
+
+	@async_test
+	def test_edit_while_saving(self):
+		queue = WriteBehindQueue(self.tc, delay=60)
+		card = yield from self._card()
+		responding = asyncio.Event()
+
+		@asyncio.coroutine
+		def update_card(card_id, changes):
+			yield from responding.wait()
+			return {'id': 'c1', 'idBoard': 'b1', 'name': 'Renamed', 'desc': ''}
+
+		self.tc.update_card = Mock(wraps=update_card)
+		card.name = 'Renamed'
+		yield from card.save()
+		flushing = asyncio.ensure_future(queue.flush())
+		yield from asyncio.sleep(0.01)
+		self.assertTrue(self.tc.update_card.called)
+
+		card.name = 'Renamed again'
+		yield from card.save()
+		self.assertEqual(queue.pending, [card])
+		responding.set()
+		yield from flushing
+
+		self.assertEqual(card.name, 'Renamed again')
+		self.assertTrue(card.is_dirty)
+		self.assertEqual(queue.pending, [card])
+
+		yield from queue.close()
+		self.tc.update_card.assert_called_with('c1', {'name': 'Renamed again'})
+		self.assertEqual(self.tc.update_card.call_count, 2)